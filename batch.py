@@ -0,0 +1,397 @@
+"""
+Batch reconciliation of many independent ledgers, e.g. one per account, on a pool of worker processes.
+
+The jobs are read from a CSV manifest, one row per job, and started largest expected cost first, so that the
+longest jobs do not end up running alone at the end of the batch. Each worker process runs one job at a time
+and then takes the next one, so the interpreter and the modules are only loaded once per worker. A job which
+runs past its timeout has its worker terminated and replaced, so a single runaway ledger does not hold up the
+others, and the solutions it had already written are still counted from its output file. The status, time and
+number of solutions of every job are written to a summary file as they finish.
+"""
+
+import argparse
+import csv
+import gzip
+import json
+import logging
+import multiprocessing
+import os
+import shlex
+import sys
+import time
+from collections import deque
+from contextlib import redirect_stderr, redirect_stdout
+from multiprocessing.connection import Connection, wait
+from typing import Any, Deque, Dict, List, Optional, Tuple
+import main as main_int
+import main_decimal
+from utility.cli import build_cache
+from utility.export import detect_format
+
+logging.basicConfig(format="%(asctime)s %(levelname)s %(filename)s:%(funcName)s():%(lineno)i: %(message)s",
+                    datefmt="%Y-%m-%d %H:%M:%S", level=logging.DEBUG)
+
+logger = logging.getLogger(__name__)
+
+# entry point of each kind of job
+PROGRAMS = {"int": main_int, "decimal": main_decimal}
+
+SUMMARY_FIELDS = ["name", "kind", "status", "seconds", "solutions", "nodes", "output", "error"]
+
+# margin between the job's own --time-limit and its timeout, so that it normally stops by itself and saves the
+# results found so far before its worker is terminated: the larger of a fixed time and a share of the timeout
+SOFT_MARGIN_SECONDS = 1.0
+SOFT_MARGIN_SHARE = 0.1
+
+
+def read_manifest(file_name: str) -> List[Dict[str, Any]]:
+    """
+    Read the jobs of a batch from a CSV manifest with a header row.
+
+    The columns are name, input and target, and optionally kind ('int' or 'decimal', default 'int'), output
+    (default results_<name>.csv), options (extra command-line options of the job, e.g. '--tolerance 0.05')
+    and timeout (seconds, overriding the timeout of the batch).
+
+    :param file_name: name of the manifest
+    :return: list of jobs
+    """
+    jobs: List[Dict[str, Any]] = []
+    with open(file_name, newline='') as manifest_file:
+        for line, row in enumerate(csv.DictReader(manifest_file), start=2):
+            row = {key.strip(): (value or "").strip() for key, value in row.items() if key is not None}
+            for column in ("name", "input", "target"):
+                if not row.get(column):
+                    raise ValueError(f"line {line} of {file_name}: missing {column}")
+            kind = row.get("kind") or "int"
+            if kind not in PROGRAMS:
+                raise ValueError(f"line {line} of {file_name}: unknown kind '{kind}', expected one of {', '.join(PROGRAMS)}")
+            jobs.append({
+                "name": row["name"],
+                "kind": kind,
+                "input": row["input"],
+                "target": row["target"],
+                "output": row.get("output") or f"results_{row['name']}.csv",
+                "options": shlex.split(row.get("options") or ""),
+                "timeout": float(row["timeout"]) if row.get("timeout") else None,
+            })
+    names = [job["name"] for job in jobs]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"duplicate job names in {file_name}: {', '.join(duplicates)}")
+    return jobs
+
+
+def count_rows(file_name: str) -> int:
+    """
+    :param file_name: name of a CSV file
+    :return: number of lines of the file, 0 if it cannot be read
+    """
+    try:
+        with open(file_name, "rb") as csv_file:
+            return sum(1 for _ in csv_file)
+    except OSError:
+        return 0
+
+
+def expected_cost(job: Dict[str, Any]) -> Tuple[int, int]:
+    """
+    Estimate the cost of a job from the size of its ledger, without parsing it.
+
+    The search grows exponentially with the number of transactions, so a job with more transactions is taken
+    as more expensive whatever its number of targets, which only breaks the ties.
+
+    :param job: job from read_manifest
+    :return: sort key, larger for more expensive jobs
+    """
+    return count_rows(job["input"]), count_rows(job["target"])
+
+
+def soft_time_limit(timeout: float) -> float:
+    """
+    :param timeout: timeout of a job in seconds
+    :return: time limit of the job's own search, leaving it the margin to save its results before the timeout,
+        at most half of a short timeout
+    """
+    margin = min(max(SOFT_MARGIN_SECONDS, timeout * SOFT_MARGIN_SHARE), timeout / 2)
+    return timeout - margin
+
+
+def count_written_results(file_name: str) -> int:
+    """
+    Count the result sets a job has written to its output file, e.g. before it was terminated.
+
+    :param file_name: output file of the job, as written by ResultWriter
+    :return: number of distinct result ids in the file, 0 if it cannot be read; the rows which had not been
+        flushed to disk when the job was stopped are not counted
+    """
+    result_ids = set()
+    try:
+        with (gzip.open(file_name, "rt", newline='') if file_name.endswith(".gz") else open(file_name, newline='')) as output_file:
+            if detect_format(file_name) == "csv":
+                for row in csv.DictReader(output_file):
+                    result_ids.add(row["result_id"])
+            else:
+                for line in output_file:
+                    result_ids.add(json.loads(line)["result_id"])
+    except (OSError, EOFError, KeyError, ValueError):
+        # a compressed file or a line cut off by the termination ends the count
+        pass
+    return len(result_ids)
+
+
+def job_arguments(job: Dict[str, Any], timeout: Optional[float]) -> List[str]:
+    """
+    :param job: job from read_manifest
+    :param timeout: timeout of the job in seconds, None for no limit
+    :return: command-line arguments of the job for its entry point
+    """
+    argv = ["--input", job["input"], "--target", job["target"], "--output", job["output"]]
+    if timeout is not None:
+        # the options of the job come after, so a --time-limit of its own takes precedence
+        argv += ["--time-limit", str(soft_time_limit(timeout))]
+    return argv + job["options"]
+
+
+def run_job(job: Dict[str, Any], argv: List[str], log_dir: Optional[str]) -> Dict[str, Any]:
+    """
+    Run a job in the current process, with its printed results and its log in log_dir/<name>.log.
+
+    :param job: job from read_manifest
+    :param argv: command-line arguments of the job, see job_arguments
+    :param log_dir: directory of the job logs, None to discard the printed results and keep the log on stderr
+    :return: status, number of valid results and search nodes of the job, and the error if it failed
+    """
+    program = PROGRAMS[job["kind"]]
+    root = logging.getLogger()
+    handlers = root.handlers[:]
+    log_path = os.path.join(log_dir, f"{job['name']}.log") if log_dir is not None else os.devnull
+    with open(log_path, "w") as log_file, redirect_stdout(log_file), redirect_stderr(log_file):
+        if log_dir is not None:
+            handler = logging.StreamHandler(log_file)
+            handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(filename)s:%(funcName)s():%(lineno)i: %(message)s",
+                                                   datefmt="%Y-%m-%d %H:%M:%S"))
+            root.handlers = [handler]
+        try:
+            args = program.parse_args(argv)
+            cache = build_cache(args)
+            try:
+                summary = program.run(args, cache)
+            finally:
+                if cache is not None:
+                    cache.close()
+        except SystemExit:
+            # argparse exits on invalid options, with the usage in the log
+            return {"status": "failed", "error": f"invalid options: {' '.join(argv)}"}
+        except Exception as error:
+            logger.exception("+++job %s failed+++", job["name"])
+            return {"status": "failed", "error": repr(error)}
+        finally:
+            root.handlers = handlers
+    if summary is None:
+        return {"status": "failed", "error": "input or target could not be read or is invalid"}
+    return summary
+
+
+def worker_loop(connection: Connection, log_dir: Optional[str], log_level: int) -> None:
+    """
+    Run the jobs sent by the batch on connection one after the other, until None is sent.
+
+    :param connection: end of the pipe of the worker, receiving (job, argv) and sending back the summary of the job
+    :param log_dir: see run_job
+    :param log_level: level of the job logs
+    """
+    logging.getLogger().setLevel(log_level)
+    while True:
+        task = connection.recv()
+        if task is None:
+            break
+        job, argv = task
+        connection.send(run_job(job, argv, log_dir))
+
+
+class Worker:
+    """
+    Worker process of the batch, with the job it is running.
+    """
+
+    def __init__(self, log_dir: Optional[str], log_level: int) -> None:
+        self.connection, child_connection = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=worker_loop, args=(child_connection, log_dir, log_level), daemon=True)
+        self.process.start()
+        child_connection.close()
+        self.job: Optional[Dict[str, Any]] = None
+        self.started: float = 0.0
+        self.deadline: Optional[float] = None
+
+    def start(self, job: Dict[str, Any], timeout: Optional[float]) -> None:
+        """
+        Send a job to the worker.
+
+        :param job: job from read_manifest
+        :param timeout: timeout of the job in seconds, None for no limit
+        """
+        self.job = job
+        self.started = time.monotonic()
+        self.deadline = self.started + timeout if timeout is not None else None
+        self.connection.send((job, job_arguments(job, timeout)))
+
+    def finish(self) -> Tuple[Dict[str, Any], float]:
+        """
+        :return: the job the worker was running and its elapsed seconds, the worker being ready for the next one
+        """
+        job, self.job = self.job, None
+        return job, time.monotonic() - self.started
+
+    def terminate(self) -> None:
+        self.process.terminate()
+        self.process.join(5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.connection.close()
+
+    def close(self) -> None:
+        try:
+            self.connection.send(None)
+        except OSError:
+            pass
+        self.process.join(5)
+        if self.process.is_alive():
+            self.terminate()
+        else:
+            self.connection.close()
+
+
+def run_batch(
+    jobs: List[Dict[str, Any]],
+    summary_file: str,
+    workers: int,
+    timeout: Optional[float] = None,
+    log_dir: Optional[str] = None,
+    log_level: int = logging.WARNING,
+) -> List[Dict[str, Any]]:
+    """
+    Run the jobs on a pool of worker processes, largest expected cost first, and write a row of summary_file as each one ends.
+
+    :param jobs: jobs from read_manifest
+    :param summary_file: CSV file of the summary, one row per job
+    :param workers: number of worker processes
+    :param timeout: seconds after which a job is stopped, unless it has a timeout of its own; None for no limit
+    :param log_dir: directory of the job logs, see run_job
+    :param log_level: level of the job logs
+    :return: summary of each job, in the order they ended
+    """
+    pending: Deque[Dict[str, Any]] = deque(sorted(jobs, key=expected_cost, reverse=True))
+    idle: List[Worker] = []
+    busy: List[Worker] = []
+    summaries: List[Dict[str, Any]] = []
+    if log_dir is not None:
+        os.makedirs(log_dir, exist_ok=True)
+
+    with open(summary_file, "w", newline='') as summary_csv:
+        writer = csv.DictWriter(summary_csv, fieldnames=SUMMARY_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+
+        def record(job: Dict[str, Any], seconds: float, result: Dict[str, Any]) -> None:
+            summary = {"name": job["name"], "kind": job["kind"], "seconds": round(seconds, 3), "output": job["output"],
+                       "solutions": 0, "nodes": 0, "error": ""}
+            summary.update(result)
+            summaries.append(summary)
+            writer.writerow(summary)
+            # the summary is kept on disk as the batch goes, so an interrupted batch still reports the jobs done
+            summary_csv.flush()
+            log = logger.info if summary["status"] in ("complete", "incomplete") else logger.error
+            log("---job %s: %s, %s solutions in %.2fs (%s/%s)---", job["name"], summary["status"], summary["solutions"],
+                seconds, len(summaries), len(jobs))
+
+        try:
+            while pending or busy:
+                while pending and len(busy) < workers:
+                    worker = idle.pop() if idle else Worker(log_dir, log_level)
+                    job = pending.popleft()
+                    worker.start(job, job["timeout"] if job["timeout"] is not None else timeout)
+                    busy.append(worker)
+
+                deadlines = [worker.deadline for worker in busy if worker.deadline is not None]
+                wait_time = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+                ready = wait([worker.connection for worker in busy], wait_time)
+
+                for worker in list(busy):
+                    if worker.connection in ready:
+                        busy.remove(worker)
+                        try:
+                            result = worker.connection.recv()
+                        except (EOFError, OSError):
+                            # the worker died with its job, e.g. out of memory
+                            job, seconds = worker.finish()
+                            worker.terminate()
+                            record(job, seconds, {"status": "crashed", "solutions": count_written_results(job["output"]),
+                                                  "error": f"worker exited with code {worker.process.exitcode}"})
+                            continue
+                        job, seconds = worker.finish()
+                        idle.append(worker)
+                        record(job, seconds, result)
+                    elif worker.deadline is not None and time.monotonic() >= worker.deadline:
+                        # the job ignored its own time limit, its worker is replaced by a new one
+                        busy.remove(worker)
+                        job, seconds = worker.finish()
+                        worker.terminate()
+                        record(job, seconds, {"status": "timeout", "solutions": count_written_results(job["output"]),
+                                              "error": f"stopped after {seconds:.0f}s"})
+        finally:
+            for worker in busy:
+                worker.terminate()
+            for worker in idle:
+                worker.close()
+    return summaries
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Run the jobs of a manifest and write their summary.
+
+    :param argv: command-line arguments, see --help
+
+    :returns: exit code, 1 if a job failed, crashed or timed out
+    """
+    parser = argparse.ArgumentParser(description="Reconcile many ledgers listed in a CSV manifest on a pool of processes.")
+    parser.add_argument("manifest", help="CSV file with a header row and the columns name, input, target, "
+                                         "and optionally kind (int or decimal), output, options and timeout")
+    parser.add_argument("-s", "--summary", default="batch_summary.csv",
+                        help="CSV file of the status, seconds and solutions of each job (default: %(default)s)")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1,
+                        help="number of worker processes (default: %(default)s)")
+    parser.add_argument("--timeout", type=float, default=None, metavar="SECONDS",
+                        help="time after which a job is stopped, the job's own search stops 10%% or at least 1s before it "
+                             "(default: no limit)")
+    parser.add_argument("--log-dir", default=None, metavar="DIR",
+                        help="directory of the log and printed results of each job, <name>.log (default: discarded)")
+    parser.add_argument("--log-level", choices=["DEBUG", "INFO", "WARNING", "ERROR"], default="WARNING",
+                        help="level of the job logs (default: %(default)s)")
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    try:
+        jobs = read_manifest(args.manifest)
+    except FileNotFoundError:
+        logger.error("+++manifest file not found+++")
+        return 1
+    except ValueError as error:
+        logger.error("+++%s+++", error)
+        return 1
+
+    logger.info("---running %s jobs on %s workers---", len(jobs), args.workers)
+    start = time.monotonic()
+    summaries = run_batch(jobs, args.summary, args.workers, args.timeout, args.log_dir, getattr(logging, args.log_level))
+    statuses: Dict[str, int] = {}
+    for summary in summaries:
+        statuses[summary["status"]] = statuses.get(summary["status"], 0) + 1
+    print(f"{len(summaries)} jobs in {time.monotonic() - start:.2f}s: "
+          + ", ".join(f"{count} {status}" for status, count in sorted(statuses.items()))
+          + f", summary in {args.summary}")
+    return 0 if all(summary["status"] in ("complete", "incomplete") for summary in summaries) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,282 @@
+import argparse
+import json
+import logging
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from combination import duplicate_int, input_with_duplicate_decimal
+from combination.duplicate_int import sum_combinations, iter_combination_indexes
+from utility import validation, validation_decimal
+from utility.synthetic import generate_ledger
+
+logging.basicConfig(format="%(asctime)s %(levelname)s %(filename)s:%(funcName)s():%(lineno)i: %(message)s",
+                    datefmt="%Y-%m-%d %H:%M:%S", level=logging.WARNING)
+
+logger = logging.getLogger(__name__)
+
+def count_search_nodes(search: Callable[[], object]) -> Tuple[int, float]:
+    """
+    Run a search and count the nodes of the search tree, i.e. the iter_combination_indexes generators run to completion.
+
+    :param search: function running the search
+
+    :returns: number of search nodes and elapsed seconds
+    """
+    nodes: List[int] = [0]
+    code = iter_combination_indexes.__code__
+
+    def profile(frame, event, arg) -> None:
+        # a generator also returns on every yield, with the yielded combination instead of None
+        if event == "return" and frame.f_code is code and arg is None:
+            nodes[0] += 1
+
+    start = time.perf_counter()
+    sys.setprofile(profile)
+    try:
+        search()
+    finally:
+        sys.setprofile(None)
+    return nodes[0], time.perf_counter() - start
+
+
+def benchmark_pruning(input_list: List[int], target_list: List[int]) -> None:
+    """
+    Compare the search nodes of sum_combinations with and without pruning and print the result.
+
+    :param input_list: input list of integers
+    :param target_list: target list of integers
+
+    :returns: None
+    """
+    plain_nodes, plain_time = count_search_nodes(lambda: sum_combinations(input_list, target_list, prune=False))
+    pruned_nodes, pruned_time = count_search_nodes(lambda: sum_combinations(input_list, target_list))
+    removed = 1 - pruned_nodes / plain_nodes if plain_nodes else 0
+    print(f"{len(input_list)} inputs, {len(target_list)} targets: "
+          f"{plain_nodes} nodes ({plain_time:.2f}s) without pruning, "
+          f"{pruned_nodes} nodes ({pruned_time:.2f}s) with pruning, {removed:.1%} removed")
+
+
+# ledgers of the suite, each run with the same seed on every machine
+SCENARIOS: List[Dict[str, Any]] = [
+    {"name": "int_small", "size": 16, "targets": 3, "duplicate_ratio": 0.0, "negative_ratio": 0.0, "scale": 0, "tolerance": "0"},
+    {"name": "int_duplicates", "size": 20, "targets": 4, "duplicate_ratio": 0.3, "negative_ratio": 0.0, "scale": 0, "tolerance": "0"},
+    {"name": "int_refunds", "size": 18, "targets": 4, "duplicate_ratio": 0.1, "negative_ratio": 0.2, "scale": 0, "tolerance": "0"},
+    {"name": "cents_exact", "size": 18, "targets": 3, "duplicate_ratio": 0.2, "negative_ratio": 0.1, "scale": 2, "tolerance": "0"},
+    {"name": "cents_tolerance", "size": 16, "targets": 3, "duplicate_ratio": 0.2, "negative_ratio": 0.1, "scale": 2, "tolerance": "0.01"},
+]
+
+
+def measure(stage: Callable[[], Any], repeat: int = 3) -> Tuple[Any, Dict[str, float]]:
+    """
+    Time a stage, best of repeat runs, then run it once more under tracemalloc for its peak memory.
+
+    :param stage: function running the stage
+    :param repeat: number of timed runs
+
+    :returns: result of the stage and its seconds and peak KiB
+    """
+    timings: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = stage()
+        timings.append(time.perf_counter() - start)
+    # tracemalloc slows the allocations down, so the peak is measured apart from the timings
+    tracemalloc.start()
+    try:
+        stage()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, {"seconds": round(min(timings), 6), "peak_kib": round(peak / 1024, 1)}
+
+
+def benchmark_int(input_list: List[int], target_list: List[int], repeat: int) -> Dict[str, Any]:
+    """
+    Time the stages of the integer module on a ledger.
+
+    :param input_list: input list of integers
+    :param target_list: target list of integers
+    :param repeat: number of timed runs of each stage
+
+    :returns: measurements of each stage, and the numbers of combinations and of valid sets
+    """
+    combinations, find_stats = measure(lambda: duplicate_int.sum_combinations(input_list, target_list), repeat)
+    results, filter_stats = measure(lambda: duplicate_int.filter_redundant_combinations_set(input_list, target_list, combinations), repeat)
+    valid, validate_stats = measure(lambda: sum(validation.validate_result(result, input_list, target_list) for result in results), repeat)
+    return {
+        "stages": {"sum_combinations": find_stats, "filter_redundant_combinations_set": filter_stats, "validate_result": validate_stats},
+        "combinations": len(combinations),
+        "viable_sets": len(results),
+        "valid_sets": valid,
+    }
+
+
+def benchmark_decimal(input_list: List[Decimal], target_list: List[Decimal], tolerance: Decimal, repeat: int) -> Dict[str, Any]:
+    """
+    Time the stages of the decimal module on a ledger.
+
+    :param input_list: input list of Decimals
+    :param target_list: target list of Decimals
+    :param tolerance: tolerance level for comparing sums to the targets
+    :param repeat: number of timed runs of each stage
+
+    :returns: measurements of each stage, and the numbers of combinations and of valid sets
+    """
+    module = input_with_duplicate_decimal
+    combinations, find_stats = measure(lambda: module.sum_combinations(input_list, target_list, tolerance), repeat)
+    results, filter_stats = measure(lambda: module.filter_redundant_combinations_set(input_list, target_list, combinations, tolerance), repeat)
+    valid, validate_stats = measure(lambda: sum(validation_decimal.validate_result(result, input_list, target_list, tolerance) for result in results), repeat)
+    return {
+        "stages": {"sum_combinations": find_stats, "filter_redundant_combinations_set": filter_stats, "validate_result": validate_stats},
+        "combinations": len(combinations),
+        "viable_sets": len(results),
+        "valid_sets": valid,
+    }
+
+
+def benchmark_scaled(input_list: List[Decimal], target_list: List[Decimal], tolerance: Decimal, repeat: int) -> Dict[str, Any]:
+    """
+    Time the stages of main_decimal.py on a ledger: the searches of the decimal module on scaled integers.
+
+    :param input_list: input list of Decimals
+    :param target_list: target list of Decimals
+    :param tolerance: tolerance level for comparing sums to the targets
+    :param repeat: number of timed runs of each stage
+
+    :returns: measurements of each stage, and the numbers of combinations and of valid sets
+    """
+    module = input_with_duplicate_decimal
+    combinations, find_stats = measure(lambda: list(module.iter_scaled_sum_combinations(input_list, target_list, tolerance)), repeat)
+    results, filter_stats = measure(lambda: list(module.iter_scaled_combinations_set(input_list, target_list, tolerance, combinations=combinations)), repeat)
+    valid, validate_stats = measure(lambda: sum(validation_decimal.validate_result(result, input_list, target_list, tolerance) for result in results), repeat)
+    return {
+        "stages": {"iter_scaled_sum_combinations": find_stats, "iter_scaled_combinations_set": filter_stats, "validate_result": validate_stats},
+        "combinations": len(combinations),
+        "viable_sets": len(results),
+        "valid_sets": valid,
+    }
+
+
+def run_suite(scenarios: List[Dict[str, Any]], seed: int = 512, repeat: int = 3) -> Dict[str, Any]:
+    """
+    Run every scenario with the integer module, when its sums are compared exactly, with the Decimal functions of the
+    decimal module, and with its scaled-integer path which main_decimal.py runs.
+
+    :param scenarios: ledger parameters of each scenario, as in SCENARIOS
+    :param seed: seed of the ledger generator
+    :param repeat: number of timed runs of each stage
+
+    :returns: report of the suite, to be saved as a JSON baseline
+    """
+    report: Dict[str, Any] = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "seed": seed,
+        "repeat": repeat,
+        "scenarios": {},
+    }
+    for scenario in scenarios:
+        input_list, target_list = generate_ledger(scenario["size"], scenario["targets"], scenario["duplicate_ratio"],
+                                                  scenario["negative_ratio"], scenario["scale"], seed=seed)
+        tolerance = Decimal(scenario["tolerance"])
+        entry: Dict[str, Any] = {"parameters": scenario, "modules": {}}
+        if tolerance == 0:
+            # the integer module runs on the amounts in units of their last decimal place
+            factor = 10 ** scenario["scale"]
+            entry["modules"]["int"] = benchmark_int([int(value * factor) for value in input_list], [int(value * factor) for value in target_list], repeat)
+        decimal_input, decimal_target = [Decimal(value) for value in input_list], [Decimal(value) for value in target_list]
+        entry["modules"]["decimal"] = benchmark_decimal(decimal_input, decimal_target, tolerance, repeat)
+        entry["modules"]["scaled"] = benchmark_scaled(decimal_input, decimal_target, tolerance, repeat)
+        report["scenarios"][scenario["name"]] = entry
+        for module, stats in entry["modules"].items():
+            timings = ", ".join(f"{stage} {values['seconds']:.4f}s/{values['peak_kib']:.0f}KiB" for stage, values in stats["stages"].items())
+            print(f"{scenario['name']} [{module}]: {stats['combinations']} combinations, {stats['viable_sets']} sets: {timings}")
+    return report
+
+
+def compare_baseline(report: Dict[str, Any], baseline: Dict[str, Any], threshold: float = 0.25, min_seconds: float = 0.01) -> List[str]:
+    """
+    Compare a report with a saved baseline, stage by stage.
+
+    :param report: report of the current run, from run_suite
+    :param baseline: report of an earlier run
+    :param threshold: relative slowdown or memory growth reported as a regression, e.g. 0.25 for 25%
+    :param min_seconds: stages faster than this in both runs are too noisy to compare their times
+
+    :returns: list of regressions, empty if there is none
+    """
+    regressions: List[str] = []
+    for name, entry in report["scenarios"].items():
+        old_entry: Optional[Dict[str, Any]] = baseline.get("scenarios", {}).get(name)
+        if old_entry is None:
+            continue
+        for module, stats in entry["modules"].items():
+            old_stats = old_entry["modules"].get(module)
+            if old_stats is None:
+                continue
+            if (stats["combinations"], stats["viable_sets"]) != (old_stats["combinations"], old_stats["viable_sets"]):
+                regressions.append(f"{name} [{module}]: {stats['combinations']} combinations and {stats['viable_sets']} sets, "
+                                   f"{old_stats['combinations']} and {old_stats['viable_sets']} in the baseline")
+            for stage, values in stats["stages"].items():
+                old_values = old_stats["stages"].get(stage)
+                if old_values is None:
+                    continue
+                for metric in ("seconds", "peak_kib"):
+                    new, old = values[metric], old_values[metric]
+                    if metric == "seconds" and max(new, old) < min_seconds:
+                        continue
+                    ratio = new / old if old else float("inf")
+                    if ratio > 1 + threshold:
+                        regressions.append(f"{name} [{module}] {stage}: {metric} {old} -> {new} ({ratio - 1:+.0%})")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Run the pruning comparison, or the benchmark suite with an optional JSON baseline.
+
+    :param argv: command-line arguments, see --help
+
+    :returns: exit code, 1 if the suite regressed against the baseline
+    """
+    parser = argparse.ArgumentParser(description="Benchmarks of the combination search.")
+    parser.add_argument("command", nargs="?", choices=["pruning", "suite"], default="pruning",
+                        help="pruning: search nodes with and without pruning; suite: timings and peak memory of each stage (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=512, help="seed of the generated ledgers (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs of each stage, the best one is kept (default: %(default)s)")
+    parser.add_argument("--save", metavar="JSON", help="save the report of the suite as a baseline")
+    parser.add_argument("--compare", metavar="JSON", help="compare the suite with a saved baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="relative growth reported as a regression (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    if args.command == "pruning":
+        rng = random.Random(args.seed)
+        for size in (12, 16, 20):
+            # wide, mostly positive ledger with targets built from disjoint slices of the input
+            input_ledger: List[int] = [rng.randint(-50, 2000) if rng.random() < 0.1 else rng.randint(1, 2000) for _ in range(size)]
+            rng.shuffle(input_ledger)
+            target_ledger: List[int] = [sum(input_ledger[i:i + 4]) for i in range(0, size, 4)]
+            benchmark_pruning(input_ledger, target_ledger)
+        return 0
+
+    report = run_suite(SCENARIOS, args.seed, args.repeat)
+    if args.save:
+        with open(args.save, "w") as baseline_file:
+            json.dump(report, baseline_file, indent=2)
+        print(f"baseline saved to {args.save}")
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare_baseline(report, json.load(baseline_file), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        print(f"{len(regressions)} regressions against {args.compare}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""
+Counting the viable combination sets without enumerating them.
+
+The take/skip search over the candidate combinations reaches the same remaining input and target counts
+through many different paths. Here the search is run breadth first, one combination at a time, and all paths
+reaching the same state are merged into a single entry holding their number of ways, so every subproblem
+(index, remaining counts) is solved once.
+"""
+
+from typing import Dict, List, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# the columns a choice covers, as (column, count) pairs
+Choice = List[Tuple[int, int]]
+
+
+def count_covers(need: List[int], rows: List[List[Choice]], stop_at_first: bool = False) -> int:
+    """
+    count the ways to pick choices of the rows so that every column is covered exactly as many times as it needs
+
+    a choice may be picked several times, e.g. the same combination for two copies of a target, 
+    and a way is a multiset of choices, counted once whatever the order of its choices
+
+    :param need: number of times each column has to be covered
+    :param rows: alternative choices of each row, e.g. one per target a combination can be assigned to
+    :param stop_at_first: stop as soon as one way is found, the result is then 0 or 1
+
+    :return: number of ways
+    """
+    # after its last row, a column which is not covered yet can no longer be covered
+    last_row: Dict[int, int] = {}
+    for index, choices in enumerate(rows):
+        for choice in choices:
+            for column, _ in choice:
+                last_row[column] = index
+    if any(count > 0 and column not in last_row for column, count in enumerate(need)):
+        return 0
+    expiring: List[List[int]] = [[] for _ in rows]
+    for column, index in last_row.items():
+        expiring[index].append(column)
+
+    done: Tuple[int, ...] = (0,) * len(need)
+    states: Dict[Tuple[int, ...], int] = {tuple(need): 1}
+    for index, choices in enumerate(rows):
+        next_states: Dict[Tuple[int, ...], int] = dict(states)  # skip the row
+        for choice in choices:
+            # pick the choice once more as long as it fits, the states reached by k picks come from those reached by k - 1
+            frontier: Dict[Tuple[int, ...], int] = next_states
+            while frontier:
+                picked: Dict[Tuple[int, ...], int] = {}
+                for state, ways in frontier.items():
+                    if any(state[column] < count for column, count in choice):
+                        continue
+                    remaining = list(state)
+                    for column, count in choice:
+                        remaining[column] -= count
+                    key = tuple(remaining)
+                    picked[key] = picked.get(key, 0) + ways
+                for key, ways in picked.items():
+                    next_states[key] = next_states.get(key, 0) + ways
+                frontier = picked
+        if expiring[index]:
+            next_states = {
+                state: ways for state, ways in next_states.items()
+                if all(state[column] == 0 for column in expiring[index])
+            }
+        states = next_states
+        if stop_at_first and done in states:
+            return 1
+        if not states:
+            return 0
+    logger.info('---%s distinct states left after %s rows---', len(states), len(rows))
+    return min(states.get(done, 0), 1) if stop_at_first else states.get(done, 0)
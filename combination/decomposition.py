@@ -0,0 +1,163 @@
+"""
+Decomposition of the viable combination set search into forced choices and independent subproblems.
+
+Before the search, the combinations which must be in every viable set are committed: when an input or target
+value is used by a single combination left, that combination is taken as many times as the value needs it,
+and the combinations which no longer fit are dropped, until nothing changes. The values and combinations left
+are then split into connected components, two values being connected when a combination uses both. Each
+component is searched on its own, and the viable sets are the Cartesian product of the solutions of the
+components, so one search over the whole ledger becomes several small ones. The product is generated as the
+components are searched, so the first viable set comes as soon as every component has a first solution.
+"""
+
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+import logging
+from combination.counting import Choice
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# search over the (column, count) rows of a subproblem, yielding the solutions as lists of positions in its rows
+Solver = Callable[[List[int], List[Choice]], Iterator[List[int]]]
+
+
+def peel_forced_rows(need: List[int], rows: List[Optional[Choice]]) -> Optional[Tuple[List[int], List[int], List[int]]]:
+    """
+    commit the rows which every solution must contain, i.e. the only row left using a column that is not covered yet,
+    as many times as the column needs it
+
+    :param need: number of times each column has to be used
+    :param rows: (column, count) pairs used by each row, None for a row which can never be chosen
+
+    :return: the forced rows, the remaining count of each column and the rows left,
+        or None if some column can no longer be covered
+    """
+    remaining: List[int] = list(need)
+    live: Dict[int, Choice] = {index: row for index, row in enumerate(rows) if row is not None}
+    forced: List[int] = []
+    while True:
+        # drop the rows which need more of a column than remains
+        live = {index: row for index, row in live.items() if all(count <= remaining[column] for column, count in row)}
+        users: List[List[int]] = [[] for _ in remaining]
+        for index, row in live.items():
+            for column, _ in row:
+                users[column].append(index)
+        if any(count > 0 and not users[column] for column, count in enumerate(remaining)):
+            return None
+        single = next((column for column, count in enumerate(remaining) if count > 0 and len(users[column]) == 1), None)
+        if single is None:
+            return forced, remaining, sorted(live)
+        # the only row left has to be taken as many times as it takes to cover the column
+        index = users[single][0]
+        row = live.pop(index)
+        uses = dict(row)[single]
+        times = remaining[single] // uses
+        if remaining[single] % uses != 0 or any(count * times > remaining[column] for column, count in row):
+            return None
+        forced.extend([index] * times)
+        for column, count in row:
+            remaining[column] -= count * times
+
+
+def split_components(remaining: List[int], rows: List[Optional[Choice]], live: List[int]) -> List[List[int]]:
+    """
+    split the rows left into groups which share no column, with a union-find over the columns
+
+    :param remaining: remaining count of each column
+    :param rows: (column, count) pairs used by each row
+    :param live: indexes of the rows left
+
+    :return: list of components, each a sorted list of row indexes
+    """
+    parent: List[int] = list(range(len(remaining)))
+
+    def find(column: int) -> int:
+        while parent[column] != column:
+            parent[column] = parent[parent[column]]
+            column = parent[column]
+        return column
+
+    for index in live:
+        first = find(rows[index][0][0])
+        for column, _ in rows[index][1:]:
+            root = find(column)
+            if root != first:
+                parent[root] = first
+
+    components: Dict[int, List[int]] = {}
+    for index in live:
+        components.setdefault(find(rows[index][0][0]), []).append(index)
+    # a component whose columns are all covered already has the empty set as its only solution
+    return [component for component in components.values() if any(remaining[column] > 0 for index in component for column, _ in rows[index])]
+
+
+def iter_decomposed_covers(need: List[int], rows: List[Optional[Choice]], solve: Solver) -> Iterator[List[int]]:
+    """
+    generate every set of rows using each column exactly as many times as it needs,
+    searching each independent component with solve and combining their solutions
+
+    :param need: number of times each column has to be used
+    :param rows: (column, count) pairs used by each row, None for a row which can never be chosen
+    :param solve: search over a subproblem, given its column counts and its rows
+
+    :return: iterator of sets of rows, each a sorted list of row indexes
+    """
+    peeled = peel_forced_rows(need, rows)
+    if peeled is None:
+        return
+    forced, remaining, live = peeled
+    components = split_components(remaining, rows, live)
+    logger.info('---%s forced combinations, %s independent components of %s combinations---',
+                len(forced), len(components), [len(component) for component in components])
+
+    def solutions(component: List[int]) -> Iterator[List[int]]:
+        columns = {column for index in component for column, _ in rows[index]}
+        sub_need = [count if column in columns else 0 for column, count in enumerate(remaining)]
+        for solution in solve(sub_need, [rows[index] for index in component]):
+            yield [component[position] for position in solution]
+
+    for picks in iter_lazy_product([solutions(component) for component in components]):
+        yield sorted(forced + [index for pick in picks for index in pick])
+
+
+def iter_lazy_product(iterables: List[Iterable[T]]) -> Iterator[List[T]]:
+    """
+    generate the Cartesian product of iterables as itertools.product does, but without reading them all first:
+    each iterable is read on the first pass over it, while the iterables after it vary, and replayed from a cache
+    on the later passes, so the first item comes as soon as every iterable has given one
+
+    :param iterables: iterables to combine, e.g. generators of the solutions of each component
+
+    :return: iterator of lists with one item of each iterable, the last one varying fastest;
+        nothing if one of the iterables is empty
+    """
+    iterators: List[Iterator[T]] = [iter(iterable) for iterable in iterables]
+    caches: List[List[T]] = [[] for _ in iterables]
+    read: List[bool] = [False] * len(iterables)
+    # set once an iterable turns out to be empty, the product is then empty whatever the other iterables give
+    empty: List[bool] = [False]
+
+    def items(level: int) -> Iterator[T]:
+        if read[level]:
+            yield from caches[level]
+            return
+        for item in iterators[level]:
+            caches[level].append(item)
+            yield item
+        read[level] = True
+        if not caches[level]:
+            empty[0] = True
+
+    def walk(level: int, picked: List[T]) -> Iterator[List[T]]:
+        if level == len(iterators):
+            yield list(picked)
+            return
+        for item in items(level):
+            picked.append(item)
+            yield from walk(level + 1, picked)
+            picked.pop()
+            if empty[0]:
+                return
+
+    yield from walk(0, [])
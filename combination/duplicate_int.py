@@ -1,11 +1,30 @@
-from itertools import combinations
-from typing import List, Dict
+from array import array
+from bisect import bisect_left
+from typing import Callable, List, Dict, Iterable, Iterator, Optional, Tuple, Union
 import logging
 from collections import Counter
+from combination.meet_in_middle import find_zero_sum_combinations, split_subset_sums, find_combinations_meet_in_middle
+from combination.counting import Choice, count_covers
+from combination.decomposition import Solver, iter_decomposed_covers, peel_forced_rows, split_components
+from combination.exact_cover import iter_exact_covers
+from combination.target_driven import iter_target_driven_covers
+from combination.stats import SearchStats
+from combination.vectorized import iter_vectorized_combinations
+from combination.pruning import ReachableSums, SuffixBounds, build_reachable_sums, build_suffix_bounds, is_reachable
 
 logger = logging.getLogger(__name__)
 
-def find_combinations(candidates: List[int], target: int, start: int, path: List[int], result: List[List[int]]) -> None:
+def find_combinations(
+    candidates: List[int],
+    target: int,
+    start: int,
+    path: List[int],
+    result: List[List[int]],
+    reachable: Optional[ReachableSums] = None,
+    bounds: Optional[SuffixBounds] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    stats: Optional[SearchStats] = None,
+) -> None:
     """
     find all combinations of candidates that sum to target
 
@@ -14,18 +33,130 @@ def find_combinations(candidates: List[int], target: int, start: int, path: List
     :param start: start index
     :param path: current path
     :param res: result list
+    :param reachable: optional table of reachable suffix sums from build_reachable_sums, used to skip dead branches
+    :param bounds: optional suffix sum bounds from build_suffix_bounds, used to skip dead branches
+    :param should_stop: optional function called at every node, the search ends once it returns True
+    :param stats: optional SearchStats counting the nodes and the pruned branches
 
     :return: None
     """
+    result.extend(iter_combinations(candidates, target, start, path, reachable, bounds, should_stop, stats))
+
+def iter_combinations(
+    candidates: List[int],
+    target: int,
+    start: int,
+    path: List[int],
+    reachable: Optional[ReachableSums] = None,
+    bounds: Optional[SuffixBounds] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    stats: Optional[SearchStats] = None,
+) -> Iterator[List[int]]:
+    """
+    generate all combinations of candidates that sum to target, one at a time
+
+    :param candidates: list of candidates
+    :param target: target sum
+    :param start: start index
+    :param path: current path
+    :param reachable: optional table of reachable suffix sums from build_reachable_sums, used to skip dead branches
+    :param bounds: optional suffix sum bounds from build_suffix_bounds, used to skip dead branches
+    :param should_stop: optional function called at every node, the search ends once it returns True
+    :param stats: optional SearchStats counting the nodes and the pruned branches
+
+    :return: iterator of combinations
+    """
+    for indexes in iter_combination_indexes(candidates, target, start, [], reachable, bounds, should_stop, stats):
+        yield path + [candidates[i] for i in indexes]
+
+
+def iter_combination_indexes(
+    candidates: List[int],
+    target: int,
+    start: int,
+    path: List[int],
+    reachable: Optional[ReachableSums] = None,
+    bounds: Optional[SuffixBounds] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    stats: Optional[SearchStats] = None,
+) -> Iterator[Tuple[int, ...]]:
+    """
+    generate all combinations of candidates that sum to target as tuples of indexes into candidates, one at a time
+
+    the search pushes and pops indexes on the single path list instead of copying it at every level,
+    a combination is only built, as a tuple, when it is found
+
+    copies of a value are always taken from the start of their run in candidates, 
+    so equal combinations have equal index tuples
 
-    if target == 0: # if target is 0, append path to result
-        result.append(path)
+    :param candidates: list of candidates
+    :param target: target sum
+    :param start: start index
+    :param path: indexes taken so far, restored when the generator is exhausted
+    :param reachable: optional table of reachable suffix sums from build_reachable_sums, used to skip dead branches
+    :param bounds: optional suffix sum bounds from build_suffix_bounds, used to skip dead branches
+    :param should_stop: optional function called at every node, the search ends once it returns True
+    :param stats: optional SearchStats counting the nodes and the pruned branches
+
+    :return: iterator of index tuples
+    """
+    if should_stop is not None and should_stop():
+        return
+    if stats is not None:
+        stats.node(len(path))
+    if target == 0: # if target is 0, yield path
+        yield tuple(path)
         return
     # for each element in candidates, find the combinations that sum up to target
     for i in range(start, len(candidates)):
         if i > start and candidates[i] == candidates[i - 1]:
+            if stats is not None:
+                stats.prune("duplicate")
+            continue
+        remaining = target - candidates[i]
+        # skip the branch if the remaining negatives and positives can no longer bring the target to 0
+        if bounds is not None and not bounds[0][i + 1] <= remaining <= bounds[1][i + 1]:
+            if stats is not None:
+                stats.prune("bounds")
+            continue
+        # skip the branch if no subset of the remaining candidates sums up to the remaining target
+        if reachable is not None and remaining != 0 and not is_reachable(reachable, i + 1, remaining):
+            if stats is not None:
+                stats.prune("reachable")
             continue
-        find_combinations(candidates, target - candidates[i], i + 1, path + [candidates[i]], result)
+        path.append(i)
+        yield from iter_combination_indexes(candidates, remaining, i + 1, path, reachable, bounds, should_stop, stats)
+        path.pop()
+
+
+def to_indexes(candidates: List[int], combination: List[int]) -> Tuple[int, ...]:
+    """
+    convert a combination of values to indexes into the sorted candidates, as produced by iter_combination_indexes
+
+    :param candidates: sorted list of candidates
+    :param combination: sorted combination of values from candidates
+
+    :return: tuple of indexes
+    """
+    indexes: List[int] = []
+    for position, value in enumerate(combination):
+        if position > 0 and combination[position - 1] == value:
+            indexes.append(indexes[-1] + 1)
+        else:
+            indexes.append(bisect_left(candidates, value))
+    return tuple(indexes)
+
+
+def to_values(candidates: List[int], combinations: Iterable[Tuple[int, ...]]) -> List[List[int]]:
+    """
+    convert index tuples back to lists of values, e.g. for export
+
+    :param candidates: list of candidates the indexes refer to
+    :param combinations: index tuples
+
+    :return: list of combinations of values
+    """
+    return [[candidates[i] for i in combination] for combination in combinations]
 
 # if 0 is provided in the target list, it has to be dealt with separately
 def find_zero_sum_combination(candidates: List[int]) -> List[int]:
@@ -34,62 +165,137 @@ def find_zero_sum_combination(candidates: List[int]) -> List[int]:
 
     :param candidate: list of candidates, which may contain duplicates, zero, or negative numbers
     
-    :return: list of elements that sums up to 0
-    """
-    logger.info('---finding combinations that sum up to 0---')
-    for i in range(1, len(candidates) + 1):
-        for combination in combinations(candidates, i):
-            if sum(combination) == 0:
-                zero_sum_result: List[int] = list(combination)
-                logger.info(f'---found {len(zero_sum_result)} combinations that sum up to 0---')
-                logger.info(f'---combinations that sum up to 0: {zero_sum_result}---')
-                return zero_sum_result
-    return []
-    
+    :return: list of elements that sums up to 0, the shortest one found, or an empty list if there is none
+    """
+    zero_sum_combinations: List[List[int]] = find_zero_sum_combinations(sorted(candidates))
+    return min(zero_sum_combinations, key=len) if zero_sum_combinations else []
+
+
+def prepare_candidates(input_list: List[int], target_list: List[int]) -> Tuple[List[List[int]], List[int], List[int]]:
+    """
+    deal with the 0s in target_list and prepare the sorted candidates for the other targets
+
+    every combination that sums up to 0 is a candidate for each 0 in target_list, the backtracking decides
+    which ones are used, so the candidates are not removed from the other targets
 
-def sum_combinations(input_list: List[int], target_list: List[int]) -> List[List[int]]:
+    each distinct target is kept once, as the backtracking can use a combination for several copies of its target
+
+    :param input_list: list of candidates, which may contain duplicates
+    :param target_list: list of targets
+
+    :return: combinations for the 0 targets, sorted candidates for the other targets, and the other distinct targets
+    """
+    # create a copy of input_list and target_list so that the original list is not modified
+    input_list_copy = sorted(input_list)
+
+    zero_sum_combinations: List[List[int]] = []
+    # check if 0 is present in target_list
+    zero_count = target_list.count(0)
+    if zero_count > 0:
+        logger.info('---finding combinations that sum up to 0---')
+        # the combinations are enumerated once, and offered to every 0 in target_list as for any other duplicate target
+        zero_sum_combinations = find_zero_sum_combinations(input_list_copy)
+
+    # Update the target_list to remove the 0s and the copies of the other targets
+    target_list_copy = [elem for elem in dict.fromkeys(target_list) if elem != 0]
+    return zero_sum_combinations, input_list_copy, target_list_copy
+
+
+def sum_combinations(input_list: List[int], target_list: List[int], engine: str = "recursive", prune: bool = True) -> List[List[int]]:
     """
     find all combinations of input_list that sum to target_list
 
     :param input_list: list of candidates, which may contain duplicates
     :param target_list: list of targets
+    :param engine: see iter_sum_combinations
+    :param prune: see iter_sum_combinations
 
     :return: list of combinations
     """
+    return list(iter_sum_combinations(input_list, target_list, engine, prune))
+
+
+def iter_sum_combinations(
+    input_list: List[int],
+    target_list: List[int],
+    engine: str = "recursive",
+    prune: bool = True,
+    should_stop: Optional[Callable[[], bool]] = None,
+    stats: Optional[SearchStats] = None,
+) -> Iterator[List[int]]:
+    """
+    generate all combinations of input_list that sum to target_list, target by target
+
+    :param input_list: list of candidates, which may contain duplicates
+    :param target_list: list of targets
+    :param engine: "recursive" to search each target with find_combinations, 
+        "meet_in_middle" to join the subset sums of the two halves of the candidates, which scales to larger inputs,
+        "vectorized" to look up the last candidates of each branch in subset sums computed with NumPy, when it is installed
+    :param prune: whether the recursive engine skips branches that cannot reach the target
+    :param should_stop: optional function called at every node of the recursive and vectorized engines, 
+        and before each target of the meet_in_middle engine, the search ends once it returns True
+    :param stats: optional SearchStats counting the combinations of each target, and the nodes and pruned branches of the recursive and vectorized engines
+
+    :return: iterator of combinations
+    """
+    if engine not in ("recursive", "meet_in_middle", "vectorized"):
+        raise ValueError(f"unknown engine: {engine}")
     logger.info('---finding combinations---')
 
-    # create a copy of input_list and target_list so that the original list is not modified
-    input_list_copy = input_list.copy()
-    target_list_copy = target_list.copy()
+    zero_sum_combinations, input_list_copy, target_list_copy = prepare_candidates(input_list, target_list)
+    yield from zero_sum_combinations
+
+    if engine == "meet_in_middle":
+        # the subset sums of both halves are shared by all targets
+        left, right = split_subset_sums(input_list_copy)
+        for target in target_list_copy:
+            if should_stop is not None and should_stop():
+                return
+            combinations: Iterable[List[int]] = find_combinations_meet_in_middle(target, left, right)
+            yield from combinations if stats is None else stats.count_found(target, combinations)
+        return
+    if engine == "vectorized":
+        yield from iter_vectorized_combinations(input_list_copy, target_list_copy, should_stop=should_stop, stats=stats)
+        return
 
-    input_list_copy.sort()
-    result: List[List[int]] = []
+    reachable: Optional[ReachableSums] = build_reachable_sums(input_list_copy) if prune else None
+    bounds: Optional[SuffixBounds] = build_suffix_bounds(input_list_copy) if prune else None
+    for target in target_list_copy:
+        combinations = iter_combinations(input_list_copy, target, 0, [], reachable, bounds, should_stop, stats)
+        yield from combinations if stats is None else stats.count_found(target, combinations)
 
-    # check if 0 is present in target_list
-    zero_count = target_list.count(0)
-    # while there is >0 zero in target_list, find combinations that sum up to 0
-    while zero_count > 0: 
-        # find the combination that sums up to 0
-        zero_sum_combination: List[int] = find_zero_sum_combination(input_list)
-        # if there is a combination that sums up to 0, 
-        if zero_sum_combination:
-            # append to result and 
-            result.append(zero_sum_combination)
-            # remove the elements in the combination from input_list_copy. This is because the original list is not modified
-            # so that it can be used later to valid combinations
-            input_list_copy = [elem for elem in input_list_copy if elem not in zero_sum_combination] 
-            zero_count -= 1 # reduce zero_count by 1
-        else: # if there is no combination that sums up to 0, break
-            break
-    
-    # Update the target_list to remove the 0s
-    target_list_copy = [elem for elem in target_list_copy if elem != 0]
 
+def iter_sum_combination_indexes(
+    input_list: List[int],
+    target_list: List[int],
+    prune: bool = True,
+    should_stop: Optional[Callable[[], bool]] = None,
+    stats: Optional[SearchStats] = None,
+) -> Iterator[Tuple[int, ...]]:
+    """
+    generate all combinations of input_list that sum to target_list, target by target, 
+    as tuples of indexes into sorted(input_list)
+
+    the combinations are the same, and in the same order, as those of iter_sum_combinations with the recursive engine
+
+    :param input_list: list of candidates, which may contain duplicates
+    :param target_list: list of targets
+    :param prune: whether to skip branches that cannot reach the target
+    :param should_stop: optional function called at every node, the search ends once it returns True
+    :param stats: optional SearchStats counting the nodes, the pruned branches and the combinations of each target
+
+    :return: iterator of index tuples
+    """
+    logger.info('---finding combinations as indexes---')
+    zero_sum_combinations, input_list_copy, target_list_copy = prepare_candidates(input_list, target_list)
+    for zero_sum_combination in zero_sum_combinations:
+        yield to_indexes(input_list_copy, zero_sum_combination)
+
+    reachable: Optional[ReachableSums] = build_reachable_sums(input_list_copy) if prune else None
+    bounds: Optional[SuffixBounds] = build_suffix_bounds(input_list_copy) if prune else None
     for target in target_list_copy:
-        res: List[List[int]] = []
-        find_combinations(input_list_copy, target, 0, [], res)
-        result.extend(res)
-    return result
+        indexes = iter_combination_indexes(input_list_copy, target, 0, [], reachable, bounds, should_stop, stats)
+        yield from indexes if stats is None else stats.count_found(target, indexes)
 
 
 def count_occurrences(int_list: List[int]) -> Dict[int, int]:
@@ -110,6 +316,9 @@ def backtrack(
     index: int,
     input_remaining: Dict[int, int],
     output_remaining: Dict[int, int],
+    candidates: Optional[List[int]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    stats: Optional[SearchStats] = None,
 ) -> List[List[List[int]]]:
     """
     backtracking algorithm to find all combinations of input_list and target_list that sum to target list
@@ -121,76 +330,362 @@ def backtrack(
     :param index: current index
     :param input_remaining: remaining occurrences of each element in input_list
     :param output_remaining: remaining occurrences of each element in target_list
+    :param candidates: sorted candidates the combinations index into, None if the combinations are lists of values
+    :param should_stop: optional function called at every node, the search ends once it returns True
+    :param stats: optional SearchStats counting the nodes and the pruned branches
 
     :return: list of combinations of viable combinations
     """
-    # Base case, if all elements in input_list and target_list are used, return the current combination
-    if index == len(combinations):
-        # check if all elements in input_list and target_list are used
-        if all(input_remaining[k] == 0 for k in input_remaining) and all(output_remaining[k] == 0 for k in output_remaining):
-            # return a copy of current combination
-            return [current.copy()]
-        return []
-
-    # Initialize the results
-    results = []
-
-    # Try adding the current combination to the solution
-    comb_sum = sum(combinations[index])
-
-    # Check if the current combination is viable
-    if output_remaining[comb_sum] > 0 and all(input_remaining[k] >= 0 for k in input_remaining):
-        # Update the remaining occurrences of each element in input_list and target_list
-        for elem in combinations[index]:
-            input_remaining[elem] -= 1
-        output_remaining[comb_sum] -= 1
-        
-        # Add the current combination to the solution
-        current.append(combinations[index])
-        # Try adding the current combination to the solution
-        results.extend(backtrack(input_count, target_count, combinations, current, index + 1, input_remaining, output_remaining))
-        # Remove the current combination from the solution
+    return list(iter_backtrack(input_count, target_count, combinations, current, index, input_remaining, output_remaining, candidates, should_stop, stats))
+
+
+def iter_backtrack(
+    input_count: Dict[int, int],
+    target_count: Dict[int, int],
+    combinations: List[List[int]],
+    current: List[List[int]],
+    index: int,
+    input_remaining: Dict[int, int],
+    output_remaining: Dict[int, int],
+    candidates: Optional[List[int]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    stats: Optional[SearchStats] = None,
+) -> Iterator[List[List[int]]]:
+    """
+    backtracking algorithm generating the viable combination sets one at a time, 
+    so that only the current path of the search is held in memory
+
+    :param input_count: dictionary of occurrences of each element in input_list
+    :param target_count: dictionary of occurrences of each element in target_list
+    :param combinations: list of combinations of elements in input_list that sum to elements in target_list
+    :param current: current combination
+    :param index: current index
+    :param input_remaining: remaining occurrences of each element in input_list
+    :param output_remaining: remaining occurrences of each element in target_list
+    :param candidates: sorted candidates the combinations index into, None if the combinations are lists of values
+    :param should_stop: optional function called at every node, the search ends once it returns True
+    :param stats: optional SearchStats counting the nodes and the pruned branches
+
+    :return: iterator of viable combination sets
+    """
+    # remap the values to dense column indexes, so that the state is an array of remaining counts
+    input_columns, target_columns, need = index_columns(input_remaining, output_remaining)
+    remaining = array('q', need)
+    # number of input and target values which are not used up yet, the combination set is complete when it reaches 0
+    unfilled = sum(1 for count in remaining if count != 0)
+    rows = build_rows(combinations, input_columns, target_columns, candidates)
+    yield from search_backtrack(combinations, rows, current, index, remaining, unfilled, should_stop, stats)
+
+
+def index_columns(input_count: Dict[int, int], target_count: Dict[int, int]) -> Tuple[Dict[int, int], Dict[int, int], List[int]]:
+    """
+    remap the input and target values to dense column indexes, inputs first
+
+    :param input_count: dictionary of occurrences of each element in input_list
+    :param target_count: dictionary of occurrences of each element in target_list
+
+    :return: column of each input value, column of each target value, and the count of each column
+    """
+    input_columns: Dict[int, int] = {value: column for column, value in enumerate(input_count)}
+    target_columns: Dict[int, int] = {value: column + len(input_columns) for column, value in enumerate(target_count)}
+    return input_columns, target_columns, list(input_count.values()) + list(target_count.values())
+
+
+def build_rows(
+    combinations: List[List[int]],
+    input_columns: Dict[int, int],
+    target_columns: Dict[int, int],
+    candidates: Optional[List[int]] = None,
+) -> List[Optional[Choice]]:
+    """
+    translate each combination into the columns it uses: its values with their multiplicity, and its sum
+
+    :param combinations: list of combinations of elements in input_list that sum to elements in target_list
+    :param input_columns: column of each input value
+    :param target_columns: column of each target value
+    :param candidates: sorted candidates the combinations index into, None if the combinations are lists of values
+
+    :return: list of (column, count) pairs for each combination, None if the combination uses an unknown value
+    """
+    rows: List[Optional[Choice]] = []
+    for combination in combinations:
+        if candidates is not None:
+            combination = [candidates[i] for i in combination]
+        comb_sum = sum(combination)
+        if comb_sum not in target_columns or any(elem not in input_columns for elem in combination):
+            rows.append(None)
+            continue
+        row: Choice = [(input_columns[value], count) for value, count in Counter(combination).items()]
+        row.append((target_columns[comb_sum], 1))
+        rows.append(row)
+    return rows
+
+
+def search_backtrack(
+    combinations: List[List[int]],
+    rows: List[Optional[Choice]],
+    current: List[List[int]],
+    index: int,
+    remaining: array,
+    unfilled: int,
+    should_stop: Optional[Callable[[], bool]] = None,
+    stats: Optional[SearchStats] = None,
+) -> Iterator[List[List[int]]]:
+    """
+    recursive step of iter_backtrack: take each of the remaining combinations in list order, 
+    skipping a combination is moving on to the next one
+
+    a combination can be taken again right after itself, e.g. for two copies of its target, 
+    so the combinations of a set are in nondecreasing index order and every set is generated once
+
+    :param combinations: list of combinations of elements in input_list that sum to elements in target_list
+    :param rows: columns used by each combination, from build_rows
+    :param current: current combination
+    :param index: current index
+    :param remaining: remaining count of each column
+    :param unfilled: number of columns whose remaining count is not 0
+    :param should_stop: optional function called at every node, the search ends once it returns True
+    :param stats: optional SearchStats counting the nodes and the pruned branches
+
+    :return: iterator of viable combination sets
+    """
+    if should_stop is not None and should_stop():
+        return
+    if stats is not None:
+        stats.node(len(current))
+    # all elements in input_list and target_list are used, no further combination can be taken
+    if unfilled == 0:
+        yield current.copy()
+        return
+
+    for i in range(index, len(rows)):
+        row = rows[i]
+        # Check if the combination is viable, in O(size of the combination)
+        if row is None or any(remaining[column] < count for column, count in row):
+            if stats is not None:
+                stats.prune("conflict")
+            continue
+        filled = 0
+        for column, count in row:
+            remaining[column] -= count
+            if remaining[column] == 0:
+                filled += 1
+
+        current.append(combinations[i])
+        yield from search_backtrack(combinations, rows, current, i, remaining, unfilled - filled, should_stop, stats)
         current.pop()
 
-        # Update the remaining occurrences of each element in input_list and target_list
-        for elem in combinations[index]:
-            # Add back the occurrences of each element in input_list and target_list
-            input_remaining[elem] += 1
-        output_remaining[comb_sum] += 1
+        for column, count in row:
+            remaining[column] += count
 
-    # Try skipping the current combination
-    results.extend(backtrack(input_count, target_count, combinations, current, index + 1, input_remaining, output_remaining))
 
-    # Check for a 0-sum combination while constructing the combinations
-    # If there is a 0-sum combination, add it to the solution
-    if comb_sum == 0 and output_remaining[0] > 0:
-        # Update the remaining occurrences of each element in input_list and target_list
-        output_remaining[0] -= 1
-        # Add the current combination to the solution
-        results.extend(backtrack(input_count, target_count, combinations, current, index + 1, input_remaining, output_remaining))
-        # Update the remaining occurrences of each element in input_list and target_list
-        output_remaining[0] += 1
+def unique_combinations(combinations: Iterable[List[int]]) -> List[List[int]]:
+    """
+    remove the repeated combinations, e.g. found for copies of a target, keeping the first one of each
+
+    :param combinations: combinations of elements in input_list
 
-    return results
+    :return: list of distinct combinations, in their first order
+    """
+    unique: Dict[Tuple[int, ...], List[int]] = {}
+    for combination in combinations:
+        unique.setdefault(tuple(combination), combination)
+    return list(unique.values())
 
 
-def filter_redundant_combinations_set(input_list: List[int], target_list: List[int], combinations: List[List[int]]) -> List[List[List[int]]]:
+def filter_redundant_combinations_set(
+    input_list: List[int],
+    target_list: List[int],
+    combinations: List[List[int]],
+    engine: str = "backtrack",
+    mode: str = "all",
+    candidates: Optional[List[int]] = None,
+    decompose: bool = False,
+) -> Union[List[List[List[int]]], int, bool]:
     """
     filter out redundant combinations 
 
     :param input_list: list of candidates, which may contain duplicates, zero, or negative numbers
     :param target_list: list of targets which may contain duplicates, zero, or negative numbers and to be summed to
+    :param engine: see iter_filter_redundant_combinations_set
+    :param mode: "all" to return every viable combination set, "count" to return only their number, 
+        "exists" to return only whether there is one; the last two merge identical subproblems instead of enumerating sets
+    :param candidates: sorted candidates the combinations index into, None if the combinations are lists of values
+    :param decompose: see iter_filter_redundant_combinations_set
 
-    :return: list of viable combinations
+    :return: list of viable combinations, their number, or whether there is one, depending on mode
+    """
+    if mode == "all":
+        return list(iter_filter_redundant_combinations_set(input_list, target_list, combinations, engine, candidates, decompose))
+    if mode in ("count", "exists"):
+        count = count_viable_combination_sets(input_list, target_list, combinations, stop_at_first=mode == "exists", candidates=candidates, decompose=decompose)
+        return count if mode == "count" else count > 0
+    raise ValueError(f"unknown mode: {mode}")
+
+
+def count_viable_combination_sets(
+    input_list: List[int],
+    target_list: List[int],
+    combinations: Iterable[List[int]],
+    stop_at_first: bool = False,
+    candidates: Optional[List[int]] = None,
+    decompose: bool = False,
+) -> int:
+    """
+    count the viable combination sets, memoizing on the index and the remaining input and target counts
+
+    :param input_list: list of candidates, which may contain duplicates, zero, or negative numbers
+    :param target_list: list of targets which may contain duplicates, zero, or negative numbers and to be summed to
+    :param combinations: combinations of elements in input_list that sum to elements in target_list
+    :param stop_at_first: stop as soon as one viable combination set is found
+    :param candidates: sorted candidates the combinations index into, None if the combinations are lists of values
+    :param decompose: take the forced combinations first and multiply the counts of the independent components
+
+    :return: number of viable combination sets, at most 1 if stop_at_first
+    """
+    input_columns, target_columns, need = index_columns(count_occurrences(input_list), count_occurrences(target_list))
+    built: List[Optional[Choice]] = build_rows(unique_combinations(combinations), input_columns, target_columns, candidates)
+    if not decompose:
+        return count_covers(need, [[row] for row in built if row is not None], stop_at_first)
+
+    peeled = peel_forced_rows(need, built)
+    if peeled is None:
+        return 0
+    _, remaining, live = peeled
+    total = 1
+    for component in split_components(remaining, built, live):
+        columns = {column for index in component for column, _ in built[index]}
+        sub_need = [count if column in columns else 0 for column, count in enumerate(remaining)]
+        total *= count_covers(sub_need, [[built[index]] for index in component], stop_at_first)
+        if total == 0:
+            return 0
+    return total
+
+
+def iter_filter_redundant_combinations_set(
+    input_list: List[int],
+    target_list: List[int],
+    combinations: Iterable[List[int]],
+    engine: str = "backtrack",
+    candidates: Optional[List[int]] = None,
+    decompose: bool = False,
+    should_stop: Optional[Callable[[], bool]] = None,
+    stats: Optional[SearchStats] = None,
+) -> Iterator[List[List[int]]]:
     """
+    filter out redundant combinations, generating the viable combination sets as they are found
+
+    the candidate combinations are collected first, as the backtracking revisits them on every path, 
+    and each distinct combination is kept once: the same combination can fill several copies of a target, 
+    and every viable combination set is generated once
+
+    :param input_list: list of candidates, which may contain duplicates, zero, or negative numbers
+    :param target_list: list of targets which may contain duplicates, zero, or negative numbers and to be summed to
+    :param combinations: combinations of elements in input_list that sum to elements in target_list
+    :param engine: "backtrack" to take or skip each combination in list order, 
+        "exact_cover" to solve the exact cover of the inputs and targets with Algorithm X, branching on the most constrained value first,
+        "target_driven" to fill the target with the fewest candidate combinations first, dropping conflicting combinations after each choice
+    :param candidates: sorted candidates the combinations index into, e.g. from iter_sum_combination_indexes; 
+        the viable combination sets are then made of the same index tuples. None if the combinations are lists of values
+    :param decompose: take the combinations every viable set must contain first, then search each group of values 
+        which share no combination with the others separately with the engine, and combine their solutions; 
+        the viable combination sets are the same, in a different order
+    :param should_stop: optional function called at every node of the search, the search ends once it returns True,
+        e.g. SearchBudget from utility.budget
+    :param stats: optional SearchStats counting the nodes and the pruned branches of the search
+
+    :return: iterator of viable combination sets
+    """
+    if engine not in ("backtrack", "exact_cover", "target_driven"):
+        raise ValueError(f"unknown engine: {engine}")
+    combinations = unique_combinations(combinations)
+    # the budget may have run out while the combinations were collected, the set search would not get any further
+    if should_stop is not None and should_stop():
+        return
+
     # Count the occurrences of each element in input_list and target_list
     x_counts: Dict[int, int] = count_occurrences(input_list)
     y_counts: Dict[int, int] = count_occurrences(target_list)
 
+    if decompose:
+        input_columns, target_columns, need = index_columns(x_counts, y_counts)
+        rows = build_rows(combinations, input_columns, target_columns, candidates)
+        for cover in iter_decomposed_covers(need, rows, component_solver(engine, list(target_columns.values()), should_stop, stats)):
+            yield [combinations[index] for index in cover]
+        return
+
+    if engine == "exact_cover":
+        yield from iter_exact_cover_combinations_set(x_counts, y_counts, combinations, candidates, should_stop, stats)
+        return
+    if engine == "target_driven":
+        input_columns, target_columns, need = index_columns(x_counts, y_counts)
+        rows = build_rows(combinations, input_columns, target_columns, candidates)
+        for cover in iter_target_driven_covers(need, rows, list(target_columns.values()), should_stop, stats):
+            yield [combinations[index] for index in cover]
+        return
+
     # Initialize the remaining occurrences of each element in input_list and target_list
     x_remaining: Dict[int, int] = x_counts.copy()
     y_remaining: Dict[int, int] = y_counts.copy()
 
     # Find all viable combinations using backtracking
-    results: List[List[List[int]]]= backtrack(x_counts, y_counts, combinations, [], 0, x_remaining, y_remaining)
-    return results
+    yield from iter_backtrack(x_counts, y_counts, combinations, [], 0, x_remaining, y_remaining, candidates, should_stop, stats)
+
+
+def component_solver(
+    engine: str,
+    targets: List[int],
+    should_stop: Optional[Callable[[], bool]] = None,
+    stats: Optional[SearchStats] = None,
+) -> Solver:
+    """
+    wrap an engine as a search over the (column, count) rows of a component, for iter_decomposed_covers
+
+    :param engine: "backtrack", "exact_cover" or "target_driven", see iter_filter_redundant_combinations_set
+    :param targets: columns of the targets
+    :param should_stop: optional function called at every node, the search ends once it returns True
+    :param stats: optional SearchStats counting the nodes and the pruned branches
+
+    :return: function searching a component given its column counts and its rows
+    """
+    def solve(need: List[int], rows: List[Choice]) -> Iterator[List[int]]:
+        if engine == "exact_cover":
+            return iter_exact_covers({column: count for column, count in enumerate(need) if count > 0}, [dict(row) for row in rows], should_stop, stats)
+        if engine == "target_driven":
+            return iter_target_driven_covers(need, rows, targets, should_stop, stats)
+        return search_backtrack(list(range(len(rows))), rows, [], 0, array('q', need), sum(1 for count in need if count != 0), should_stop, stats)
+    return solve
+
+
+def iter_exact_cover_combinations_set(
+    input_count: Dict[int, int],
+    target_count: Dict[int, int],
+    combinations: List[List[int]],
+    candidates: Optional[List[int]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    stats: Optional[SearchStats] = None,
+) -> Iterator[List[List[int]]]:
+    """
+    find the viable combination sets as an exact cover problem: every input value and every target value is a column 
+    to be covered as many times as it occurs, every combination is a row covering its values and its sum
+
+    :param input_count: dictionary of occurrences of each element in input_list
+    :param target_count: dictionary of occurrences of each element in target_list
+    :param combinations: list of combinations of elements in input_list that sum to elements in target_list
+    :param candidates: sorted candidates the combinations index into, None if the combinations are lists of values
+    :param should_stop: optional function called at every node, the search ends once it returns True
+    :param stats: optional SearchStats counting the nodes and the pruned branches
+
+    :return: iterator of viable combination sets, the combinations of a set being in list order
+    """
+    need: Dict[tuple, int] = {("input", value): count for value, count in input_count.items()}
+    need.update({("target", value): count for value, count in target_count.items()})
+    rows: List[Dict[tuple, int]] = []
+    for combination in combinations:
+        if candidates is not None:
+            combination = [candidates[i] for i in combination]
+        row: Dict[tuple, int] = {("input", value): count for value, count in Counter(combination).items()}
+        row[("target", sum(combination))] = 1
+        rows.append(row)
+    for cover in iter_exact_covers(need, rows, should_stop, stats):
+        yield [combinations[index] for index in cover]
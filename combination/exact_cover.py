@@ -0,0 +1,133 @@
+"""
+Algorithm X for exact cover with multiplicities.
+
+Every column has to be covered exactly as many times as it needs, every row covers its columns with some
+multiplicity and can be chosen several times, e.g. the same combination for two copies of a target. The search
+always branches on the open column with the fewest rows left, and a row is dropped from every column as soon
+as it would overshoot one of them. The sets of rows
+per column play the part of the dancing links: hiding and restoring a row are both O(size of the row).
+"""
+
+from typing import Callable, Dict, Hashable, Iterator, List, Optional, Set
+import logging
+from combination.stats import SearchStats
+
+logger = logging.getLogger(__name__)
+
+
+def hide_row(row: int, rows: List[Dict[Hashable, int]], columns: Dict[Hashable, Set[int]]) -> None:
+    """
+    remove a row from the candidates of all of its columns
+
+    :param row: index of the row
+    :param rows: multiplicity of each column covered by each row
+    :param columns: rows still available for each column
+    """
+    for column in rows[row]:
+        columns[column].discard(row)
+
+
+def restore_row(row: int, rows: List[Dict[Hashable, int]], columns: Dict[Hashable, Set[int]]) -> None:
+    """
+    put a hidden row back into the candidates of all of its columns
+
+    :param row: index of the row
+    :param rows: multiplicity of each column covered by each row
+    :param columns: rows still available for each column
+    """
+    for column in rows[row]:
+        columns[column].add(row)
+
+
+def iter_exact_covers(
+    need: Dict[Hashable, int],
+    rows: List[Dict[Hashable, int]],
+    should_stop: Optional[Callable[[], bool]] = None,
+    stats: Optional[SearchStats] = None,
+) -> Iterator[List[int]]:
+    """
+    generate every set of rows covering each column exactly as many times as it needs
+
+    :param need: number of times each column has to be covered
+    :param rows: multiplicity of each column covered by each row
+    :param should_stop: optional function called at every node, the search ends once it returns True
+    :param stats: optional SearchStats counting the nodes and the pruned branches
+
+    :return: iterator of covers, each a sorted list of row indexes, a row appearing once per time it is chosen
+    """
+    need = dict(need)
+    columns: Dict[Hashable, Set[int]] = {column: set() for column in need}
+    for row, covered in enumerate(rows):
+        # a row covering an unknown column, or a column more often than needed, can never be chosen
+        if all(column in need and count <= need[column] for column, count in covered.items()):
+            for column in covered:
+                columns[column].add(row)
+    # a dict rather than a set keeps the column order, and so the order of the covers, deterministic
+    open_columns: Dict[Hashable, None] = {column: None for column, count in need.items() if count > 0}
+    logger.info('---searching exact covers of %s columns with %s rows---', len(open_columns), len(rows))
+    yield from search_exact_covers(need, rows, columns, open_columns, [], should_stop, stats)
+
+
+def search_exact_covers(
+    need: Dict[Hashable, int],
+    rows: List[Dict[Hashable, int]],
+    columns: Dict[Hashable, Set[int]],
+    open_columns: Dict[Hashable, None],
+    solution: List[int],
+    should_stop: Optional[Callable[[], bool]] = None,
+    stats: Optional[SearchStats] = None,
+) -> Iterator[List[int]]:
+    """
+    recursive step of iter_exact_covers
+
+    :param need: number of times each column still has to be covered
+    :param rows: multiplicity of each column covered by each row
+    :param columns: rows still available for each column
+    :param open_columns: columns which still have to be covered
+    :param solution: rows chosen so far
+    :param should_stop: optional function called at every node, the search ends once it returns True
+    :param stats: optional SearchStats counting the nodes and the pruned branches
+
+    :return: iterator of covers, each a sorted list of row indexes
+    """
+    if should_stop is not None and should_stop():
+        return
+    if stats is not None:
+        stats.node(len(solution))
+    if not open_columns:
+        yield sorted(solution)
+        return
+
+    # branch on the most constrained column, a column without any row left is a dead end
+    column = min(open_columns, key=lambda open_column: len(columns[open_column]))
+    excluded: List[int] = []
+    for row in sorted(columns[column]):
+        # the row stays available below this branch, it is dropped there once it would overshoot a column
+        dropped: List[int] = []
+        for covered, count in rows[row].items():
+            need[covered] -= count
+            if need[covered] == 0:
+                del open_columns[covered]
+            # drop the rows which would now overshoot this column
+            for other in list(columns[covered]):
+                if rows[other][covered] > need[covered]:
+                    if stats is not None:
+                        stats.prune("overshoot")
+                    hide_row(other, rows, columns)
+                    dropped.append(other)
+
+        solution.append(row)
+        yield from search_exact_covers(need, rows, columns, open_columns, solution, should_stop, stats)
+        solution.pop()
+
+        for other in reversed(dropped):
+            restore_row(other, rows, columns)
+        for covered, count in rows[row].items():
+            if need[covered] == 0:
+                open_columns[covered] = None
+            need[covered] += count
+        # the row is hidden for the remaining branches at this level, so each cover is generated once
+        hide_row(row, rows, columns)
+        excluded.append(row)
+    for row in excluded:
+        restore_row(row, rows, columns)
@@ -0,0 +1,54 @@
+"""
+Conversion of decimal amounts to scaled integers, so that the search runs on int arithmetic.
+
+With every amount multiplied by 10^scale, where scale is the largest number of decimal places in the data,
+sums, differences and comparisons with the tolerance are exact on integers and give the same results as on
+the original Decimal values.
+"""
+
+from decimal import Decimal
+from typing import Dict, Iterable, List
+
+
+def detect_scale(values: Iterable[Decimal]) -> int:
+    """
+    find the largest number of significant decimal places in the values, e.g. 2 for currency amounts
+
+    :param values: decimal values
+
+    :return: number of decimal places, 0 for whole numbers
+    """
+    scale = 0
+    for value in values:
+        exponent = value.normalize().as_tuple().exponent
+        if isinstance(exponent, int) and exponent < 0:
+            scale = max(scale, -exponent)
+    return scale
+
+
+def to_scaled(values: Iterable[Decimal], scale: int) -> List[int]:
+    """
+    convert decimal values to integers in units of 10^-scale
+
+    :param values: decimal values with at most scale decimal places
+    :param scale: number of decimal places, from detect_scale
+
+    :return: list of scaled integers
+    """
+    return [int(value.scaleb(scale)) for value in values]
+
+
+def map_scaled(values: List[Decimal], scaled: List[int]) -> Dict[int, Decimal]:
+    """
+    map each scaled integer back to the first original value it was converted from,
+    so that results keep the amounts as they were written
+
+    :param values: original decimal values
+    :param scaled: the same values as scaled integers
+
+    :return: dictionary of scaled integer to original value
+    """
+    originals: Dict[int, Decimal] = {}
+    for value, scaled_value in zip(values, scaled):
+        originals.setdefault(scaled_value, value)
+    return originals
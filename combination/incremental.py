@@ -0,0 +1,310 @@
+"""
+Incremental re-reconciliation of an integer ledger when a few transactions or targets change.
+
+A full run searches the combinations of every target, then the viable combination sets. When one or two
+transactions are added, removed or corrected, most of that work is still valid, so IncrementalReconciler keeps
+the sorted candidates, the combinations of each target and the solutions of each independent component of the
+set search, and only redoes what the change touches:
+- a removed copy of a value invalidates the combinations using more copies of it than are left
+- an added copy of a value brings the combinations using it as many times as it now occurs, found by a search
+  which only follows the branches taking every copy of the value
+- a removed target drops its combinations, a new target is searched in full
+- a component of the set search whose combinations and counts are unchanged keeps its solutions, only the
+  components touched by the change are searched again
+
+The combinations and the viable combination sets are the same as those of a full run with sum_combinations and
+filter_redundant_combinations_set on the updated ledger, in a different order.
+"""
+
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+from itertools import product
+from typing import Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+import logging
+from combination.counting import Choice
+from combination.decomposition import peel_forced_rows, split_components
+from combination.duplicate_int import build_rows, component_solver, index_columns, iter_combinations
+from combination.meet_in_middle import find_zero_sum_combinations, iter_joined_subsets, split_subset_sums
+from combination.pruning import ReachableSums, SuffixBounds, build_reachable_sums, build_suffix_bounds, is_reachable
+from combination.stats import SearchStats
+
+logger = logging.getLogger(__name__)
+
+Combination = Tuple[int, ...]
+
+
+def iter_combination_indexes_using(
+    candidates: List[int],
+    target: int,
+    first: int,
+    last: int,
+    start: int,
+    path: List[int],
+    reachable: Optional[ReachableSums] = None,
+    bounds: Optional[SuffixBounds] = None,
+    stats: Optional[SearchStats] = None,
+) -> Iterator[Tuple[int, ...]]:
+    """
+    generate the combinations of iter_combination_indexes which take every index from first to last, 
+    i.e. every copy of a value, without searching the branches that skip one of them
+
+    :param candidates: sorted list of candidates
+    :param target: target sum
+    :param first: index of the first copy of the value in candidates
+    :param last: index of the last copy of the value in candidates
+    :param start: start index
+    :param path: indexes taken so far, restored when the generator is exhausted
+    :param reachable: optional table of reachable suffix sums from build_reachable_sums, used to skip dead branches
+    :param bounds: optional suffix sum bounds from build_suffix_bounds, used to skip dead branches
+    :param stats: optional SearchStats counting the nodes and the pruned branches
+
+    :return: iterator of index tuples
+    """
+    if stats is not None:
+        stats.node(len(path))
+    if target == 0:
+        # as in iter_combination_indexes, the search stops once the target is reached
+        if start > last:
+            yield tuple(path)
+        return
+    if first < start <= last:
+        # the copies are taken one after the other from the start of their run
+        indexes = range(start, start + 1)
+    else:
+        # before the copies, a branch going past the first one would never take it
+        indexes = range(start, first + 1) if start <= first else range(start, len(candidates))
+    for i in indexes:
+        if i > start and candidates[i] == candidates[i - 1]:
+            if stats is not None:
+                stats.prune("duplicate")
+            continue
+        remaining = target - candidates[i]
+        if bounds is not None and not bounds[0][i + 1] <= remaining <= bounds[1][i + 1]:
+            if stats is not None:
+                stats.prune("bounds")
+            continue
+        if reachable is not None and remaining != 0 and not is_reachable(reachable, i + 1, remaining):
+            if stats is not None:
+                stats.prune("reachable")
+            continue
+        path.append(i)
+        yield from iter_combination_indexes_using(candidates, remaining, first, last, i + 1, path, reachable, bounds, stats)
+        path.pop()
+
+
+class IncrementalReconciler:
+    """
+    Combinations and viable combination sets of an integer ledger, kept up to date through small changes.
+    """
+
+    def __init__(
+        self,
+        input_list: List[int],
+        target_list: List[int],
+        engine: str = "backtrack",
+        prune: bool = True,
+        stats: Optional[SearchStats] = None,
+    ) -> None:
+        """
+        search the combinations of every target of the ledger
+
+        :param input_list: list of candidates, which may contain duplicates, zero, or negative numbers
+        :param target_list: list of targets, which may contain duplicates, zero, or negative numbers
+        :param engine: engine of the set search in each component, see iter_filter_redundant_combinations_set
+        :param prune: whether the combination searches skip branches that cannot reach the target
+        :param stats: optional SearchStats counting the nodes and pruned branches of every search
+        """
+        if engine not in ("backtrack", "exact_cover", "target_driven"):
+            raise ValueError(f"unknown engine: {engine}")
+        self.engine = engine
+        self.prune = prune
+        self.stats = stats
+        self.candidates: List[int] = sorted(input_list)
+        self.input_count: Counter = Counter(input_list)
+        self.target_count: Counter = Counter(target_list)
+        # combinations of each distinct target, as sorted tuples of values
+        self.combinations: Dict[int, List[Combination]] = {}
+        # solutions of the components of the last set search, as lists of combinations, keyed by their combinations and counts
+        self.solutions: Dict[Hashable, List[List[Combination]]] = {}
+        self._tables: Optional[Tuple[Optional[ReachableSums], Optional[SuffixBounds]]] = None
+        for target in self.target_count:
+            self.combinations[target] = self._search(target)
+
+    def _pruning_tables(self) -> Tuple[Optional[ReachableSums], Optional[SuffixBounds]]:
+        # the tables of the current candidates are built on the first search after a change of the inputs
+        if self._tables is None:
+            self._tables = (build_reachable_sums(self.candidates), build_suffix_bounds(self.candidates)) if self.prune else (None, None)
+        return self._tables
+
+    def _search(self, target: int) -> List[Combination]:
+        """
+        search all the combinations of a target among the current candidates
+
+        :param target: target sum
+        :return: list of combinations
+        """
+        if target == 0:
+            # the empty combination is not a combination of 0, see prepare_candidates
+            return list(dict.fromkeys(tuple(combination) for combination in find_zero_sum_combinations(self.candidates)))
+        reachable, bounds = self._pruning_tables()
+        return [tuple(combination) for combination in iter_combinations(self.candidates, target, 0, [], reachable, bounds, stats=self.stats)]
+
+    def _search_with(self, value: int, targets: Iterable[int]) -> Dict[int, List[Combination]]:
+        """
+        search the combinations using every copy of value, i.e. those needing its last added copy
+
+        :param value: value of the added input, already among the candidates
+        :param targets: targets to search
+        :return: combinations of each target
+        """
+        first, last = bisect_left(self.candidates, value), bisect_right(self.candidates, value) - 1
+        copies = last - first + 1
+        found: Dict[int, List[Combination]] = {}
+        for target in targets:
+            if target == 0:
+                # the combinations of 0 are every zero-sum sub-multiset, the others sum up to -value * copies
+                left, right = split_subset_sums(self.candidates[:first] + self.candidates[last + 1:])
+                found[target] = [tuple(sorted(combination + (value,) * copies))
+                                 for combination in iter_joined_subsets(left, right, -value * copies)]
+                continue
+            reachable, bounds = self._pruning_tables()
+            found[target] = [tuple(self.candidates[i] for i in indexes)
+                             for indexes in iter_combination_indexes_using(self.candidates, target, first, last, 0, [], reachable, bounds, self.stats)]
+        return found
+
+    def update(
+        self,
+        added_inputs: Iterable[int] = (),
+        removed_inputs: Iterable[int] = (),
+        added_targets: Iterable[int] = (),
+        removed_targets: Iterable[int] = (),
+    ) -> Dict[str, int]:
+        """
+        apply a change of the ledger, updating only the combinations it affects;
+        a corrected amount is the removal of the old amount and the addition of the new one
+
+        :param added_inputs: input values added, one per copy
+        :param removed_inputs: input values removed, one per copy
+        :param added_targets: target values added, one per copy
+        :param removed_targets: target values removed, one per copy
+        :return: number of combinations invalidated and found, and of targets searched in full
+        """
+        added_count, removed_count = Counter(added_inputs), Counter(removed_inputs)
+        # a value both added and removed is unchanged
+        added_count, removed_count = added_count - removed_count, removed_count - added_count
+        added_target_count, removed_target_count = Counter(added_targets), Counter(removed_targets)
+        added_target_count, removed_target_count = added_target_count - removed_target_count, removed_target_count - added_target_count
+        for value, count in removed_count.items():
+            if self.input_count[value] < count:
+                raise ValueError(f"cannot remove {count} copies of input {value}, only {self.input_count[value]} left")
+        for value, count in removed_target_count.items():
+            if self.target_count[value] < count:
+                raise ValueError(f"cannot remove {count} copies of target {value}, only {self.target_count[value]} left")
+        summary: Dict[str, int] = {"invalidated": 0, "found": 0, "targets_searched": 0}
+
+        self.target_count.subtract(removed_target_count)
+        for target, count in list(self.target_count.items()):
+            if count == 0:
+                summary["invalidated"] += len(self.combinations.pop(target))
+                del self.target_count[target]
+
+        if removed_count:
+            self.input_count.subtract(removed_count)
+            for value, count in removed_count.items():
+                for _ in range(count):
+                    self.candidates.remove(value)
+            # a combination stays valid while it uses no more copies of a value than are left
+            for target, combinations in self.combinations.items():
+                kept = [combination for combination in combinations
+                        if all(combination.count(value) <= self.input_count[value] for value in removed_count)]
+                summary["invalidated"] += len(combinations) - len(kept)
+                self.combinations[target] = kept
+            self.input_count = +self.input_count
+            self._tables = None
+
+        for value, count in added_count.items():
+            # copy by copy, the new combinations are those using every copy of the value
+            for _ in range(count):
+                insort(self.candidates, value)
+                self.input_count[value] += 1
+                self._tables = None
+                for target, found in self._search_with(value, self.combinations).items():
+                    self.combinations[target].extend(found)
+                    summary["found"] += len(found)
+
+        for target, count in added_target_count.items():
+            if target not in self.target_count:
+                self.combinations[target] = self._search(target)
+                summary["found"] += len(self.combinations[target])
+                summary["targets_searched"] += 1
+            self.target_count[target] += count
+
+        logger.info('---%s combinations invalidated, %s combinations found, %s targets searched in full---',
+                    summary["invalidated"], summary["found"], summary["targets_searched"])
+        return summary
+
+    def all_combinations(self) -> List[List[int]]:
+        """
+        :return: list of the combinations of every distinct target, target by target
+        """
+        return [list(combination) for combinations in self.combinations.values() for combination in combinations]
+
+    def iter_viable_sets(self, should_stop: Optional[Callable[[], bool]] = None) -> Iterator[List[List[int]]]:
+        """
+        generate the viable combination sets of the current ledger, taking the forced combinations first and
+        reusing the solutions of the components left unchanged since an earlier call
+
+        :param should_stop: optional function called at every node of the component searches, the search ends once it returns True;
+            the solutions of a component cut short are not kept
+        :return: iterator of viable combination sets
+        """
+        combinations: List[Combination] = [combination for target_combinations in self.combinations.values() for combination in target_combinations]
+        input_columns, target_columns, need = index_columns(dict(self.input_count), dict(self.target_count))
+        rows: List[Optional[Choice]] = build_rows([list(combination) for combination in combinations], input_columns, target_columns)
+        peeled = peel_forced_rows(need, rows)
+        if peeled is None:
+            return
+        forced, remaining, live = peeled
+        components = split_components(remaining, rows, live)
+        labels: Dict[int, Tuple[str, int]] = {column: ("input", value) for value, column in input_columns.items()}
+        labels.update({column: ("target", value) for value, column in target_columns.items()})
+        solve = component_solver(self.engine, list(target_columns.values()), should_stop, self.stats)
+
+        solutions: List[List[List[int]]] = []
+        kept: Dict[Hashable, List[List[Combination]]] = {}
+        reused = 0
+        for component in components:
+            columns = {column for index in component for column, _ in rows[index]}
+            # a component is identified by its combinations and by the counts left of its values
+            key = (tuple(sorted(combinations[index] for index in component)),
+                   tuple(sorted((labels[column], remaining[column]) for column in columns)))
+            if key in self.solutions:
+                reused += 1
+                found = self.solutions[key]
+            else:
+                sub_need = [count if column in columns else 0 for column, count in enumerate(remaining)]
+                found = [[combinations[component[position]] for position in solution]
+                         for solution in solve(sub_need, [rows[index] for index in component])]
+                if should_stop is not None and should_stop():
+                    return
+            kept[key] = found
+            # a component without solution leaves no viable set at all
+            if not found:
+                break
+            positions: Dict[Combination, int] = {combinations[index]: index for index in component}
+            solutions.append([[positions[combination] for combination in solution] for solution in found])
+        # the solutions of components which no longer occur are dropped
+        self.solutions = kept
+        logger.info('---%s forced combinations, %s components reused, %s searched---', len(forced), reused, len(kept) - reused)
+        if len(solutions) < len(components):
+            return
+
+        for picks in product(*solutions):
+            yield [list(combinations[index]) for index in sorted(forced + [index for pick in picks for index in pick])]
+
+    def viable_sets(self, should_stop: Optional[Callable[[], bool]] = None) -> List[List[List[int]]]:
+        """
+        :param should_stop: see iter_viable_sets
+        :return: list of the viable combination sets of the current ledger
+        """
+        return list(self.iter_viable_sets(should_stop))
@@ -1,12 +1,19 @@
+from bisect import bisect_left, bisect_right
 from decimal import Decimal
-from itertools import combinations
-from typing import List, Dict
+from typing import Callable, List, Dict, Iterable, Iterator, Optional, Union
 import logging
 from collections import Counter
+from combination import duplicate_int
+from combination.counting import Choice, count_covers
+from combination.fixed_point import detect_scale, map_scaled, to_scaled
+from combination.meet_in_middle import find_zero_sum_combinations
+from combination.stats import SearchStats
+from combination.vectorized import iter_vectorized_combinations
+from combination.pruning import SuffixBounds, build_suffix_bounds
 
 logger = logging.getLogger(__name__)
 
-def find_combinations(candidates: List[Decimal], target: Decimal, start: int, path: List[Decimal], result: List[List[Decimal]], tolerance: Decimal = Decimal("0.1")) -> None:
+def find_combinations(candidates: List[Decimal], target: Decimal, start: int, path: List[Decimal], result: List[List[Decimal]], tolerance: Decimal = Decimal("0.1"), bounds: Optional[SuffixBounds] = None, should_stop: Optional[Callable[[], bool]] = None, stats: Optional[SearchStats] = None) -> None:
     """
     Find all combinations of candidates that approximate the target within a tolerance level.
 
@@ -15,71 +22,118 @@ def find_combinations(candidates: List[Decimal], target: Decimal, start: int, pa
     :param start: start index
     :param path: current path
     :param result: result list
+    :param tolerance: tolerance level for comparing sums to the target
+    :param bounds: optional suffix sum bounds from build_suffix_bounds, used to skip dead branches
+    :param should_stop: optional function called at every node, the search ends once it returns True
+    :param stats: optional SearchStats counting the nodes and the pruned branches
 
     :return: None
     """
+    result.extend(iter_combinations(candidates, target, start, path, tolerance, bounds, should_stop, stats))
+
+def iter_combinations(candidates: List[Decimal], target: Decimal, start: int, path: List[Decimal], tolerance: Decimal = Decimal("0.1"), bounds: Optional[SuffixBounds] = None, should_stop: Optional[Callable[[], bool]] = None, stats: Optional[SearchStats] = None) -> Iterator[List[Decimal]]:
+    """
+    Generate all combinations of candidates that approximate the target within a tolerance level, one at a time.
+
+    :param candidates: list of candidates
+    :param target: target sum
+    :param start: start index
+    :param path: current path, a single list extended and restored in place as the search goes down and up
+    :param tolerance: tolerance level for comparing sums to the target
+    :param bounds: optional suffix sum bounds from build_suffix_bounds, used to skip dead branches
+    :param should_stop: optional function called at every node, the search ends once it returns True
+    :param stats: optional SearchStats counting the nodes and the pruned branches
+
+    :return: iterator of combinations
+    """
+    if should_stop is not None and should_stop():
+        return
+    if stats is not None:
+        stats.node(len(path))
     if abs(target) <= tolerance:  # Allows combinations close to target
-        result.append(path)
+        yield path.copy()
         return
     
     for i in range(start, len(candidates)):
         if i > start and candidates[i] == candidates[i - 1]:
+            if stats is not None:
+                stats.prune("duplicate")
             continue
-        find_combinations(candidates, target - candidates[i], i + 1, path + [candidates[i]], result)
+        remaining = target - candidates[i]
+        # Skip the branch if the remaining candidates can no longer bring the target within tolerance of 0
+        if bounds is not None and not bounds[0][i + 1] - tolerance <= remaining <= bounds[1][i + 1] + tolerance:
+            if stats is not None:
+                stats.prune("bounds")
+            continue
+        path.append(candidates[i])
+        yield from iter_combinations(candidates, remaining, i + 1, path, tolerance, bounds, should_stop, stats)
+        path.pop()
 
 def find_zero_sum_combination(candidates: List[Decimal], tolerance: Decimal = Decimal("0.1")) -> List[Decimal]:
     """
     Find combinations that sum up approximately to zero within a tolerance level.
 
     :param candidates: list of candidates, which may contain duplicates, zero, or negative numbers
+    :param tolerance: tolerance level for comparing sums to zero
     
-    :return: list of elements that sum up to approximately zero
+    :return: list of elements that sum up to approximately zero, the shortest one found, or an empty list if there is none
     """
-    logger.info('---finding combinations that sum up to 0---')
-    for i in range(1, len(candidates) + 1):
-        for combination in combinations(candidates, i):
-            if abs(sum(combination)) <= tolerance:
-                zero_sum_result: List[Decimal] = list(combination)
-                logger.info(f'---found {len(zero_sum_result)} combinations that sum up to 0---')
-                logger.info(f'---combinations that sum up to 0: {zero_sum_result}---')
-                return zero_sum_result
-    return []
+    zero_sum_combinations: List[List[Decimal]] = find_zero_sum_combinations(sorted(candidates), tolerance)
+    return min(zero_sum_combinations, key=len) if zero_sum_combinations else []
 
-def sum_combinations(input_list: List[Decimal], target_list: List[Decimal], tolerance: Decimal = Decimal("0.1")) -> List[List[Decimal]]:
+def sum_combinations(input_list: List[Decimal], target_list: List[Decimal], tolerance: Decimal = Decimal("0.1"), prune: bool = True, engine: str = "recursive") -> List[List[Decimal]]:
     """
     Find all combinations of input_list that approximate the values in target_list within a tolerance.
 
     :param input_list: list of candidates, which may contain duplicates
     :param target_list: list of targets
     :param tolerance: tolerance level for comparing sums to target values
+    :param prune: whether to skip branches that can no longer reach the target
+    :param engine: see iter_sum_combinations
 
     :return: list of combinations
     """
+    return list(iter_sum_combinations(input_list, target_list, tolerance, prune, engine))
+
+def iter_sum_combinations(input_list: List[Decimal], target_list: List[Decimal], tolerance: Decimal = Decimal("0.1"), prune: bool = True, engine: str = "recursive", should_stop: Optional[Callable[[], bool]] = None, stats: Optional[SearchStats] = None) -> Iterator[List[Decimal]]:
+    """
+    Generate all combinations of input_list that approximate the values in target_list within a tolerance, target by target.
+
+    :param input_list: list of candidates, which may contain duplicates
+    :param target_list: list of targets
+    :param tolerance: tolerance level for comparing sums to target values
+    :param prune: whether to skip branches that can no longer reach the target
+    :param engine: "recursive" to search each target with find_combinations, 
+        "vectorized" to look up the last candidates of each branch with NumPy, for values already scaled to integers
+    :param should_stop: optional function called at every node, the search ends once it returns True
+    :param stats: optional SearchStats counting the nodes, the pruned branches and the combinations of each target
+
+    :return: iterator of combinations
+    """
+    if engine not in ("recursive", "vectorized"):
+        raise ValueError(f"unknown engine: {engine}")
     logger.info('---finding combinations---')
 
-    input_list_copy = input_list.copy()
-    target_list_copy = target_list.copy()
-    input_list_copy.sort()
-    result: List[List[Decimal]] = []
+    input_list_copy = sorted(input_list)
 
+    # Every combination within tolerance of zero is a candidate for each zero target, the backtracking decides which ones are used
     zero_count = target_list.count(Decimal("0"))
-    while zero_count > 0: 
-        zero_sum_combination: List[Decimal] = find_zero_sum_combination(input_list,tolerance)
-        if zero_sum_combination:
-            result.append(zero_sum_combination)
-            input_list_copy = [elem for elem in input_list_copy if elem not in zero_sum_combination] 
-            zero_count -= 1
-        else:
-            break
-    
-    target_list_copy = [elem for elem in target_list_copy if elem != Decimal("0")]
+    if zero_count > 0:
+        logger.info('---finding combinations that sum up to 0---')
+        yield from find_zero_sum_combinations(input_list_copy, tolerance)
+
+    # Each distinct target is searched once, the backtracking can use a combination for several copies of a target
+    target_list_copy = [elem for elem in dict.fromkeys(target_list) if elem != Decimal("0")]
+
+    if engine == "vectorized":
+        yield from iter_vectorized_combinations(input_list_copy, target_list_copy, tolerance, should_stop=should_stop, stats=stats)
+        return
 
+    bounds: Optional[SuffixBounds] = build_suffix_bounds(input_list_copy) if prune else None
     # Use tolerance when finding combinations
     for target in target_list_copy:
-        res: List[List[Decimal]] = []
-        find_combinations(input_list_copy, target, 0, [], res,tolerance)
-        result.extend(res)
-    return result
+        combinations = iter_combinations(input_list_copy, target, 0, [], tolerance, bounds, should_stop, stats)
+        yield from combinations if stats is None else stats.count_found(target, combinations)
 
 def count_occurrences(int_list: List[Decimal]) -> Dict[Decimal, int]:
     """
@@ -99,7 +153,11 @@ def backtrack(
     index: int,
     input_remaining: Dict[Decimal, int],
     output_remaining: Dict[Decimal, int],
-    tolerance: Decimal = Decimal("0.1")
+    tolerance: Decimal = Decimal("0.1"),
+    compatible_targets: Optional[List[List[Decimal]]] = None,
+    target_start: int = 0,
+    should_stop: Optional[Callable[[], bool]] = None,
+    stats: Optional[SearchStats] = None,
 ) -> List[List[List[Decimal]]]:
     """
     Backtracking algorithm to find viable combinations that approximate target list values within a tolerance.
@@ -111,27 +169,79 @@ def backtrack(
     :param index: current index
     :param input_remaining: remaining occurrences of each element in input_list
     :param output_remaining: remaining occurrences of each element in target_list
+    :param tolerance: tolerance level for comparing sums to target values
+    :param compatible_targets: targets within tolerance of each combination, computed once if not given
+    :param target_start: position in the compatible targets of the current combination to start from
+    :param should_stop: optional function called at every node, the search ends once it returns True
+    :param stats: optional SearchStats counting the nodes and the pruned branches
 
     :return: list of viable combinations
     """
+    return list(iter_backtrack(input_count, target_count, combinations, current, index, input_remaining, output_remaining, tolerance, compatible_targets, target_start, should_stop, stats))
+
+def iter_backtrack(
+    input_count: Dict[Decimal, int],
+    target_count: Dict[Decimal, int],
+    combinations: List[List[Decimal]],
+    current: List[List[Decimal]],
+    index: int,
+    input_remaining: Dict[Decimal, int],
+    output_remaining: Dict[Decimal, int],
+    tolerance: Decimal = Decimal("0.1"),
+    compatible_targets: Optional[List[List[Decimal]]] = None,
+    target_start: int = 0,
+    should_stop: Optional[Callable[[], bool]] = None,
+    stats: Optional[SearchStats] = None,
+) -> Iterator[List[List[Decimal]]]:
+    """
+    Backtracking algorithm generating the viable combination sets one at a time, so that only the current path is held in memory.
+
+    :param input_count: dictionary of occurrences of each element in input_list
+    :param target_count: dictionary of occurrences of each element in target_list
+    :param combinations: list of combinations of elements in input_list that sum to elements in target_list
+    :param current: current combination
+    :param index: current index
+    :param input_remaining: remaining occurrences of each element in input_list
+    :param output_remaining: remaining occurrences of each element in target_list
+    :param tolerance: tolerance level for comparing sums to target values
+    :param compatible_targets: targets within tolerance of each combination, computed once if not given
+    :param target_start: position in the compatible targets of the current combination to start from
+    :param should_stop: optional function called at every node, the search ends once it returns True
+    :param stats: optional SearchStats counting the nodes and the pruned branches
+
+    :return: iterator of viable combinations
+    """
+    if compatible_targets is None:
+        compatible_targets = index_compatible_targets(combinations, list(output_remaining), tolerance)
+
+    if should_stop is not None and should_stop():
+        return
+    if stats is not None:
+        stats.node(len(current))
     if index == len(combinations):
         if all(input_remaining[k] == 0 for k in input_remaining) and all(output_remaining[k] == 0 for k in output_remaining):
-            return [current.copy()]
-        return []
-
-    results = []
-    comb_sum = sum(combinations[index])
+            yield current.copy()
+        return
 
-    # Use tolerance when checking if comb_sum approximates a target
-    for target in output_remaining:
-        if abs(comb_sum - target) <= tolerance and output_remaining[target] > 0:
+    # Only the targets which comb_sum approximates within tolerance are tried,
+    # and only if enough of each element is left, as the remaining counts never grow back down a path
+    uses: Dict[Decimal, int] = Counter(combinations[index])
+    available = all(input_remaining[elem] >= count for elem, count in uses.items())
+    # The combination can be taken again, for the same or a later target, so that the (combination, target)
+    # choices of a set are in nondecreasing order and every set is generated once
+    for position in range(target_start, len(compatible_targets[index])):
+        target = compatible_targets[index][position]
+        if not available or output_remaining[target] == 0:
+            if stats is not None:
+                stats.prune("conflict")
+        else:
             # Temporarily update occurrences for backtracking
             for elem in combinations[index]:
                 input_remaining[elem] -= 1
             output_remaining[target] -= 1
             
             current.append(combinations[index])
-            results.extend(backtrack(input_count, target_count, combinations, current, index + 1, input_remaining, output_remaining))
+            yield from iter_backtrack(input_count, target_count, combinations, current, index, input_remaining, output_remaining, tolerance, compatible_targets, position, should_stop, stats)
             current.pop()
 
             # Revert occurrences after backtracking
@@ -139,18 +249,86 @@ def backtrack(
                 input_remaining[elem] += 1
             output_remaining[target] += 1
 
-    results.extend(backtrack(input_count, target_count, combinations, current, index + 1, input_remaining, output_remaining))
+    yield from iter_backtrack(input_count, target_count, combinations, current, index + 1, input_remaining, output_remaining, tolerance, compatible_targets, should_stop=should_stop, stats=stats)
+
+
+def index_compatible_targets(combinations: List[List[Decimal]], targets: List[Decimal], tolerance: Decimal = Decimal("0.1")) -> List[List[Decimal]]:
+    """
+    Find the targets within tolerance of the sum of each combination, with a binary search over the sorted targets.
+    Each sum is computed once, and the targets keep their order in targets, so the backtracking visits them as before.
+
+    :param combinations: list of combinations of elements in input_list
+    :param targets: distinct targets
+    :param tolerance: tolerance level for comparing sums to target values
 
-    return results
+    :return: list of compatible targets of each combination
+    """
+    order: Dict[Decimal, int] = {target: position for position, target in enumerate(targets)}
+    sorted_targets: List[Decimal] = sorted(targets)
+    compatible: List[List[Decimal]] = []
+    for combination in combinations:
+        comb_sum = sum(combination)
+        lower = bisect_left(sorted_targets, comb_sum - tolerance)
+        upper = bisect_right(sorted_targets, comb_sum + tolerance)
+        compatible.append(sorted(sorted_targets[lower:upper], key=order.__getitem__))
+    return compatible
 
-def filter_redundant_combinations_set(input_list: List[Decimal], target_list: List[Decimal], combinations: List[List[Decimal]],tolerance: Decimal = Decimal("0.1")) -> List[List[List[Decimal]]]:
+def filter_redundant_combinations_set(input_list: List[Decimal], target_list: List[Decimal], combinations: List[List[Decimal]],tolerance: Decimal = Decimal("0.1"), mode: str = "all") -> Union[List[List[List[Decimal]]], int, bool]:
     """
     Filter out redundant combinations to retain only viable ones.
 
     :param input_list: list of candidates, which may contain duplicates, zero, or negative numbers
     :param target_list: list of targets
+    :param mode: "all" to return every viable combination set, "count" to return only their number, 
+        "exists" to return only whether there is one
 
-    :return: list of viable combinations
+    :return: list of viable combinations, their number, or whether there is one, depending on mode
+    """
+    if mode == "all":
+        return list(iter_filter_redundant_combinations_set(input_list, target_list, combinations, tolerance))
+    if mode in ("count", "exists"):
+        count = count_viable_combination_sets(input_list, target_list, combinations, tolerance, stop_at_first=mode == "exists")
+        return count if mode == "count" else count > 0
+    raise ValueError(f"unknown mode: {mode}")
+
+def count_viable_combination_sets(input_list: List[Decimal], target_list: List[Decimal], combinations: Iterable[List[Decimal]], tolerance: Decimal = Decimal("0.1"), stop_at_first: bool = False) -> int:
+    """
+    Count the viable combination sets, memoizing on the index and the remaining input and target counts.
+    A combination within tolerance of several targets counts once per target it can fill, as in backtrack.
+
+    :param input_list: list of candidates, which may contain duplicates, zero, or negative numbers
+    :param target_list: list of targets
+    :param combinations: combinations of elements in input_list that approximate elements in target_list
+    :param tolerance: tolerance level for comparing sums to target values
+    :param stop_at_first: stop as soon as one viable combination set is found
+
+    :return: number of viable combination sets, at most 1 if stop_at_first
+    """
+    # Remap the input and target values to dense column indexes
+    input_columns: Dict[Decimal, int] = {value: column for column, value in enumerate(count_occurrences(input_list))}
+    target_columns: Dict[Decimal, int] = {value: column + len(input_columns) for column, value in enumerate(count_occurrences(target_list))}
+    need: List[int] = list(count_occurrences(input_list).values()) + list(count_occurrences(target_list).values())
+
+    combinations = [combination for combination in duplicate_int.unique_combinations(combinations) if all(elem in input_columns for elem in combination)]
+    rows: List[List[Choice]] = []
+    for combination, targets in zip(combinations, index_compatible_targets(combinations, list(target_columns), tolerance)):
+        uses: Choice = [(input_columns[value], count) for value, count in Counter(combination).items()]
+        rows.append([uses + [(target_columns[target], 1)] for target in targets])
+    return count_covers(need, rows, stop_at_first)
+
+def iter_filter_redundant_combinations_set(input_list: List[Decimal], target_list: List[Decimal], combinations: Iterable[List[Decimal]], tolerance: Decimal = Decimal("0.1"), should_stop: Optional[Callable[[], bool]] = None, stats: Optional[SearchStats] = None) -> Iterator[List[List[Decimal]]]:
+    """
+    Filter out redundant combinations, generating the viable combination sets as they are found.
+    The candidate combinations are collected first, as the backtracking revisits them on every path.
+
+    :param input_list: list of candidates, which may contain duplicates, zero, or negative numbers
+    :param target_list: list of targets
+    :param combinations: combinations of elements in input_list that approximate elements in target_list
+    :param tolerance: tolerance level for comparing sums to target values
+    :param should_stop: optional function called at every node, the search ends once it returns True
+    :param stats: optional SearchStats counting the nodes and the pruned branches
+
+    :return: iterator of viable combinations
     """
     x_counts: Dict[Decimal, int] = count_occurrences(input_list)
     y_counts: Dict[Decimal, int] = count_occurrences(target_list)
@@ -158,5 +336,86 @@ def filter_redundant_combinations_set(input_list: List[Decimal], target_list: Li
     x_remaining: Dict[Decimal, int] = x_counts.copy()
     y_remaining: Dict[Decimal, int] = y_counts.copy()
 
-    results: List[List[List[Decimal]]] = backtrack(x_counts, y_counts, combinations, [], 0, x_remaining, y_remaining,tolerance)
-    return results
\ No newline at end of file
+    # Each distinct combination is kept once, the backtracking can take it for several targets
+    yield from iter_backtrack(x_counts, y_counts, duplicate_int.unique_combinations(combinations), [], 0, x_remaining, y_remaining, tolerance, should_stop=should_stop, stats=stats)
+
+def iter_scaled_sum_combinations(input_list: List[Decimal], target_list: List[Decimal], tolerance: Decimal = Decimal("0.1"), engine: str = "recursive", should_stop: Optional[Callable[[], bool]] = None, stats: Optional[SearchStats] = None) -> Iterator[List[Decimal]]:
+    """
+    Generate the combinations of input_list that approximate the values in target_list, searching on scaled integers
+    as iter_scaled_combinations_set does, and mapping each combination back to the original Decimal values.
+
+    :param input_list: list of candidates, which may contain duplicates, zero, or negative numbers
+    :param target_list: list of targets
+    :param tolerance: tolerance level for comparing sums to target values
+    :param engine: see iter_scaled_combinations_set
+    :param should_stop: optional function called at every node, the search ends once it returns True
+    :param stats: optional SearchStats counting the nodes, the pruned branches and the combinations of each target
+
+    :return: iterator of combinations, target by target
+    """
+    if engine not in ("recursive", "vectorized"):
+        raise ValueError(f"unknown engine: {engine}")
+    scale = detect_scale(input_list + target_list + [tolerance])
+    scaled_input: List[int] = to_scaled(input_list, scale)
+    scaled_target: List[int] = to_scaled(target_list, scale)
+    scaled_tolerance: int = to_scaled([tolerance], scale)[0]
+    originals: Dict[int, Decimal] = map_scaled(input_list, scaled_input)
+    if stats is not None:
+        stats.target_scale = scale
+
+    if scaled_tolerance == 0:
+        combinations = duplicate_int.iter_sum_combinations(scaled_input, scaled_target, engine, should_stop=should_stop, stats=stats)
+    else:
+        combinations = iter_sum_combinations(scaled_input, scaled_target, scaled_tolerance, engine=engine, should_stop=should_stop, stats=stats)
+    for combination in combinations:
+        yield [originals[elem] for elem in combination]
+
+def iter_scaled_combinations_set(input_list: List[Decimal], target_list: List[Decimal], tolerance: Decimal = Decimal("0.1"), engine: str = "recursive", should_stop: Optional[Callable[[], bool]] = None, stats: Optional[SearchStats] = None, combinations: Optional[Iterable[List[Decimal]]] = None) -> Iterator[List[List[Decimal]]]:
+    """
+    Find the viable combination sets on scaled integers instead of Decimal values.
+    Inputs, targets and tolerance are converted once to integers in units of the smallest decimal place in the data,
+    the search runs on int arithmetic, and the results are mapped back to the original Decimal values.
+    With a tolerance of 0, the integer module is used, with its reachability pruning.
+
+    :param input_list: list of candidates, which may contain duplicates, zero, or negative numbers
+    :param target_list: list of targets
+    :param tolerance: tolerance level for comparing sums to target values
+    :param engine: "recursive" to search the combinations in Python, 
+        "vectorized" to look up the last candidates of each branch in int64 subset sums computed with NumPy, when it is installed
+    :param should_stop: optional function called at every node of both searches, e.g. SearchBudget from utility.budget,
+        the search ends once it returns True
+    :param stats: optional SearchStats counting the nodes and pruned branches of both searches, and timing them as two stages
+    :param combinations: candidate combinations of the original values, e.g. from iter_scaled_sum_combinations or a cache,
+        None to search them
+
+    :return: iterator of viable combinations, with the same results as iter_filter_redundant_combinations_set
+    """
+    if engine not in ("recursive", "vectorized"):
+        raise ValueError(f"unknown engine: {engine}")
+    scale = detect_scale(input_list + target_list + [tolerance])
+    logger.info('---searching on integers scaled by 10^%s---', scale)
+    scaled_input: List[int] = to_scaled(input_list, scale)
+    scaled_target: List[int] = to_scaled(target_list, scale)
+    scaled_tolerance: int = to_scaled([tolerance], scale)[0]
+    originals: Dict[int, Decimal] = map_scaled(input_list, scaled_input)
+    if stats is not None:
+        stats.target_scale = scale
+
+    if combinations is not None:
+        scaled_combinations: Iterable[List[int]] = [to_scaled(combination, scale) for combination in combinations]
+    elif scaled_tolerance == 0:
+        scaled_combinations = duplicate_int.iter_sum_combinations(scaled_input, scaled_target, engine, should_stop=should_stop, stats=stats)
+    else:
+        # the functions of this module only subtract and compare, so they run on integers as well
+        scaled_combinations = iter_sum_combinations(scaled_input, scaled_target, scaled_tolerance, engine=engine, should_stop=should_stop, stats=stats)
+    if stats is not None:
+        scaled_combinations = stats.timed("sum_combinations", scaled_combinations)
+
+    if scaled_tolerance == 0:
+        results = duplicate_int.iter_filter_redundant_combinations_set(scaled_input, scaled_target, scaled_combinations, should_stop=should_stop, stats=stats)
+    else:
+        results = iter_filter_redundant_combinations_set(scaled_input, scaled_target, scaled_combinations, scaled_tolerance, should_stop, stats)
+    if stats is not None:
+        results = stats.timed("filter_redundant_combinations_set", results)
+    for result in results:
+        yield [[originals[elem] for elem in combination] for combination in result]
@@ -0,0 +1,203 @@
+"""
+Meet-in-the-middle enumeration of the combinations that sum up to a target.
+
+The sorted candidates are split into two halves, the sub-multiset sums of each half are enumerated once,
+and the combinations of a target are found by joining the sums of one half on `target - sum` in the other.
+The sub-multisets of each half are kept as bitmasks, and only the matching pairs are turned into tuples of values.
+This trades the O(2^n) recursion of `find_combinations` for O(2^(n/2)) work and memory per half.
+"""
+
+from bisect import bisect_left, bisect_right
+from itertools import groupby
+from typing import Dict, Iterator, List, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def group_candidates(candidates: List[int]) -> List[Tuple[int, int]]:
+    """
+    group the sorted candidates into (value, count) pairs
+
+    :param candidates: sorted list of candidates, which may contain duplicates
+
+    :return: list of (value, count) pairs in ascending order of value
+    """
+    return [(value, len(list(copies))) for value, copies in groupby(candidates)]
+
+
+# sub-multisets of one half of the sorted candidates: the values of the half,
+# and the bitmasks over these values of the sub-multisets of each sum
+HalfSubsets = Tuple[List[int], Dict[int, List[int]]]
+
+
+def enumerate_subset_sums(groups: List[Tuple[int, int]]) -> Tuple[List[int], List[int]]:
+    """
+    enumerate every distinct sub-multiset of the grouped candidates together with its sum
+
+    a sub-multiset is kept as a bitmask over the flattened groups, the copies of a value being taken from
+    the start of their run, so that only an int is stored per sub-multiset instead of a tuple of its values
+
+    :param groups: list of (value, count) pairs in ascending order of value
+
+    :return: sums and bitmasks of the sub-multisets, as two lists of the same length
+    """
+    sums: List[int] = [0]
+    masks: List[int] = [0]
+    position = 0
+    for value, count in groups:
+        new_sums: List[int] = []
+        new_masks: List[int] = []
+        for copies in range(count + 1):
+            added, bits = value * copies, ((1 << copies) - 1) << position
+            new_sums.extend([subset_sum + added for subset_sum in sums])
+            new_masks.extend([mask | bits for mask in masks])
+        sums, masks = new_sums, new_masks
+        position += count
+    return sums, masks
+
+
+def subset_values(values: List[int], mask: int) -> Tuple[int, ...]:
+    """
+    :param values: sorted values of a half, see HalfSubsets
+    :param mask: bitmask of a sub-multiset of values
+
+    :return: the sub-multiset as a sorted tuple of values
+    """
+    combination: List[int] = []
+    while mask:
+        low = mask & -mask
+        combination.append(values[low.bit_length() - 1])
+        mask ^= low
+    return tuple(combination)
+
+
+def group_subset_sums(groups: List[Tuple[int, int]]) -> HalfSubsets:
+    """
+    :param groups: list of (value, count) pairs in ascending order of value
+
+    :return: the values of the groups, and the bitmasks of their sub-multisets by sum
+    """
+    by_sum: Dict[int, List[int]] = {}
+    for subset_sum, mask in zip(*enumerate_subset_sums(groups)):
+        by_sum.setdefault(subset_sum, []).append(mask)
+    return [value for value, count in groups for _ in range(count)], by_sum
+
+
+def split_subset_sums(candidates: List[int]) -> Tuple[HalfSubsets, HalfSubsets]:
+    """
+    split the sorted candidates into two halves and enumerate the sub-multiset sums of each half
+
+    the split is made on a value boundary so that all copies of a value fall into the same half,
+    which keeps every combination distinct after the join
+
+    :param candidates: sorted list of candidates, which may contain duplicates
+
+    :return: (left, right), the sub-multisets of the lower and of the upper half grouped by sum
+    """
+    groups = group_candidates(candidates)
+    # find the value boundary closest to the middle of the candidates
+    split, seen = 0, 0
+    while split < len(groups) and seen + groups[split][1] <= len(candidates) // 2:
+        seen += groups[split][1]
+        split += 1
+
+    left = group_subset_sums(groups[:split])
+    right = group_subset_sums(groups[split:])
+    logger.info('---%s left and %s right subset sums enumerated---',
+                sum(len(masks) for masks in left[1].values()), sum(len(masks) for masks in right[1].values()))
+    return left, right
+
+
+def iter_joined_subsets(left: HalfSubsets, right: HalfSubsets, target: int, tolerance: int = 0) -> Iterator[Tuple[int, ...]]:
+    """
+    generate the sub-multisets of the two halves whose sum is within tolerance of target,
+    only building the tuple of values of the matching pairs
+
+    :param left: sub-multisets of the lower half, from split_subset_sums
+    :param right: sub-multisets of the upper half, from split_subset_sums
+    :param target: target sum
+    :param tolerance: tolerance level for comparing sums to the target, 0 for an exact match
+
+    :return: iterator of sorted combinations, including the empty one if it matches
+    """
+    left_values, left_sums = left
+    right_values, right_sums = right
+    if tolerance:
+        ordered = sorted(right_sums)
+    for left_sum, left_masks in left_sums.items():
+        remaining = target - left_sum
+        if tolerance:
+            lower = bisect_left(ordered, remaining - tolerance)
+            upper = bisect_right(ordered, remaining + tolerance)
+            right_masks = [mask for right_sum in ordered[lower:upper] for mask in right_sums[right_sum]]
+        else:
+            right_masks = right_sums.get(remaining, [])
+        if not right_masks:
+            continue
+        right_combinations = [subset_values(right_values, mask) for mask in right_masks]
+        for left_mask in left_masks:
+            left_combination = subset_values(left_values, left_mask)
+            for right_combination in right_combinations:
+                yield left_combination + right_combination
+
+
+def reaches_target_early(combination: Tuple[int, ...], target: int, tolerance: int = 0) -> bool:
+    """
+    check if a non-empty proper prefix of the sorted combination already reaches the target
+
+    `find_combinations` stops descending as soon as the target is reached, so such combinations are never
+    produced by the recursion and are excluded here to return the same combinations
+
+    :param combination: sorted combination of values
+    :param target: target sum
+    :param tolerance: tolerance level for comparing the prefix sums to the target
+
+    :return: True if a proper prefix sums up to the target, False otherwise
+    """
+    running = 0
+    for value in combination[:-1]:
+        running += value
+        if abs(target - running) <= tolerance:
+            return True
+    return False
+
+
+def find_combinations_meet_in_middle(target: int, left: HalfSubsets, right: HalfSubsets, tolerance: int = 0) -> List[List[int]]:
+    """
+    find all combinations that sum to target by joining the subset sums of the two halves
+
+    :param target: target sum
+    :param left: sub-multisets of the lower half, as returned by `split_subset_sums`
+    :param right: sub-multisets of the upper half, as returned by `split_subset_sums`
+    :param tolerance: tolerance level for comparing sums to the target, 0 for an exact match
+
+    :return: list of combinations in the same order as produced by `find_combinations`
+    """
+    if abs(target) <= tolerance:  # the recursion stops at the empty path
+        return [[]]
+
+    result: List[List[int]] = [list(combination) for combination in iter_joined_subsets(left, right, target, tolerance)
+                               if combination and not reaches_target_early(combination, target, tolerance)]
+    # the recursion explores the sorted candidates in ascending order, which is the lexicographic order
+    result.sort()
+    return result
+
+
+def find_zero_sum_combinations(candidates: List[int], tolerance: int = 0) -> List[List[int]]:
+    """
+    find every distinct non-empty sub-multiset of the candidates whose sum is 0, within the tolerance
+
+    the sums of the two halves are joined on `-sum`, so copies of a value are taken by multiplicity
+    and each sub-multiset is found once, whatever the number of copies in the candidates
+
+    :param candidates: sorted list of candidates, which may contain duplicates, zero, or negative numbers
+    :param tolerance: tolerance level for comparing sums to 0, 0 for an exact match
+
+    :return: list of combinations in lexicographic order
+    """
+    left, right = split_subset_sums(candidates)
+    result: List[List[int]] = [list(combination) for combination in iter_joined_subsets(left, right, 0, tolerance) if combination]
+    result.sort()
+    logger.info('---found %s combinations that sum up to 0---', len(result))
+    return result
@@ -0,0 +1,464 @@
+"""
+Parallel enumeration of the combinations and of the viable combination sets across processes.
+
+The work for each target is independent: every worker receives the sorted candidates once, through the pool
+initializer, and searches whole targets, or a single first branch of a target when the candidates are many.
+The results are collected in submission order, so the output matches the serial sum_combinations.
+
+The backtracking is split the same way: the take/skip decisions on the first combinations give independent
+subtrees, which are run on the pool and merged back in the order of the serial search.
+
+Both searches stream their results in that order as soon as the earlier tasks are done. The parent process
+polls should_stop while it waits, and the workers poll a shared cancel flag, so a budget stops every worker.
+The workers add their nodes to a shared counter, which the parent charges to the budget as it polls, and the
+statistics of each task are added to the stats as it ends.
+"""
+
+from array import array
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError
+from itertools import islice
+from multiprocessing.sharedctypes import Synchronized
+from multiprocessing.synchronize import Event
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+import logging
+import multiprocessing
+from combination.counting import Choice
+from combination.duplicate_int import (
+    build_rows,
+    count_occurrences,
+    index_columns,
+    iter_combination_indexes,
+    prepare_candidates,
+    search_backtrack,
+    to_indexes,
+    unique_combinations,
+)
+from combination.pruning import build_reachable_sums, build_suffix_bounds, is_reachable
+from combination.stats import SearchStats
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# read-only search state of a worker process, set by init_search_worker or init_backtrack_worker
+search_state: Dict[str, object] = {}
+
+# a target, and the index of the first candidate of its combinations, or None for all of them
+SearchTask = Tuple[int, Optional[int]]
+
+# results of a task, and its statistics if they are collected
+TaskResult = Tuple[List[T], Optional[SearchStats]]
+
+# seconds between two calls of should_stop while the parent waits for a task
+POLL_SECONDS = 0.1
+
+
+class WorkerStop:
+    """
+    should_stop of a task in a worker process: counts the nodes of the task in the counter shared with the parent,
+    and polls the cancel flag of the parent.
+    """
+
+    def __init__(self, cancel: Event, counter: Synchronized, check_every: int = 1024) -> None:
+        """
+        :param cancel: flag set by the parent process to stop every worker
+        :param counter: nodes visited by all the workers
+        :param check_every: number of nodes between two updates of the counter and readings of the flag,
+            doing it at every node would dominate the search
+        """
+        self.cancel = cancel
+        self.counter = counter
+        self.check_every = check_every
+        self.nodes = 0
+        self.stopped = False
+
+    def __call__(self) -> bool:
+        self.nodes += 1
+        if not self.stopped and self.nodes % self.check_every == 0:
+            self.add_nodes(self.check_every)
+            self.stopped = self.cancel.is_set()
+        return self.stopped
+
+    def add_nodes(self, nodes: int) -> None:
+        with self.counter.get_lock():
+            self.counter.value += nodes
+
+    def close(self) -> None:
+        """
+        add the nodes counted since the last update to the shared counter, at the end of the task
+        """
+        self.add_nodes(self.nodes % self.check_every)
+
+
+def iter_task_results(
+    executor: ProcessPoolExecutor,
+    task_function: Callable[..., TaskResult],
+    tasks: List,
+    cancel: Event,
+    counter: Synchronized,
+    should_stop: Optional[Callable[[], bool]] = None,
+    stats: Optional[SearchStats] = None,
+) -> Iterator[Tuple[object, List[T]]]:
+    """
+    submit the tasks to the pool and generate their results in task order, each as soon as it and the earlier ones are done
+
+    :param executor: process pool, its workers initialized with cancel and counter
+    :param task_function: function run on each task in a worker
+    :param tasks: tasks to run
+    :param cancel: flag polled by the workers, set once should_stop returns True or the results are no longer read
+    :param counter: nodes visited by the workers, see WorkerStop
+    :param should_stop: optional function called while waiting and after each task; the nodes of the workers
+        are charged to it with its charge method if it has one, e.g. SearchBudget from utility.budget
+    :param stats: optional SearchStats to which the statistics of each task are added
+
+    :return: iterator of (task, results of the task)
+    """
+    charge: Optional[Callable[[int], bool]] = getattr(should_stop, "charge", None)
+
+    charged: List[int] = [0]
+
+    def spent() -> bool:
+        # a budget reads its clock only every so many calls, charging it reads the clock every time
+        if should_stop is None:
+            return False
+        if charge is None:
+            return should_stop()
+        nodes = counter.value
+        nodes, charged[0] = nodes - charged[0], nodes
+        return charge(nodes)
+
+    futures: List[Future] = [executor.submit(task_function, task) for task in tasks]
+    try:
+        for task, future in zip(tasks, futures):
+            while True:
+                try:
+                    results, task_stats = future.result(timeout=POLL_SECONDS)
+                    break
+                except TimeoutError:
+                    if spent():
+                        return
+            if stats is not None and task_stats is not None:
+                stats.merge(task_stats)
+            yield task, results
+            if spent():
+                return
+    finally:
+        # the workers stop at their next check, and the tasks not started yet are dropped
+        cancel.set()
+        for future in futures:
+            future.cancel()
+
+
+def init_search_worker(
+    candidates: List[int],
+    prune: bool,
+    cancel: Event,
+    counter: Synchronized,
+    collect_stats: bool = False,
+) -> None:
+    """
+    store the sorted candidates and their pruning tables in the worker process
+
+    :param candidates: sorted list of candidates
+    :param prune: whether to skip branches that cannot reach the target
+    :param cancel: flag set by the parent process to stop the searches
+    :param counter: nodes visited by all the workers
+    :param collect_stats: whether each task counts its nodes and pruned branches in a SearchStats
+    """
+    search_state["candidates"] = candidates
+    search_state["reachable"] = build_reachable_sums(candidates) if prune else None
+    search_state["bounds"] = build_suffix_bounds(candidates) if prune else None
+    search_state["cancel"] = cancel
+    search_state["counter"] = counter
+    search_state["collect_stats"] = collect_stats
+
+
+def search_task(task: SearchTask) -> TaskResult[Tuple[int, ...]]:
+    """
+    find the combinations of a target in the worker process
+
+    :param task: the target, and the index of the first candidate of the combinations to find, or None for all of them
+
+    :return: index tuples of the combinations, in the order of iter_combination_indexes, and the statistics
+    """
+    target, first = task
+    candidates = search_state["candidates"]
+    reachable = search_state["reachable"]
+    bounds = search_state["bounds"]
+    stats = SearchStats() if search_state["collect_stats"] else None
+    if first is None:
+        start, remaining, path = 0, target, []
+    else:
+        # the first level of iter_combination_indexes, restricted to one branch
+        start, remaining, path = first + 1, target - candidates[first], [first]
+        if bounds is not None and not bounds[0][start] <= remaining <= bounds[1][start]:
+            return [], stats
+        if reachable is not None and remaining != 0 and not is_reachable(reachable, start, remaining):
+            return [], stats
+    should_stop = WorkerStop(search_state["cancel"], search_state["counter"])
+    indexes = list(iter_combination_indexes(candidates, remaining, start, path, reachable, bounds, should_stop, stats))
+    should_stop.close()
+    return indexes, stats
+
+
+def iter_parallel_sum_combination_indexes(
+    input_list: List[int],
+    target_list: List[int],
+    max_workers: Optional[int] = None,
+    split_threshold: int = 32,
+    prune: bool = True,
+    should_stop: Optional[Callable[[], bool]] = None,
+    stats: Optional[SearchStats] = None,
+) -> Iterator[Tuple[int, ...]]:
+    """
+    generate all combinations of input_list that sum to target_list as tuples of indexes into sorted(input_list),
+    searching the targets on a process pool
+
+    :param input_list: list of candidates, which may contain duplicates
+    :param target_list: list of targets
+    :param max_workers: number of worker processes, defaults to the number of CPUs
+    :param split_threshold: number of candidates from which each first branch of a target is a separate task
+    :param prune: whether to skip branches that cannot reach the target
+    :param should_stop: see iter_task_results, e.g. SearchBudget from utility.budget
+    :param stats: optional SearchStats counting the nodes, the pruned branches and the combinations of each target
+
+    :return: iterator of index tuples, in the same order as iter_sum_combination_indexes
+    """
+    logger.info('---finding combinations in parallel---')
+    zero_sum_combinations, candidates, targets = prepare_candidates(input_list, target_list)
+    for zero_sum_combination in zero_sum_combinations:
+        yield to_indexes(candidates, zero_sum_combination)
+
+    # prepare_candidates keeps each distinct target once, copies of a target share its combinations
+    tasks: List[SearchTask] = []
+    for target in targets:
+        if len(candidates) < split_threshold:
+            tasks.append((target, None))
+            continue
+        for first in range(len(candidates)):
+            if first == 0 or candidates[first] != candidates[first - 1]:
+                tasks.append((target, first))
+    logger.info('---%s tasks for %s distinct targets---', len(tasks), len(targets))
+
+    cancel, counter = multiprocessing.Event(), multiprocessing.Value('q', 0)
+    initargs = (candidates, prune, cancel, counter, stats is not None)
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=init_search_worker, initargs=initargs) as executor:
+        results = iter_task_results(executor, search_task, tasks, cancel, counter, should_stop, stats)
+        try:
+            for (target, _), indexes in results:
+                yield from indexes if stats is None else stats.count_found(target, indexes)
+        finally:
+            # closing the results cancels the tasks left when the combinations are no longer read
+            results.close()
+
+
+def parallel_sum_combinations(
+    input_list: List[int],
+    target_list: List[int],
+    max_workers: Optional[int] = None,
+    split_threshold: int = 32,
+    prune: bool = True,
+) -> List[List[int]]:
+    """
+    find all combinations of input_list that sum to target_list, searching the targets on a process pool
+
+    :param input_list: list of candidates, which may contain duplicates
+    :param target_list: list of targets
+    :param max_workers: number of worker processes, defaults to the number of CPUs
+    :param split_threshold: number of candidates from which each first branch of a target is a separate task
+    :param prune: whether to skip branches that cannot reach the target
+
+    :return: list of combinations, in the same order as sum_combinations
+    """
+    candidates = sorted(input_list)
+    return [[candidates[i] for i in indexes]
+            for indexes in iter_parallel_sum_combination_indexes(input_list, target_list, max_workers, split_threshold, prune)]
+
+
+# taken combination indexes among the first split_depth ones, and the index the subtree search starts from
+SubtreeTask = Tuple[Tuple[int, ...], int]
+
+
+def init_backtrack_worker(
+    input_count: Dict[int, int],
+    target_count: Dict[int, int],
+    combinations: List[List[int]],
+    cancel: Event,
+    counter: Synchronized,
+    max_solutions: Optional[int],
+    candidates: Optional[List[int]] = None,
+    collect_stats: bool = False,
+) -> None:
+    """
+    store the backtracking state shared by all subtrees in the worker process
+
+    :param input_count: dictionary of occurrences of each element in input_list
+    :param target_count: dictionary of occurrences of each element in target_list
+    :param combinations: list of combinations of elements in input_list that sum to elements in target_list
+    :param cancel: flag set by the parent process once enough solutions are found or the budget is used up
+    :param counter: nodes visited by all the workers
+    :param max_solutions: maximum number of solutions of a single subtree, None for all of them
+    :param candidates: sorted candidates the combinations index into, None if the combinations are lists of values
+    :param collect_stats: whether each subtree counts its nodes and pruned branches in a SearchStats
+    """
+    input_columns, target_columns, need = index_columns(input_count, target_count)
+    search_state["rows"] = build_rows(combinations, input_columns, target_columns, candidates)
+    search_state["need"] = need
+    search_state["cancel"] = cancel
+    search_state["counter"] = counter
+    search_state["max_solutions"] = max_solutions
+    search_state["collect_stats"] = collect_stats
+
+
+def apply_prefix(rows: List[Optional[Choice]], need: List[int], prefix: Tuple[int, ...]) -> Tuple[array, int]:
+    """
+    compute the remaining count of each column after taking the combinations of a prefix
+
+    :param rows: columns used by each combination, from build_rows
+    :param need: count of each column
+    :param prefix: indexes of the taken combinations, all viable together
+
+    :return: remaining count of each column, and the number of columns whose remaining count is not 0
+    """
+    remaining = array('q', need)
+    for index in prefix:
+        for column, count in rows[index]:
+            remaining[column] -= count
+    return remaining, sum(1 for count in remaining if count != 0)
+
+
+def search_subtree(task: SubtreeTask) -> TaskResult[List[int]]:
+    """
+    run the backtracking below a prefix of take/skip decisions in the worker process
+
+    :param task: the taken combination indexes of the prefix, and the index to continue from
+
+    :return: viable combination sets as lists of combination indexes, and the statistics
+    """
+    prefix, start = task
+    rows = search_state["rows"]
+    max_solutions = search_state["max_solutions"]
+    remaining, unfilled = apply_prefix(rows, search_state["need"], prefix)
+    should_stop = WorkerStop(search_state["cancel"], search_state["counter"])
+    stats = SearchStats() if search_state["collect_stats"] else None
+
+    solutions: List[List[int]] = []
+    for solution in search_backtrack(list(range(len(rows))), rows, list(prefix), start, remaining, unfilled, should_stop, stats):
+        solutions.append(solution)
+        if max_solutions is not None and len(solutions) >= max_solutions:
+            break
+    should_stop.close()
+    return solutions, stats
+
+
+def split_subtrees(rows: List[Optional[Choice]], need: List[int], split_depth: int) -> List[SubtreeTask]:
+    """
+    enumerate the viable take/skip decisions on the first combinations, in the order of the serial search
+
+    a combination can be taken again before moving on to the next one, as in search_backtrack
+
+    :param rows: columns used by each combination, from build_rows
+    :param need: count of each column
+    :param split_depth: number of combinations decided before splitting
+
+    :return: list of subtree tasks
+    """
+    depth = min(split_depth, len(rows))
+    tasks: List[SubtreeTask] = []
+    remaining = list(need)
+
+    def split(index: int, prefix: List[int], unfilled: int) -> None:
+        # a complete prefix, or the split depth, is a subtree of its own
+        if unfilled == 0 or index == depth:
+            tasks.append((tuple(prefix), depth))
+            return
+        row = rows[index]
+        if row is not None and all(remaining[column] >= count for column, count in row):
+            filled = 0
+            for column, count in row:
+                remaining[column] -= count
+                if remaining[column] == 0:
+                    filled += 1
+            prefix.append(index)
+            split(index, prefix, unfilled - filled)
+            prefix.pop()
+            for column, count in row:
+                remaining[column] += count
+        split(index + 1, prefix, unfilled)
+
+    split(0, [], sum(1 for count in remaining if count != 0))
+    return tasks
+
+
+def iter_parallel_filter_redundant_combinations_set(
+    input_list: List[int],
+    target_list: List[int],
+    combinations: List[List[int]],
+    split_depth: int = 8,
+    max_workers: Optional[int] = None,
+    max_solutions: Optional[int] = None,
+    candidates: Optional[List[int]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    stats: Optional[SearchStats] = None,
+) -> Iterator[List[List[int]]]:
+    """
+    filter out redundant combinations, splitting the take/skip tree of the backtracking into subtrees run on a process pool,
+    and generate the viable combination sets in the order of the serial search as the subtrees are done
+
+    the subtrees are queued on the pool so that idle workers pick up the next one, as their sizes are very uneven
+
+    :param input_list: list of candidates, which may contain duplicates, zero, or negative numbers
+    :param target_list: list of targets which may contain duplicates, zero, or negative numbers and to be summed to
+    :param combinations: combinations of elements in input_list that sum to elements in target_list
+    :param split_depth: number of combinations decided before splitting, giving up to 2^split_depth subtrees
+    :param max_workers: number of worker processes, defaults to the number of CPUs
+    :param max_solutions: stop all workers once this many viable combination sets are found, None for all of them
+    :param candidates: sorted candidates the combinations index into, e.g. from iter_parallel_sum_combination_indexes;
+        the viable combination sets are then made of the same index tuples. None if the combinations are lists of values
+    :param should_stop: see iter_task_results, e.g. SearchBudget from utility.budget
+    :param stats: optional SearchStats counting the nodes and the pruned branches of the search
+
+    :return: iterator of viable combination sets, in the order of iter_filter_redundant_combinations_set
+    """
+    combinations = unique_combinations(combinations)
+    if should_stop is not None and should_stop():
+        return
+    input_count: Dict[int, int] = count_occurrences(input_list)
+    target_count: Dict[int, int] = count_occurrences(target_list)
+    input_columns, target_columns, need = index_columns(input_count, target_count)
+    tasks = split_subtrees(build_rows(combinations, input_columns, target_columns, candidates), need, split_depth)
+    logger.info('---backtracking %s subtrees in parallel---', len(tasks))
+
+    cancel, counter = multiprocessing.Event(), multiprocessing.Value('q', 0)
+    initargs = (input_count, target_count, combinations, cancel, counter, max_solutions, candidates, stats is not None)
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=init_backtrack_worker, initargs=initargs) as executor:
+        results = iter_task_results(executor, search_subtree, tasks, cancel, counter, should_stop, stats)
+        try:
+            for solution in islice((solution for _, solutions in results for solution in solutions), max_solutions):
+                yield [combinations[index] for index in solution]
+        finally:
+            # closing the results cancels the subtrees left, e.g. once max_solutions sets are found
+            results.close()
+
+
+def parallel_filter_redundant_combinations_set(
+    input_list: List[int],
+    target_list: List[int],
+    combinations: List[List[int]],
+    split_depth: int = 8,
+    max_workers: Optional[int] = None,
+    max_solutions: Optional[int] = None,
+) -> List[List[List[int]]]:
+    """
+    filter out redundant combinations, splitting the take/skip tree of the backtracking into subtrees run on a process pool
+
+    :param input_list: list of candidates, which may contain duplicates, zero, or negative numbers
+    :param target_list: list of targets which may contain duplicates, zero, or negative numbers and to be summed to
+    :param combinations: list of combinations of elements in input_list that sum to elements in target_list
+    :param split_depth: number of combinations decided before splitting, giving up to 2^split_depth subtrees
+    :param max_workers: number of worker processes, defaults to the number of CPUs
+    :param max_solutions: stop all workers once this many viable combination sets are found, None for all of them
+
+    :return: list of viable combination sets, in the order of filter_redundant_combinations_set when all are found
+    """
+    return list(iter_parallel_filter_redundant_combinations_set(input_list, target_list, combinations, split_depth, max_workers, max_solutions))
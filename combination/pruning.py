@@ -0,0 +1,86 @@
+"""
+Precomputed tables over the suffixes of the sorted candidates, used to cut dead branches of the search.
+"""
+
+from typing import List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# reachable sums of one suffix as a little-endian bitset, and the sum stored at bit 0
+ReachableSums = Tuple[List[bytes], int]
+
+
+def build_reachable_sums(candidates: List[int], max_bytes: int = 1 << 26) -> Optional[ReachableSums]:
+    """
+    build for each suffix of the sorted candidates the bitset of sums reachable by its sub-multisets
+
+    bit (s - offset) of the i-th bitset is set iff a sub-multiset of candidates[i:] sums to s,
+    the bitsets are computed with Python big-int shifts and stored as bytes for O(1) lookup
+
+    :param candidates: sorted list of integer candidates, which may contain duplicates or negative numbers
+    :param max_bytes: maximum memory of the table, beyond which no table is built
+
+    :return: (bitsets, offset), or None if a candidate is not an int or the table would exceed max_bytes
+    """
+    # the bitsets are indexed by the sums, which only works for integers, e.g. not for Decimal amounts
+    if not all(type(candidate) is int for candidate in candidates):
+        logger.info('---candidates are not all integers, skipping the reachability table---')
+        return None
+    offset = sum(candidate for candidate in candidates if candidate < 0)
+    width = sum(abs(candidate) for candidate in candidates) + 1
+    size = (width + 7) // 8
+    if size * (len(candidates) + 1) > max_bytes:
+        logger.info('---range of sums too wide for a reachability table, skipping---')
+        return None
+
+    bits = 1 << -offset  # the empty sub-multiset sums to 0
+    bitsets: List[bytes] = [b''] * (len(candidates) + 1)
+    bitsets[len(candidates)] = bits.to_bytes(size, 'little')
+    for i in range(len(candidates) - 1, -1, -1):
+        candidate = candidates[i]
+        bits |= bits << candidate if candidate >= 0 else bits >> -candidate
+        bitsets[i] = bits.to_bytes(size, 'little')
+    return bitsets, offset
+
+
+def is_reachable(reachable: ReachableSums, start: int, target: int) -> bool:
+    """
+    check if a sub-multiset of candidates[start:] sums to target
+
+    :param reachable: table returned by build_reachable_sums
+    :param start: start index of the suffix
+    :param target: target sum
+
+    :return: True if target is reachable, False otherwise
+    """
+    bitsets, offset = reachable
+    position = target - offset
+    bitset = bitsets[start]
+    if position < 0 or position >= len(bitset) * 8:
+        return False
+    return bool(bitset[position >> 3] >> (position & 7) & 1)
+
+
+# lowest and highest sums reachable by the sub-multisets of each suffix
+SuffixBounds = Tuple[List, List]
+
+
+def build_suffix_bounds(candidates: List) -> SuffixBounds:
+    """
+    build for each suffix of the sorted candidates the sum of its negatives and the sum of its positives
+
+    every sub-multiset of candidates[i:] sums to a value within [lowest[i], highest[i]], so a branch
+    whose remaining target falls outside these bounds cannot reach the target
+
+    :param candidates: sorted list of integer or decimal candidates, which may contain duplicates or negative numbers
+
+    :return: (lowest, highest), both of length len(candidates) + 1
+    """
+    lowest: List = [0] * (len(candidates) + 1)
+    highest: List = [0] * (len(candidates) + 1)
+    for i in range(len(candidates) - 1, -1, -1):
+        candidate = candidates[i]
+        lowest[i] = lowest[i + 1] + candidate if candidate < 0 else lowest[i + 1]
+        highest[i] = highest[i + 1] + candidate if candidate > 0 else highest[i + 1]
+    return lowest, highest
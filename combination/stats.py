@@ -0,0 +1,173 @@
+"""
+Opt-in statistics of a search: nodes visited, branches pruned by reason, depth, combinations found per target,
+and the time spent in each stage.
+
+The searches take an optional `stats` argument. When it is None, the only cost is one `is not None` test per
+node; when it is given, every node and every pruned branch is counted, and a progress callback can be called
+every `progress_every` nodes, e.g. to log how far a long run has got.
+
+The stages are timed exclusively: a stage pulling its input from another generator stage, as the combination
+set search does from the combination search, is not charged for the time spent in the inner stage.
+"""
+
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from decimal import Decimal
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class SearchStats:
+    """
+    Counters and stage timers shared by the stages of a run.
+    """
+
+    def __init__(self, progress: Optional[Callable[["SearchStats"], None]] = None, progress_every: int = 100000) -> None:
+        """
+        :param progress: optional function called with the statistics every progress_every nodes
+        :param progress_every: number of nodes between two calls of progress
+        """
+        self.nodes = 0
+        self.max_depth = 0
+        self.pruned: Counter = Counter()
+        self.found: Dict[Hashable, int] = {}
+        self.stage_seconds: Dict[str, float] = {}
+        # decimal places of the targets when the search runs on scaled integers, to report them unscaled
+        self.target_scale = 0
+        self.progress = progress
+        self.progress_every = progress_every
+        # [stage, start time, time spent in nested stages] of the stages being run
+        self._stages: List[List[Any]] = []
+
+    def node(self, depth: int) -> None:
+        """
+        Count a node of a search.
+
+        :param depth: number of choices made on the path to the node
+        """
+        self.nodes += 1
+        if depth > self.max_depth:
+            self.max_depth = depth
+        if self.progress is not None and self.nodes % self.progress_every == 0:
+            self.progress(self)
+
+    def prune(self, reason: str) -> None:
+        """
+        Count a branch skipped without being searched.
+
+        :param reason: why the branch was skipped, e.g. "bounds" or "reachable"
+        """
+        self.pruned[reason] += 1
+
+    def count_found(self, target: Hashable, combinations: Iterable[T]) -> Iterator[T]:
+        """
+        Count the combinations found for a target as they go through.
+
+        :param target: target the combinations sum to
+        :param combinations: combinations of the target
+        :return: iterator of the same combinations
+        """
+        self.found.setdefault(target, 0)
+        for combination in combinations:
+            self.found[target] += 1
+            yield combination
+
+    def merge(self, other: "SearchStats") -> None:
+        """
+        Add the nodes and pruned branches counted by another SearchStats, e.g. in a worker process.
+
+        :param other: statistics to add
+        """
+        before = self.nodes
+        self.nodes += other.nodes
+        self.max_depth = max(self.max_depth, other.max_depth)
+        self.pruned.update(other.pruned)
+        if self.progress is not None and self.nodes // self.progress_every > before // self.progress_every:
+            self.progress(self)
+
+    def _enter(self, stage: str) -> None:
+        self._stages.append([stage, time.perf_counter(), 0.0])
+
+    def _leave(self) -> None:
+        stage, started, nested = self._stages.pop()
+        elapsed = time.perf_counter() - started
+        self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + elapsed - nested
+        if self._stages:
+            self._stages[-1][2] += elapsed
+
+    @contextmanager
+    def stage(self, stage: str) -> Iterator[None]:
+        """
+        Time a block of code as a stage.
+
+        :param stage: name of the stage
+        """
+        self._enter(stage)
+        try:
+            yield
+        finally:
+            self._leave()
+
+    def timed(self, stage: str, items: Iterable[T]) -> Iterator[T]:
+        """
+        Time a generator stage, counting only the time spent producing its items.
+
+        :param stage: name of the stage
+        :param items: items of the stage, e.g. an iterator of combinations
+        :return: iterator of the same items
+        """
+        iterator = iter(items)
+        while True:
+            self._enter(stage)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self._leave()
+            yield item
+
+    def target_label(self, target: Hashable) -> str:
+        """
+        :param target: target as searched
+        :return: the target as given, unscaled if the search ran on scaled integers
+        """
+        if self.target_scale and isinstance(target, int):
+            return str(Decimal(target).scaleb(-self.target_scale))
+        return str(target)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        :return: the statistics as a JSON-serializable dictionary
+        """
+        return {
+            "nodes": self.nodes,
+            "max_depth": self.max_depth,
+            "pruned": dict(self.pruned),
+            "found_per_target": {self.target_label(target): count for target, count in self.found.items()},
+            "stage_seconds": {stage: round(seconds, 6) for stage, seconds in self.stage_seconds.items()},
+        }
+
+    def report(self) -> str:
+        """
+        :return: multi-line summary of the statistics
+        """
+        lines = [f"nodes visited: {self.nodes}, maximum depth: {self.max_depth}"]
+        lines.append("branches pruned: " + (", ".join(f"{reason} {count}" for reason, count in self.pruned.most_common()) or "none"))
+        lines.append("combinations per target: " + (", ".join(f"{self.target_label(target)}: {count}" for target, count in self.found.items()) or "none"))
+        lines.extend(f"{stage}: {seconds:.3f}s" for stage, seconds in self.stage_seconds.items())
+        return "\n".join(lines)
+
+
+def log_progress(stats: SearchStats) -> None:
+    """
+    Progress callback logging the nodes visited so far.
+
+    :param stats: statistics of the run
+    """
+    logger.info('---%s nodes visited, %s branches pruned, maximum depth %s---', stats.nodes, sum(stats.pruned.values()), stats.max_depth)
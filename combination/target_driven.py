@@ -0,0 +1,161 @@
+"""
+Target-driven search for the viable combination sets, with forward checking.
+
+Instead of deciding take or skip for each combination in list order, the search always fills the target with
+the fewest candidate combinations left. After each choice, the combinations which now need more of a value than
+remains are dropped, and the search backtracks as soon as a target or an input value is left without any
+candidate. A combination may fill several copies of its target. Combinations filling copies of the same target
+are chosen in nondecreasing index order, so every combination set is generated once.
+"""
+
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+import logging
+from combination.stats import SearchStats
+
+logger = logging.getLogger(__name__)
+
+
+def iter_target_driven_covers(
+    need: List[int],
+    rows: List[Optional[List[Tuple[int, int]]]],
+    targets: List[int],
+    should_stop: Optional[Callable[[], bool]] = None,
+    stats: Optional[SearchStats] = None,
+) -> Iterator[List[int]]:
+    """
+    generate every set of rows using each column exactly as many times as it needs, filling the target columns one by one
+
+    :param need: number of times each column has to be used
+    :param rows: (column, count) pairs used by each row, None for a row which can never be chosen
+    :param targets: columns of the targets, every row uses exactly one of them
+    :param should_stop: optional function called at every node, the search ends once it returns True
+    :param stats: optional SearchStats counting the nodes and the pruned branches
+
+    :return: iterator of sets of rows, each a sorted list of row indexes, a row appearing once per time it is chosen
+    """
+    remaining: List[int] = list(need)
+    # candidate rows of each column, with the number of times the row uses the column
+    candidates: List[Dict[int, int]] = [{} for _ in need]
+    # a row is a candidate while no reason to drop it holds, i.e. its count of reasons is 0
+    dropped: List[int] = [1 if row is None else 0 for row in rows]
+    for index, row in enumerate(rows):
+        if row is None:
+            continue
+        if any(count > remaining[column] for column, count in row):
+            dropped[index] = 1
+            continue
+        for column, count in row:
+            candidates[column][index] = count
+
+    if any(remaining[column] > 0 and not candidates[column] for column in range(len(need))):
+        return
+    unfilled = sum(1 for count in remaining if count != 0)
+    logger.info('---searching %s targets with %s combinations---', len(targets), len(rows))
+    yield from search_target_driven(rows, targets, remaining, candidates, dropped, unfilled, [], should_stop, stats)
+
+
+def drop_row(index: int, rows: List[Optional[List[Tuple[int, int]]]], candidates: List[Dict[int, int]], dropped: List[int]) -> None:
+    """
+    add a reason to drop a row, removing it from the candidates of its columns on the first one
+
+    :param index: index of the row
+    :param rows: (column, count) pairs used by each row
+    :param candidates: candidate rows of each column
+    :param dropped: number of reasons to drop each row
+    """
+    dropped[index] += 1
+    if dropped[index] == 1:
+        for column, _ in rows[index]:
+            del candidates[column][index]
+
+
+def restore_row(index: int, rows: List[Optional[List[Tuple[int, int]]]], candidates: List[Dict[int, int]], dropped: List[int]) -> None:
+    """
+    remove a reason to drop a row, putting it back into the candidates of its columns on the last one
+
+    :param index: index of the row
+    :param rows: (column, count) pairs used by each row
+    :param candidates: candidate rows of each column
+    :param dropped: number of reasons to drop each row
+    """
+    dropped[index] -= 1
+    if dropped[index] == 0:
+        for column, count in rows[index]:
+            candidates[column][index] = count
+
+
+def search_target_driven(
+    rows: List[Optional[List[Tuple[int, int]]]],
+    targets: List[int],
+    remaining: List[int],
+    candidates: List[Dict[int, int]],
+    dropped: List[int],
+    unfilled: int,
+    chosen: List[int],
+    should_stop: Optional[Callable[[], bool]] = None,
+    stats: Optional[SearchStats] = None,
+) -> Iterator[List[int]]:
+    """
+    recursive step of iter_target_driven_covers
+
+    :param rows: (column, count) pairs used by each row
+    :param targets: columns of the targets
+    :param remaining: remaining count of each column
+    :param candidates: candidate rows of each column, with the number of times they use it
+    :param dropped: number of reasons to drop each row
+    :param unfilled: number of columns whose remaining count is not 0
+    :param chosen: rows chosen so far
+    :param should_stop: optional function called at every node, the search ends once it returns True
+    :param stats: optional SearchStats counting the nodes and the pruned branches
+
+    :return: iterator of sets of rows, each a sorted list of row indexes
+    """
+    if should_stop is not None and should_stop():
+        return
+    if stats is not None:
+        stats.node(len(chosen))
+    if unfilled == 0:
+        yield sorted(chosen)
+        return
+
+    # branch on the open target with the fewest candidates
+    open_targets = [column for column in targets if remaining[column] > 0]
+    if not open_targets:
+        return
+    target = min(open_targets, key=lambda column: len(candidates[column]))
+
+    branches = sorted(candidates[target])
+    for index in branches:
+        # the row stays a candidate below this branch, so that it can fill another copy of the target
+        filled = 0
+        for column, count in rows[index]:
+            remaining[column] -= count
+            if remaining[column] == 0:
+                filled += 1
+
+        # forward checking: drop the rows which now need more of a column than remains
+        forced: List[int] = []
+        touched: Set[int] = {column for column, _ in rows[index]}
+        for column, _ in rows[index]:
+            for other in [other for other, count in candidates[column].items() if count > remaining[column]]:
+                if stats is not None:
+                    stats.prune("conflict")
+                drop_row(other, rows, candidates, dropped)
+                forced.append(other)
+                touched.update(used for used, _ in rows[other])
+        # backtrack as soon as a target or an input value is left without candidates
+        if not any(remaining[column] > 0 and not candidates[column] for column in touched):
+            chosen.append(index)
+            yield from search_target_driven(rows, targets, remaining, candidates, dropped, unfilled - filled, chosen, should_stop, stats)
+            chosen.pop()
+        elif stats is not None:
+            stats.prune("dead_end")
+
+        for other in reversed(forced):
+            restore_row(other, rows, candidates, dropped)
+        for column, count in rows[index]:
+            remaining[column] += count
+        # the row is dropped for the next branches, so that copies of the target are filled in index order
+        drop_row(index, rows, candidates, dropped)
+    for index in branches:
+        restore_row(index, rows, candidates, dropped)
@@ -0,0 +1,233 @@
+"""
+Vectorized enumeration of the combinations near the bottom of the search, with NumPy.
+
+The recursion of `find_combinations` spends most of its nodes on the last few candidates. Here the search
+descends in Python until at most `block_size` candidates are left, then looks the remaining target up in the
+subset sums of that suffix, computed once per suffix as a NumPy array of 2^k sums indexed by bit mask.
+
+The suffix tables only keep the canonical masks, where copies of a value are taken from the start of their run,
+so every combination is found once, and the matches are filtered by the same prefix rule as the recursion, which
+stops as soon as the target is reached. The combinations are the same, in the same order, as `find_combinations`.
+
+NumPy is optional: without it, or with values too large for int64, the whole search runs in Python.
+Decimal data is searched as integers scaled by `combination.fixed_point`.
+"""
+
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import logging
+from combination.pruning import SuffixBounds, build_suffix_bounds
+from combination.stats import SearchStats
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+    HAS_NUMPY = False
+
+logger = logging.getLogger(__name__)
+
+# 2^20 int64 sums and masks take 16 MiB, the tables of all the shorter suffixes as much again
+DEFAULT_BLOCK_SIZE = 20
+
+# subset sums of a suffix, sorted, and the canonical masks giving them
+LeafTable = Tuple["np.ndarray", "np.ndarray"]
+
+
+def fits_int64(candidates: List[int]) -> bool:
+    """
+    check that the candidates are integers and that every subset sum of them fits in int64
+
+    :param candidates: list of candidates
+
+    :return: True if the sums can be computed with NumPy without overflow
+    """
+    return all(isinstance(value, int) for value in candidates) and sum(abs(value) for value in candidates) < 2 ** 62
+
+
+def build_leaf_table(values: List[int]) -> LeafTable:
+    """
+    compute the sums of all canonical subsets of the sorted values, sorted for binary search
+
+    :param values: sorted values of a suffix of the candidates
+
+    :return: sorted sums and the bit masks giving them, bit j standing for values[j]
+    """
+    sums = np.zeros(1, dtype=np.int64)
+    for value in values:
+        # the masks with bit j set are the second half, so the sums stay indexed by mask
+        sums = np.concatenate((sums, sums + value))
+    masks = np.arange(len(sums), dtype=np.int64)
+
+    # a copy of a value may only be taken if the copy before it is taken too
+    canonical = np.ones(len(sums), dtype=bool)
+    for j in range(1, len(values)):
+        if values[j] == values[j - 1]:
+            canonical &= ((masks >> j) & 1) <= ((masks >> (j - 1)) & 1)
+    masks = masks[canonical]
+    sums = sums[canonical]
+    order = np.argsort(sums, kind="stable")
+    return sums[order], masks[order]
+
+
+def build_leaf_tables(candidates: List[int], block_size: int) -> Dict[int, LeafTable]:
+    """
+    compute the leaf table of every suffix of at most block_size candidates
+
+    :param candidates: sorted list of candidates
+    :param block_size: largest number of candidates enumerated at once
+
+    :return: dictionary of start index to leaf table
+    """
+    tables: Dict[int, LeafTable] = {}
+    for start in range(max(len(candidates) - block_size, 0), len(candidates)):
+        tables[start] = build_leaf_table(candidates[start:])
+    logger.info('---%s leaf tables of up to %s candidates built---', len(tables), block_size)
+    return tables
+
+
+def search_leaf(values: List[int], table: LeafTable, target: int, tolerance: int = 0) -> List[Tuple[int, ...]]:
+    """
+    find the combinations of a suffix that reach the target, without any proper prefix reaching it first
+
+    :param values: sorted values of the suffix
+    :param table: leaf table of the suffix
+    :param target: target sum, not within tolerance of 0
+    :param tolerance: tolerance level for comparing sums to the target
+
+    :return: list of combinations as index tuples into values, in lexicographic order of their values
+    """
+    sums, masks = table
+    lower = np.searchsorted(sums, target - tolerance, side="left")
+    upper = np.searchsorted(sums, target + tolerance, side="right")
+    matches = masks[lower:upper]
+    if len(matches) == 0:
+        return []
+
+    # the prefix rule, on the matches only: a running sum reaching the target while higher bits are left
+    running = np.zeros(len(matches), dtype=np.int64)
+    early = np.zeros(len(matches), dtype=bool)
+    for j, value in enumerate(values[:-1]):
+        running += ((matches >> j) & 1) * value
+        early |= (np.abs(target - running) <= tolerance) & ((matches >> (j + 1)) != 0) & (((matches >> j) & 1) == 1)
+    matches = matches[~early]
+
+    combinations = [tuple(j for j in range(len(values)) if mask >> j & 1) for mask in matches.tolist()]
+    combinations.sort(key=lambda combination: [values[j] for j in combination])
+    return combinations
+
+
+def iter_vectorized_combination_indexes(
+    candidates: List[int],
+    target: int,
+    tolerance: int = 0,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    tables: Optional[Dict[int, LeafTable]] = None,
+    bounds: Optional[SuffixBounds] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    stats: Optional[SearchStats] = None,
+) -> Iterator[Tuple[int, ...]]:
+    """
+    generate all combinations of the sorted candidates that reach the target, as index tuples,
+    searching the last block_size candidates of each branch with NumPy
+
+    :param candidates: sorted list of candidates
+    :param target: target sum
+    :param tolerance: tolerance level for comparing sums to the target, 0 for an exact match
+    :param block_size: largest number of candidates enumerated at once
+    :param tables: leaf tables from build_leaf_tables, to share them between targets
+    :param bounds: suffix sum bounds from build_suffix_bounds, to share them between targets
+    :param should_stop: optional function called at every node, a leaf table lookup being one node, the search ends once it returns True
+    :param stats: optional SearchStats counting the nodes and the pruned branches
+
+    :return: iterator of index tuples, as iter_combination_indexes
+    """
+    if tables is None:
+        tables = build_leaf_tables(candidates, block_size) if HAS_NUMPY and fits_int64(candidates) else {}
+    if bounds is None:
+        bounds = build_suffix_bounds(candidates)
+    yield from search_vectorized(candidates, target, 0, [], tolerance, tables, bounds, should_stop, stats)
+
+
+def search_vectorized(
+    candidates: List[int],
+    target: int,
+    start: int,
+    path: List[int],
+    tolerance: int,
+    tables: Dict[int, LeafTable],
+    bounds: SuffixBounds,
+    should_stop: Optional[Callable[[], bool]] = None,
+    stats: Optional[SearchStats] = None,
+) -> Iterator[Tuple[int, ...]]:
+    """
+    recursive step of iter_vectorized_combination_indexes
+
+    :param candidates: sorted list of candidates
+    :param target: remaining target sum
+    :param start: start index
+    :param path: indexes taken so far
+    :param tolerance: tolerance level for comparing sums to the target
+    :param tables: leaf table of each suffix searched with NumPy
+    :param bounds: suffix sum bounds
+    :param should_stop: optional function called at every node, the search ends once it returns True
+    :param stats: optional SearchStats counting the nodes and the pruned branches
+
+    :return: iterator of index tuples
+    """
+    if should_stop is not None and should_stop():
+        return
+    if stats is not None:
+        stats.node(len(path))
+    if abs(target) <= tolerance:
+        yield tuple(path)
+        return
+    if start in tables:
+        prefix = tuple(path)
+        for combination in search_leaf(candidates[start:], tables[start], target, tolerance):
+            yield prefix + tuple(start + j for j in combination)
+        return
+
+    for i in range(start, len(candidates)):
+        if i > start and candidates[i] == candidates[i - 1]:
+            if stats is not None:
+                stats.prune("duplicate")
+            continue
+        remaining = target - candidates[i]
+        if not bounds[0][i + 1] - tolerance <= remaining <= bounds[1][i + 1] + tolerance:
+            if stats is not None:
+                stats.prune("bounds")
+            continue
+        path.append(i)
+        yield from search_vectorized(candidates, remaining, i + 1, path, tolerance, tables, bounds, should_stop, stats)
+        path.pop()
+
+
+def iter_vectorized_combinations(
+    candidates: List[int],
+    targets: List[int],
+    tolerance: int = 0,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    should_stop: Optional[Callable[[], bool]] = None,
+    stats: Optional[SearchStats] = None,
+) -> Iterator[List[int]]:
+    """
+    generate the combinations of every target, sharing the leaf tables between the targets
+
+    :param candidates: sorted list of candidates
+    :param targets: list of targets
+    :param tolerance: tolerance level for comparing sums to the targets, 0 for an exact match
+    :param block_size: largest number of candidates enumerated at once
+    :param should_stop: optional function called at every node, the search ends once it returns True
+    :param stats: optional SearchStats counting the nodes, the pruned branches and the combinations of each target
+
+    :return: iterator of combinations of values, target by target
+    """
+    if not HAS_NUMPY:
+        logger.warning('+++numpy is not installed, the vectorized engine runs in Python+++')
+    tables = build_leaf_tables(candidates, block_size) if HAS_NUMPY and fits_int64(candidates) else {}
+    bounds = build_suffix_bounds(candidates)
+    for target in targets:
+        indexes = iter_vectorized_combination_indexes(candidates, target, tolerance, block_size, tables, bounds, should_stop, stats)
+        for combination in (indexes if stats is None else stats.count_found(target, indexes)):
+            yield [candidates[i] for i in combination]
@@ -1,53 +1,162 @@
+import argparse
 import logging
-from typing import List
-from combination.duplicate_int import sum_combinations, filter_redundant_combinations_set
-from utility.csv import read_csv, export_to_csv
-from utility.validation import validate_input_target, validate_result, validate_viable_result_sets
+from contextlib import nullcontext
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from combination.duplicate_int import iter_sum_combinations, iter_sum_combination_indexes, iter_filter_redundant_combinations_set, to_indexes, to_values
+from combination.parallel import iter_parallel_filter_redundant_combinations_set, iter_parallel_sum_combination_indexes
+from combination.stats import SearchStats
+from utility.budget import SearchBudget
+from utility.cache import ResultCache, cached_combinations, decode_combinations, encode_combinations, sets_key
+from utility.cli import build_budget, build_cache, build_parser, build_stats
+from utility.export import ResultWriter, match_targets
+from utility.ledger import Ledger, read_ledger
+from utility.profiling import profiled
+from utility.validation import validate_input_target, validate_result, validate_viable_result_count
 
 logging.basicConfig(format="%(asctime)s %(levelname)s %(filename)s:%(funcName)s():%(lineno)i: %(message)s",
                     datefmt="%Y-%m-%d %H:%M:%S", level=logging.DEBUG)
 
 logger = logging.getLogger(__name__)
 
-def main()->None:
+def main(argv: Optional[List[str]] = None)->None:
     """
-    Read input and target from csv files, validate input and target, find all combinations, filter out redundant combinations, validate result, and export to csv.
+    Read input and target from csv files, validate input and target, find all combinations, filter out redundant combinations, validate result, and export to a single results file.
+
+    Args: argv: command-line arguments, see --help; None to read them from sys.argv
 
     Returns:None
     """
+    args = parse_args(argv)
+    cache: Optional[ResultCache] = build_cache(args)
+    try:
+        with profiled(args.profile, args.profile_output):
+            run(args, cache)
+    finally:
+        if cache is not None:
+            cache.close()
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """
+    Parse the command-line arguments of main.
+
+    Args: argv: command-line arguments, see --help; None to read them from sys.argv
+
+    Returns: parsed command-line arguments
+    """
+    return build_parser("Find the combinations of integer transactions that sum up to the targets.",
+                        engines=["recursive", "meet_in_middle", "vectorized"],
+                        modes=["backtrack", "exact_cover", "target_driven"], workers=True).parse_args(argv)
+
+
+def run(args: argparse.Namespace, cache: Optional[ResultCache] = None) -> Optional[Dict[str, Any]]:
+    """
+    Run the reconciliation with the parsed command-line arguments, see main.
+
+    Args: args: parsed command-line arguments
+          cache: result cache given with --cache, None to search everything
+
+    Returns: status of the search, number of valid results and search nodes visited; None if the input or target cannot be read or is invalid
+    """
+    # the node and time budget is checked at every node of both searches, which then return what they have found
+    budget: SearchBudget = build_budget(args)
+    # the statistics are only collected with --stats or --progress, the searches skip them otherwise
+    stats: Optional[SearchStats] = build_stats(args)
+
     logger.info("---reading input file---")
     try: 
-        input_list: List[int] = read_csv('input.csv')
+        # the amounts are read in chunks from --amount-column, with --id-column or the row number of each amount as its ID
+        input_ledger: Ledger = read_ledger(args.input, args.amount_column, args.id_column, args.header)
+        input_list: List[int] = input_ledger.values()
     except FileNotFoundError: 
         logger.error("+++input file not found+++")
-        return
+        return None
+    except ValueError as error:
+        logger.error("+++%s+++", error)
+        return None
     
     logger.info("---reading target file---")
     try: 
-        target_list: List [int] = read_csv('target.csv')
+        target_list: List [int] = read_ledger(args.target).values()
     except FileNotFoundError:
         logger.error("+++target file not found+++")
-        return
+        return None
 
     logger.info("---validating input and target---")
     if not validate_input_target(input_list, target_list):
-        return
+        return None
     
-    logger.info("---finding combinations---")
-    all_combinations: List[List[int]] = sum_combinations(input_list, target_list)
-    logger.info("---filtering out redundant combinations---")
-    viable_results: List[List[List[int]]] = filter_redundant_combinations_set(input_list, target_list, all_combinations)
-    if not validate_viable_result_sets(viable_results):
-        return
+    # each stage is a generator, so every viable result set is validated and exported as soon as it is found
+    # the combinations are tuples of indexes into the sorted input, and only turned into values for export
+    candidates: List[int] = sorted(input_list)
+    # with --cache, an unchanged rerun reads the viable combination sets back, and a rerun with new targets
+    # only searches the combinations of the new targets
+    set_key: Optional[str] = sets_key(input_list, target_list, options={"engine": args.engine, "mode": args.mode}) if cache is not None else None
+    cached_sets = cache.get(set_key) if cache is not None else None
+    if cached_sets is not None:
+        logger.info("---%s viable combination sets read from the cache---", len(cached_sets))
+        viable_results: Iterator[List[Tuple[int, ...]]] = iter([[to_indexes(candidates, combination) for combination in decode_combinations(result)] for result in cached_sets])
+    else:
+        logger.info("---finding combinations---")
+
+        def find_indexes(targets: List[int]) -> Iterator[Tuple[int, ...]]:
+            # the combinations of the targets as index tuples into the sorted input, with --workers on a process pool
+            if args.engine == "recursive" and args.workers is not None:
+                return iter_parallel_sum_combination_indexes(input_list, targets, args.workers, should_stop=budget, stats=stats)
+            if args.engine == "recursive":
+                return iter_sum_combination_indexes(input_list, targets, should_stop=budget, stats=stats)
+            return (to_indexes(candidates, combination) for combination in iter_sum_combinations(input_list, targets, args.engine, should_stop=budget, stats=stats))
+
+        if cache is not None:
+            combinations = cached_combinations(cache, lambda targets: ([candidates[i] for i in indexes] for indexes in find_indexes(targets)),
+                                               input_list, target_list, options={"engine": args.engine}, is_complete=lambda: not budget.exhausted)
+            all_combinations: Iterator[Tuple[int, ...]] = (to_indexes(candidates, combination) for combination in combinations)
+        else:
+            all_combinations = find_indexes(target_list)
+        if stats is not None:
+            all_combinations = stats.timed("sum_combinations", all_combinations)
+        # forced combinations are taken first, and the independent groups of values are searched separately
+        logger.info("---filtering out redundant combinations---")
+        if args.mode == "backtrack" and args.workers is not None:
+            # the subtrees of the backtracking are searched on the pool, and the sets come back in the serial order
+            viable_results = iter_parallel_filter_redundant_combinations_set(input_list, target_list, all_combinations, max_workers=args.workers,
+                                                                             candidates=candidates, should_stop=budget, stats=stats)
+        else:
+            viable_results = iter_filter_redundant_combinations_set(input_list, target_list, all_combinations, args.mode, candidates=candidates, decompose=args.decompose, should_stop=budget, stats=stats)
+        if stats is not None:
+            viable_results = stats.timed("filter_redundant_combinations_set", viable_results)
+    found_sets: List[List[List[int]]] = []
     logger.info("---validating result---")
+    viable_count: int = 0
     counter: int = 0
-    for result in viable_results:
-        if validate_result(result=result, input_list=input_list, output_list=target_list):
-            logger.info(f"---result {counter} is valid---")
-            print(f"combination {counter} for {target_list}: {result}")
-            export_to_csv(result, f"result_{counter}.csv")
-            counter += 1
+    # every valid result set is appended to the same buffered file, one row per item with its transaction ID
+    with ResultWriter(args.output) as writer:
+        for result in viable_results:
+            viable_count += 1
+            if cache is not None:
+                found_sets.append(to_values(candidates, result))
+            with stats.stage("validate_result") if stats is not None else nullcontext():
+                valid = validate_result(result=result, input_list=input_list, output_list=target_list, candidates=candidates)
+            if valid:
+                logger.info("---result %s is valid---", counter)
+                values: List[List[int]] = to_values(candidates, result)
+                print(f"combination {counter} for {target_list}: {values}")
+                writer.write(counter, values, match_targets(values, target_list), input_ledger.assign_ids(values))
+                counter += 1
+                if args.max_solutions is not None and counter >= args.max_solutions:
+                    budget.stop(f"{counter} solutions found")
+                    break
+    # a search cut short by its budget has not found every set, so only a complete run is cached
+    if cache is not None and cached_sets is None and not budget.exhausted:
+        cache.put(set_key, "sets", [encode_combinations(result) for result in found_sets])
+    print(f"search {budget.report()}")
+    if stats is not None:
+        print(stats.report())
+    summary: Dict[str, Any] = {"status": budget.status, "solutions": counter, "nodes": budget.nodes}
+    if not validate_viable_result_count(viable_count):
+        return summary
     logger.info("---done---")
+    return summary
 
 
 if __name__ == "__main__":
@@ -1,8 +1,16 @@
+import argparse
 import logging
-from typing import List
+from contextlib import nullcontext
+from typing import Any, Dict, Iterator, List, Optional
 from decimal import Decimal
-from combination.input_with_duplicate_decimal import sum_combinations, filter_redundant_combinations_set
-from utility.csv import read_csv, export_to_csv
+from combination.input_with_duplicate_decimal import iter_scaled_combinations_set, iter_scaled_sum_combinations
+from combination.stats import SearchStats
+from utility.export import ResultWriter, match_targets
+from utility.ledger import Ledger, read_ledger
+from utility.budget import SearchBudget
+from utility.cache import ResultCache, cached_combinations, decode_combinations, encode_combinations, sets_key
+from utility.cli import build_budget, build_cache, build_parser, build_stats
+from utility.profiling import profiled
 from utility.validation_decimal import validate_result
 
 logging.basicConfig(format="%(asctime)s %(levelname)s %(filename)s:%(funcName)s():%(lineno)i: %(message)s",
@@ -10,53 +18,121 @@ logging.basicConfig(format="%(asctime)s %(levelname)s %(filename)s:%(funcName)s(
 
 logger = logging.getLogger(__name__)
 
-def main() -> None:
+def main(argv: Optional[List[str]] = None) -> None:
     """
     Read input and target from CSV files, find all combinations that approximate the target values, 
-    filter out redundant combinations, validate results, and export valid results to CSV files.
+    filter out redundant combinations, validate results, and export valid results to a single results file.
+
+    Args: argv: command-line arguments, see --help; None to read them from sys.argv
 
     Returns: None
     """
+    args = parse_args(argv)
+    cache: Optional[ResultCache] = build_cache(args)
+    try:
+        with profiled(args.profile, args.profile_output):
+            run(args, cache)
+    finally:
+        if cache is not None:
+            cache.close()
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """
+    Parse the command-line arguments of main.
+
+    Args: argv: command-line arguments, see --help; None to read them from sys.argv
+
+    Returns: parsed command-line arguments
+    """
+    return build_parser("Find the combinations of decimal transactions that approximate the targets within a tolerance.",
+                        engines=["recursive", "vectorized"], tolerance="0.01").parse_args(argv)
+
+
+def run(args: argparse.Namespace, cache: Optional[ResultCache] = None) -> Optional[Dict[str, Any]]:
+    """
+    Run the reconciliation with the parsed command-line arguments, see main.
+
+    Args: args: parsed command-line arguments
+          cache: result cache given with --cache, None to search everything
+
+    Returns: status of the search, number of valid results and search nodes visited; None if the input or target cannot be read
+    """
+    # The node and time budget is checked at every node of both searches, which then return what they have found
+    budget: SearchBudget = build_budget(args)
+    # The statistics are only collected with --stats or --progress, the searches skip them otherwise
+    stats: Optional[SearchStats] = build_stats(args)
 
     # Read the input file
     logger.info("---reading input file---")
     try: 
-        # Convert each item in input list to Decimal
-        input_list: List[Decimal] = [Decimal(x) for x in read_csv('input.csv')]
+        # Read the amounts in chunks from --amount-column, with --id-column or the row number of each amount as its ID,
+        # and convert them to Decimal
+        input_ledger: Ledger = read_ledger(args.input, args.amount_column, args.id_column, args.header)
+        input_list: List[Decimal] = [Decimal(x) for x in input_ledger.values()]
     except FileNotFoundError: 
         logger.error("+++input file not found+++")
-        return
+        return None
+    except ValueError as error:
+        logger.error("+++%s+++", error)
+        return None
     
     # Read the target file
     logger.info("---reading target file---")
     try: 
         # Convert each item in target list to Decimal
-        target_list: List[Decimal] = [Decimal(x) for x in read_csv('target.csv')]
+        target_list: List[Decimal] = [Decimal(x) for x in read_ledger(args.target).values()]
     except FileNotFoundError:
         logger.error("+++target file not found+++")
-        return
-
-    # Define tolerance
-    tolerance = Decimal("0.01")
+        return None
 
-    # Find combinations with the specified tolerance
-    logger.info("---finding combinations---")
-    all_combinations: List[List[Decimal]] = sum_combinations(input_list, target_list, tolerance=tolerance)
-    logger.info("---filtering out redundant combinations---")
+    # Tolerance from the command line, 0.01 by default
+    tolerance: Decimal = args.tolerance
 
-    # Filter off the redundant combination sets with tolerance
-    viable_results: List[List[List[Decimal]]] = filter_redundant_combinations_set(input_list, target_list, all_combinations, tolerance=tolerance)
+    # Find combinations and filter off the redundant combination sets with the specified tolerance,
+    # on integers scaled to the decimal places of the data, each set is validated and exported as soon as it is found
+    # With --cache, an unchanged rerun reads the viable combination sets back, and a rerun with new targets
+    # only searches the combinations of the new targets
+    set_key: Optional[str] = sets_key(input_list, target_list, tolerance, options={"engine": args.engine}) if cache is not None else None
+    cached_sets = cache.get(set_key) if cache is not None else None
+    if cached_sets is not None:
+        logger.info("---%s viable combination sets read from the cache---", len(cached_sets))
+        viable_results: Iterator[List[List[Decimal]]] = iter([decode_combinations(result) for result in cached_sets])
+    else:
+        logger.info("---finding combinations and filtering out redundant combinations---")
+        combinations: Optional[List[List[Decimal]]] = None
+        if cache is not None:
+            combinations = cached_combinations(cache, lambda targets: iter_scaled_sum_combinations(input_list, targets, tolerance, args.engine, should_stop=budget, stats=stats),
+                                               input_list, target_list, tolerance, options={"engine": args.engine}, is_complete=lambda: not budget.exhausted)
+        viable_results = iter_scaled_combinations_set(input_list, target_list, tolerance=tolerance, engine=args.engine, should_stop=budget, stats=stats, combinations=combinations)
+    found_sets: List[List[List[Decimal]]] = []
 
     # Validate and export results
     logger.info("---validating result---")
     counter: int = 0
-    for result in viable_results:
-        if validate_result(result=result, input_list=input_list, output_list=target_list, tolerance=tolerance):
-            logger.info(f"---result {counter} is valid---")
-            print(f"combination {counter} for {target_list}: {result}")
-            export_to_csv(result, f"result_{counter}.csv")
-            counter += 1
+    # Append every valid result set to the same buffered file, one row per item with its target and transaction ID
+    with ResultWriter(args.output) as writer:
+        for result in viable_results:
+            if cache is not None:
+                found_sets.append(result)
+            with stats.stage("validate_result") if stats is not None else nullcontext():
+                valid = validate_result(result=result, input_list=input_list, output_list=target_list, tolerance=tolerance)
+            if valid:
+                logger.info("---result %s is valid---", counter)
+                print(f"combination {counter} for {target_list}: {result}")
+                writer.write(counter, result, match_targets(result, target_list, tolerance), input_ledger.assign_ids(result))
+                counter += 1
+                if args.max_solutions is not None and counter >= args.max_solutions:
+                    budget.stop(f"{counter} solutions found")
+                    break
+    # A search cut short by its budget has not found every set, so only a complete run is cached
+    if cache is not None and cached_sets is None and not budget.exhausted:
+        cache.put(set_key, "sets", [encode_combinations(result) for result in found_sets])
+    print(f"search {budget.report()}")
+    if stats is not None:
+        print(stats.report())
     logger.info("---done---")
+    return {"status": budget.status, "solutions": counter, "nodes": budget.nodes}
 
 
 if __name__ == "__main__":
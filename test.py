@@ -1,6 +1,23 @@
+import contextlib
+import gzip
+import io
 import logging
+import os
+import tempfile
+from decimal import Decimal
+from collections import Counter
+from itertools import count, islice, product
 from typing import List
-from combination.duplicate_int import sum_combinations, filter_redundant_combinations_set
+import main as main_int
+import main_decimal
+from batch import count_written_results, read_manifest, run_batch, soft_time_limit
+from combination.decomposition import iter_lazy_product
+from combination.incremental import IncrementalReconciler
+from combination.duplicate_int import sum_combinations, filter_redundant_combinations_set, iter_filter_redundant_combinations_set, iter_sum_combinations
+from combination.parallel import parallel_filter_redundant_combinations_set, parallel_sum_combinations
+from utility.budget import SearchBudget
+from utility.cache import ResultCache, cached_combinations, decode_combinations, encode_combinations
+from utility.ledger import read_ledger
 from utility.validation import validate_input_target, validate_result, validate_viable_result_sets
 
 logging.basicConfig(format="%(asctime)s %(levelname)s %(filename)s:%(funcName)s():%(lineno)i: %(message)s",
@@ -38,6 +55,230 @@ def test(input_list: List[int], target_list: List[int])->None:
     logger.info("=====done=====")
 
 
+def test_engines(input_list: List[int], target_list: List[int]) -> None:
+    """
+    Check that every engine of sum_combinations finds the same combinations as the recursive search.
+
+    :param input_list: input list of integers
+    :param target_list: target list of integers
+
+    :returns: None
+    """
+    expected: List[List[int]] = sorted(sum_combinations(input_list, target_list))
+    for engine in ("meet_in_middle", "vectorized"):
+        found: List[List[int]] = sorted(sum_combinations(input_list, target_list, engine))
+        assert found == expected, f"{engine} found {found}, the recursive search {expected}"
+        logger.info(f"====={engine} engine matches the recursive search=====")
+
+
+def test_parallel(input_list: List[int], target_list: List[int]) -> None:
+    """
+    Check that the searches on a process pool find the same combinations and viable combination sets, in the same order, as in a single process.
+
+    :param input_list: input list of integers
+    :param target_list: target list of integers
+
+    :returns: None
+    """
+    combinations: List[List[int]] = sum_combinations(input_list, target_list)
+    assert parallel_sum_combinations(input_list, target_list, max_workers=2, split_threshold=1) == combinations
+    expected: List[List[List[int]]] = filter_redundant_combinations_set(input_list, target_list, combinations)
+    assert parallel_filter_redundant_combinations_set(input_list, target_list, combinations, split_depth=3, max_workers=2) == expected
+    logger.info("=====parallel searches match the serial searches=====")
+
+
+def test_decompose(input_list: List[int], target_list: List[int], max_solutions: int) -> None:
+    """
+    Check that the decomposed search finds the same viable combination sets, and that it streams them: 
+    the first sets come out before every component is fully searched, so --max-solutions still stops it early.
+
+    :param input_list: input list of integers
+    :param target_list: target list of integers
+    :param max_solutions: number of viable combination sets to take from the streamed search
+
+    :returns: None
+    """
+    combinations: List[List[int]] = sum_combinations(input_list, target_list)
+    for engine in ["backtrack", "exact_cover", "target_driven"]:
+        expected = sorted(sorted(result) for result in iter_filter_redundant_combinations_set(input_list, target_list, combinations, engine))
+        decomposed = sorted(sorted(result) for result in iter_filter_redundant_combinations_set(input_list, target_list, combinations, engine, decompose=True))
+        assert decomposed == expected, engine
+        first = list(islice(iter_filter_redundant_combinations_set(input_list, target_list, combinations, engine, decompose=True), max_solutions))
+        assert len(first) == min(max_solutions, len(expected)) and all(sorted(result) in expected for result in first), engine
+    # the product of endless iterables only terminates if it does not read them up front
+    assert list(islice(iter_lazy_product([count(), count(), count()]), 3)) == [[0, 0, 0], [0, 0, 1], [0, 0, 2]]
+    assert list(iter_lazy_product([[1, 2], [3], [4, 5]])) == [list(item) for item in product([1, 2], [3], [4, 5])]
+    assert list(iter_lazy_product([[1, 2], [], count()])) == []
+    logger.info("=====decomposed search matches the plain search=====")
+
+
+def test_ledger(rows: List[List[str]], amount_column, id_column, header: bool, expected_values: List, expected_ids: List[List[str]]) -> None:
+    """
+    Check that the ledger reader gives the amounts of a CSV export with their types, and reports a combination set as transaction IDs.
+
+    :param rows: rows of the CSV file
+    :param amount_column: index or name of the amount column
+    :param id_column: index or name of the ID column, None for the row numbers
+    :param header: whether the first row holds the column names
+    :param expected_values: amounts read, in file order
+    :param expected_ids: IDs of expected_values taken as a single combination, twice
+
+    :returns: None
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        csv_name = os.path.join(directory, "ledger.csv")
+        with open(csv_name, "w") as csv_file:
+            csv_file.write("\n".join(",".join(row) for row in rows) + "\n")
+        ledger = read_ledger(csv_name, amount_column, id_column, header, chunk_size=2)
+    values = ledger.values()
+    assert values == expected_values and [type(value) for value in values] == [type(value) for value in expected_values], values
+    # the same ledger reports several result sets, each one taking the rows of an amount in file order
+    for _ in range(2):
+        assert ledger.assign_ids([values]) == expected_ids
+    logger.info("=====ledger read as expected=====")
+
+
+def test_batch(input_list: List[int], target_list: List[int], expected_solutions: int) -> None:
+    """
+    Check that the batch runner runs int and decimal jobs on a pool of workers, and reports a job which cannot be read as failed.
+
+    :param input_list: input list of integers
+    :param target_list: target list of integers
+    :param expected_solutions: number of viable combination sets of input_list and target_list
+
+    :returns: None
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        def path(name: str) -> str:
+            return os.path.join(directory, name)
+
+        with open(path("input.csv"), "w") as input_file:
+            input_file.write("\n".join(str(value) for value in input_list) + "\n")
+        with open(path("target.csv"), "w") as target_file:
+            target_file.write("\n".join(str(value) for value in target_list) + "\n")
+        with open(path("manifest.csv"), "w") as manifest_file:
+            manifest_file.write("name,input,target,kind,output\n"
+                                f"int,{path('input.csv')},{path('target.csv')},int,{path('int.csv')}\n"
+                                f"decimal,{path('input.csv')},{path('target.csv')},decimal,{path('decimal.jsonl.gz')}\n"
+                                f"missing,{path('missing.csv')},{path('target.csv')},int,{path('missing_out.csv')}\n")
+        summaries = run_batch(read_manifest(path("manifest.csv")), path("summary.csv"), workers=2, timeout=60)
+        by_name = {summary["name"]: summary for summary in summaries}
+        assert by_name["int"]["status"] == by_name["decimal"]["status"] == "complete", summaries
+        assert by_name["int"]["solutions"] == by_name["decimal"]["solutions"] == expected_solutions, summaries
+        assert by_name["missing"]["status"] == "failed", summaries
+        # a job stopped at its timeout is reported with the result sets already in its output file
+        assert count_written_results(path("int.csv")) == count_written_results(path("decimal.jsonl.gz")) == expected_solutions
+        with gzip.open(path("decimal.jsonl.gz"), "rb") as output_file:
+            data = output_file.read()
+        with gzip.open(path("cut.jsonl.gz"), "wb") as output_file:
+            output_file.write(data[:len(data) // 2])
+        with open(path("cut.jsonl.gz"), "rb") as output_file:
+            compressed = output_file.read()
+        with open(path("cut.jsonl.gz"), "wb") as output_file:
+            output_file.write(compressed[:len(compressed) - 8])
+        assert 0 < count_written_results(path("cut.jsonl.gz")) <= expected_solutions
+        assert count_written_results(path("missing_out.csv")) == 0
+    assert (soft_time_limit(300), soft_time_limit(5), soft_time_limit(1)) == (270, 4, 0.5)
+    logger.info("=====batch summary as expected=====")
+
+
+def test_cache(input_list: List[int], target_list: List[int], new_target: int) -> None:
+    """
+    Check that the result cache gives back the combinations of the targets already searched, 
+    only searches a new target, and stays within its size.
+
+    :param input_list: input list of integers
+    :param target_list: target list of integers
+    :param new_target: target added on the second run
+
+    :returns: None
+    """
+    searched: List[List[int]] = []
+
+    def search(targets: List[int]):
+        searched.append(list(targets))
+        return iter_sum_combinations(input_list, targets)
+
+    def as_multiset(combinations: List[List[int]]) -> List[List[int]]:
+        return sorted(sorted(combination) for combination in combinations)
+
+    with tempfile.TemporaryDirectory() as directory:
+        with ResultCache(os.path.join(directory, "cache.sqlite")) as cache:
+            first = cached_combinations(cache, search, input_list, target_list)
+            assert as_multiset(first) == as_multiset(sum_combinations(input_list, target_list))
+            # a rerun reads every target back, a run with one more target only searches that target
+            assert cached_combinations(cache, search, input_list, target_list) == first and len(searched) == 1
+            second = cached_combinations(cache, search, input_list, target_list + [new_target])
+            assert searched[1:] == [[new_target]]
+            assert as_multiset(second) == as_multiset(sum_combinations(input_list, target_list + [new_target]))
+        # the cache file outlives the process, and a smaller cache evicts the least recently used entries
+        with ResultCache(os.path.join(directory, "cache.sqlite"), max_bytes=64) as cache:
+            cached_combinations(cache, search, input_list, [new_target])
+            assert len(searched) == 2 and cache.hits == 1
+            cache.evict()
+            cached_combinations(cache, search, input_list, [new_target])
+            assert len(searched) == 3 and cache.misses == 1
+    # Decimals are stored as strings, so that no digit is lost
+    assert decode_combinations(encode_combinations([[Decimal("1.10"), 2]])) == [[Decimal("1.10"), 2]]
+    logger.info("=====cache as expected=====")
+
+
+def test_incremental(input_list: List[int], target_list: List[int], changes: List[dict]) -> None:
+    """
+    Check that the incremental reconciler has the same combinations and viable combination sets as a full run after each change.
+
+    :param input_list: input list of integers
+    :param target_list: target list of integers
+    :param changes: keyword arguments of each IncrementalReconciler.update
+
+    :returns: None
+    """
+    def as_multiset(results: List[List[List[int]]]) -> List[List[List[int]]]:
+        return sorted(sorted(sorted(combination) for combination in result) for result in results)
+
+    for engine in ["backtrack", "exact_cover", "target_driven"]:
+        reconciler = IncrementalReconciler(input_list, target_list, engine)
+        inputs, targets = Counter(input_list), Counter(target_list)
+        for change in changes:
+            summary = reconciler.update(**change)
+            # only the new targets are searched in full
+            assert summary["targets_searched"] == len(set(change.get("added_targets", [])) - set(targets)), summary
+            inputs.update(change.get("added_inputs", []))
+            inputs.subtract(change.get("removed_inputs", []))
+            targets.update(change.get("added_targets", []))
+            targets.subtract(change.get("removed_targets", []))
+            input_now, target_now = list(inputs.elements()), list(targets.elements())
+            combinations = sum_combinations(input_now, target_now)
+            assert sorted(map(sorted, reconciler.all_combinations())) == sorted(map(sorted, combinations)), (engine, change)
+            assert as_multiset(reconciler.viable_sets()) == as_multiset(filter_redundant_combinations_set(input_now, target_now, combinations)), (engine, change)
+    try:
+        reconciler.update(removed_inputs=[max(input_list) + 1])
+        assert False, "removing a missing input should fail"
+    except ValueError:
+        pass
+    logger.info("=====incremental reconciler matches the full run=====")
+
+
+def test_rejected_options(options: List[str]) -> None:
+    """
+    Check that both entry points reject the given command-line options instead of running with them.
+
+    :param options: command-line options, e.g. a budget of 0
+
+    :returns: None
+    """
+    for program in [main_int, main_decimal]:
+        try:
+            # argparse prints the usage and the error on stderr, then exits
+            with contextlib.redirect_stderr(io.StringIO()):
+                program.parse_args(options)
+        except SystemExit as error:
+            assert error.code == 2, (program.__name__, options)
+        else:
+            assert False, f"{program.__name__} accepted {options}"
+    logger.info("=====%s rejected=====", " ".join(options))
+
+
 if __name__ == "__main__":
     # input_unique_positive: List[int] = [1, 2, 3, 4, 5] # 1+2+3+4+5=15
     # target_unique_positive: List[int] = [7, 8] # 7+8=15
@@ -95,3 +336,59 @@ if __name__ == "__main__":
                                         
     logger.info("=====9. testing for duplicate mixed input and duplicate mixed target with zero=====")
     test(input_duplicate_mixed_for_zero_3, target_duplicate_mixed_for_zero_3)
+
+    logger.info("=====10. cross-checking the combination engines against the recursive search=====")
+    test_engines(input_duplicate_mixed_for_zero_3, target_duplicate_mixed_for_zero_3)
+    test_engines(input_duplicate_mixed_for_zero, target_duplicate_mixed_for_zero)
+    test_engines([3, -1, 4, 1, -5, 9, 2, 6, -5, 3, 5, 8, 9, 7], [12, 0, -6, 21])
+
+    # read_csv returns a Decimal for each amount with a decimal point, and an int for the others
+    input_decimal_amounts: List = [Decimal("1.5"), Decimal("2.5"), 3, 4]
+    target_decimal_amounts: List = [Decimal("5.5"), Decimal("5.5")]
+    logger.info("=====11. testing decimal amounts on the integer search, without a reachability table=====")
+    test(input_decimal_amounts, target_decimal_amounts)
+    assert sum_combinations(input_decimal_amounts, target_decimal_amounts) == [[Decimal("1.5"), 4], [Decimal("2.5"), 3]]
+
+    logger.info("=====12. cross-checking the parallel searches against the serial searches=====")
+    test_parallel(input_duplicate_mixed_for_zero_3, target_duplicate_mixed_for_zero_3)
+    test_parallel([1, 2, 3, 4, 5, 6, 7, 8, 1, 2, 3, 4, 5, 6, 7, 8], [18, 18, 18, 18])
+
+    logger.info("=====13. cross-checking the decomposed set search, and streaming its first results=====")
+    test_decompose(input_duplicate_mixed_for_zero_3, target_duplicate_mixed_for_zero_3, 1)
+    test_decompose([1, 2, 3, 4, 5, 5, 100, 200, 300, 400, 500, 500], [10, 10, 1000, 1000], 3)
+
+    logger.info("=====14. testing the ledger reader=====")
+    # whole amounts stay integers next to the amounts with a fraction, as read_csv reads them
+    test_ledger([["3"], ["1.5"], ["-2"], ["1.50"]], 0, None, False, [3, Decimal("1.5"), -2, Decimal("1.5")], [["1", "2", "3", "4"]])
+    test_ledger([["Reference", "Amount"], ["a", "7"], ["b", "-7"], ["c", "7"]], "Amount", "Reference", False, [7, -7, 7], [["a", "b", "c"]])
+    test_ledger([["Reference", "Amount"], ["a", "2"], ["b", "0.25"]], 1, 0, True, [2, Decimal("0.25")], [["a", "b"]])
+    # scaled to 30 decimal places, the amounts no longer fit in 64 bits
+    test_ledger([["5"], ["9"], ["0.000000000000000000000000000001"]], 0, None, False, [5, 9, Decimal("1E-30")], [["1", "2", "3"]])
+    test_ledger([["0.5"], ["12345678901234567890"]], 0, None, False, [Decimal("0.5"), 12345678901234567890], [["1", "2"]])
+
+    logger.info("=====15. testing the batch runner=====")
+    test_batch(input_duplicate_mixed_for_zero_3, target_duplicate_mixed_for_zero_3, len(filter_redundant_combinations_set(
+        input_duplicate_mixed_for_zero_3, target_duplicate_mixed_for_zero_3, sum_combinations(input_duplicate_mixed_for_zero_3, target_duplicate_mixed_for_zero_3))))
+
+    logger.info("=====16. testing the result cache=====")
+    test_cache(input_duplicate_mixed_for_zero_3, target_duplicate_mixed_for_zero_3, 10)
+
+    logger.info("=====17. cross-checking the incremental reconciler against full runs=====")
+    test_incremental(input_duplicate_mixed_for_zero_3, target_duplicate_mixed_for_zero_3, [
+        {"added_inputs": [6], "added_targets": [6]},
+        {"removed_inputs": [2, 2], "removed_targets": [4]},
+        # a corrected amount is removed and added back with its new value
+        {"added_inputs": [3], "removed_inputs": [4], "added_targets": [14], "removed_targets": [15]},
+    ])
+
+    logger.info("=====18. testing the rejected command-line options=====")
+    test_rejected_options(["--progress", "0"])
+    test_rejected_options(["--progress", "-3"])
+    # a budget of 0 would write every result set, or end the search at once and report that nothing was found
+    test_rejected_options(["--max-solutions", "0"])
+    test_rejected_options(["--max-nodes", "-5"])
+    try:
+        SearchBudget(max_nodes=0)
+        assert False, "a node budget of 0 should be rejected"
+    except ValueError:
+        pass
@@ -1,15 +1,21 @@
+import gzip
+import json
 import logging
+import os
+import tempfile
+from itertools import permutations
 from typing import List
 from decimal import Decimal
 from combination.input_with_duplicate_decimal import sum_combinations, filter_redundant_combinations_set
-from utility.validation_decimal import validate_result
+from utility.export import ResultWriter, match_targets
+from utility.validation_decimal import assign_targets, validate_result
 
 logging.basicConfig(format="%(asctime)s %(levelname)s %(filename)s:%(funcName)s():%(lineno)i: %(message)s",
                     datefmt="%Y-%m-%d %H:%M:%S", level=logging.DEBUG)
 
 logger = logging.getLogger(__name__)
 
-def test(input_list: List[Decimal], target_list: List[Decimal], tolerance: Decimal) -> None:
+def test(input_list: List[Decimal], target_list: List[Decimal], tolerance: Decimal) -> int:
     """
     Given input and target, find all combinations, filter out redundant combinations, 
     validate results, and print out the result.
@@ -18,7 +24,7 @@ def test(input_list: List[Decimal], target_list: List[Decimal], tolerance: Decim
     :param target_list: target list of Decimals
     :param tolerance: Decimal tolerance level for approximate matches
 
-    :returns: None
+    :returns: number of valid results
     """
     logger.info("=====finding combinations=====")
     all_combinations: List[List[Decimal]] = sum_combinations(input_list, target_list, tolerance=tolerance)
@@ -35,6 +41,37 @@ def test(input_list: List[Decimal], target_list: List[Decimal], tolerance: Decim
             print(result)
             counter += 1
     logger.info("=====done=====")
+    return counter
+
+
+def test_export(result: List[List[Decimal]], target_list: List[Decimal], tolerance: Decimal, expected_targets: List[Decimal]) -> None:
+    """
+    Check that each combination of a result set is exported with a target within tolerance of its sum, 
+    and that the CSV and gzip-compressed JSON Lines files hold the same rows.
+
+    :param result: combination set, as lists of Decimals
+    :param target_list: target list of Decimals
+    :param tolerance: Decimal tolerance level for approximate matches
+    :param expected_targets: target expected for each combination
+
+    :returns: None
+    """
+    targets = match_targets(result, target_list, tolerance)
+    assert targets == expected_targets, targets
+    with tempfile.TemporaryDirectory() as directory:
+        csv_name, jsonl_name = os.path.join(directory, "results.csv"), os.path.join(directory, "results.jsonl.gz")
+        for file_name in [csv_name, jsonl_name]:
+            with ResultWriter(file_name, flush_every=2) as writer:
+                writer.write(0, result, targets, [[str(i) for i in range(len(combination))] for combination in result])
+        with open(csv_name) as csv_file:
+            csv_rows = [line.split(",") for line in csv_file.read().splitlines()[1:]]
+        with gzip.open(jsonl_name, "rt") as jsonl_file:
+            jsonl_rows = [json.loads(line) for line in jsonl_file]
+    expected_rows = [[0, target, index, item, str(position)] for index, (combination, target) in enumerate(zip(result, targets))
+                     for position, item in enumerate(combination)]
+    assert csv_rows == [[str(value) for value in row] for row in expected_rows]
+    assert [[row["result_id"], Decimal(row["target"]), row["combination_index"], Decimal(row["item"]), row["id"]] for row in jsonl_rows] == expected_rows
+    logger.info("=====result set exported as expected=====")
 
 
 if __name__ == "__main__":
@@ -131,4 +168,24 @@ if __name__ == "__main__":
     target_decimal_with_rounding = [Decimal("6.01"), Decimal("4.03")]
     logger.info("=====16. testing for decimal input where rounding may impact result and decimal target=====")
     test(input_decimal_with_rounding, target_decimal_with_rounding, tolerance)
-    
\ No newline at end of file
+
+    # The distinct targets are searched once, so the combinations of a set do not follow the order of the targets
+    input_repeated_targets = [Decimal(x) for x in ["1.5", "4.0", "1.0", "2.0", "2.5", "3.0"]]
+    target_repeated_targets = [Decimal(x) for x in ["5.5", "3.0", "5.5"]]
+    logger.info("=====17. testing for repeated, non-adjacent decimal targets=====")
+    # 5.5 = 1.5 + 4.0, 3.0 = 1.0 + 2.0, 5.5 = 2.5 + 3.0 and 5.5 = 1.0 + 2.0 + 2.5, 3.0 = 3.0, 5.5 = 1.5 + 4.0
+    assert test(input_repeated_targets, target_repeated_targets, tolerance) == 2
+    # Every order of the combinations of a valid set is valid
+    valid_set = [[Decimal("1.5"), Decimal("4.0")], [Decimal("2.5"), Decimal("3.0")], [Decimal("1.0"), Decimal("2.0")]]
+    for order in permutations(valid_set):
+        assert validate_result(list(order), input_repeated_targets, target_repeated_targets, tolerance)
+    # A greedy pairing would give 5.00 to the first sum and leave nothing within tolerance of the second one
+    assert assign_targets([Decimal("5.00"), Decimal("5.02")], [Decimal("5.01"), Decimal("5.03")], tolerance) == [0, 1]
+    assert assign_targets([Decimal("5.02"), Decimal("5.00")], [Decimal("5.03"), Decimal("5.01")], tolerance) == [0, 1]
+    assert assign_targets([Decimal("5.00"), Decimal("5.00")], [Decimal("5.01"), Decimal("6.00")], tolerance) in ([0, None], [None, 0])
+
+    logger.info("=====18. testing the export of result sets with the target of each combination=====")
+    # The nearest target of the first sum is the only one within tolerance of the second sum
+    test_export([[Decimal("2.00"), Decimal("3.01")], [Decimal("5.03")]], [Decimal("5.02"), Decimal("5.00")], Decimal("0.02"),
+                [Decimal("5.00"), Decimal("5.02")])
+    test_export(valid_set, target_repeated_targets, tolerance, [Decimal("5.5"), Decimal("5.5"), Decimal("3.0")])
@@ -0,0 +1,109 @@
+"""
+Node and wall-clock budgets for the searches, so that a run on an unlucky ledger ends with partial results.
+
+A SearchBudget is passed to the searches as their should_stop function: every node of the search calls it, it
+counts the node and returns True once the node budget or the time budget is used up. The clock is only read
+every `check_every` nodes, as reading it at every node would slow the search down noticeably. Once the budget
+has run out, every later call returns True at once, so all the searches sharing it unwind, and the results found
+so far are reported with an incomplete status.
+"""
+
+import logging
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+COMPLETE = "complete"
+INCOMPLETE = "incomplete"
+
+
+class SearchBudget:
+    """
+    Node and time budget shared by the stages of a run, callable as a should_stop function.
+    """
+
+    def __init__(self, max_nodes: Optional[int] = None, max_seconds: Optional[float] = None, check_every: int = 1024) -> None:
+        """
+        Start the clock of the budget.
+
+        :param max_nodes: largest number of search nodes to visit, None for no limit
+        :param max_seconds: largest wall-clock time in seconds, None for no limit
+        :param check_every: number of nodes between two readings of the clock
+        :raises ValueError: if the node budget is below 1, which would end every search before its first node
+        """
+        if max_nodes is not None and max_nodes < 1:
+            raise ValueError(f"expected a node budget of at least 1, got {max_nodes}")
+        self.max_nodes = max_nodes
+        self.max_seconds = max_seconds
+        self.check_every = check_every
+        self.nodes = 0
+        self.reason: Optional[str] = None
+        self.started = time.monotonic()
+
+    def tick(self) -> bool:
+        """
+        Count one search node.
+
+        :return: True if the budget is used up and the search has to stop
+        """
+        if self.reason is not None:
+            return True
+        self.nodes += 1
+        if self.max_nodes is not None and self.nodes > self.max_nodes:
+            self.stop(f"node budget of {self.max_nodes} nodes exhausted")
+        elif self.max_seconds is not None and self.nodes % self.check_every == 0 and self.elapsed() > self.max_seconds:
+            self.stop(f"time budget of {self.max_seconds}s exhausted after {self.nodes} nodes")
+        return self.reason is not None
+
+    __call__ = tick
+
+    def charge(self, nodes: int) -> bool:
+        """
+        Count the nodes visited elsewhere, e.g. by the worker processes of a parallel search.
+
+        :param nodes: number of search nodes
+        :return: True if the budget is used up and the search has to stop
+        """
+        if self.reason is not None:
+            return True
+        self.nodes += nodes
+        if self.max_nodes is not None and self.nodes > self.max_nodes:
+            self.stop(f"node budget of {self.max_nodes} nodes exhausted")
+        elif self.max_seconds is not None and self.elapsed() > self.max_seconds:
+            self.stop(f"time budget of {self.max_seconds}s exhausted after {self.nodes} nodes")
+        return self.reason is not None
+
+    def stop(self, reason: str) -> None:
+        """
+        Mark the run as incomplete, e.g. when the maximum number of solutions is reached.
+
+        :param reason: why the run stopped early
+        """
+        if self.reason is None:
+            self.reason = reason
+            logger.warning(f"+++search stopped: {reason}+++")
+
+    def elapsed(self) -> float:
+        """
+        :return: seconds since the budget was created
+        """
+        return time.monotonic() - self.started
+
+    @property
+    def exhausted(self) -> bool:
+        return self.reason is not None
+
+    @property
+    def status(self) -> str:
+        """
+        :return: "complete" if the searches ran to the end, "incomplete" if the budget stopped them
+        """
+        return INCOMPLETE if self.reason is not None else COMPLETE
+
+    def report(self) -> str:
+        """
+        :return: one-line summary of the status, the nodes visited and the time taken
+        """
+        summary = f"{self.status}: {self.nodes} nodes in {self.elapsed():.2f}s"
+        return f"{summary} ({self.reason})" if self.reason is not None else summary
@@ -0,0 +1,232 @@
+"""
+Persistent cache of search results in a local SQLite file, for reruns on the same or nearly the same ledger.
+
+Two kinds of entries are kept:
+- the candidate combinations of each target, keyed by the input multiset, the target, the tolerance and the
+  engine, so that a rerun where only some targets changed only searches the new targets
+- the viable combination sets of a whole run, keyed by the input and target multisets and all the search options,
+  so that an unchanged rerun returns at once
+
+Keys are SHA-256 hashes of a canonical JSON form of the sorted multisets and the options. Values are JSON,
+zlib-compressed, with Decimals stored as strings. When the file grows over `max_bytes`, the least recently used
+entries are evicted. Only complete results are stored: a search cut short by its budget is not cached.
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+import zlib
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# bumped whenever the meaning of the cached values changes, so that older entries are ignored
+CACHE_VERSION = 1
+DEFAULT_CACHE_FILE = ".targeted_sum_cache.sqlite"
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+Number = Union[int, Decimal]
+
+
+def canonical_key(kind: str, **parts: Any) -> str:
+    """
+    Hash the parts of a cache key in a canonical form: multisets are to be given sorted, Decimals are kept as written.
+
+    :param kind: kind of entry, e.g. "combinations" or "sets"
+    :param parts: values identifying the entry, e.g. the sorted inputs, the target and the tolerance
+    :return: hexadecimal SHA-256 digest
+    """
+    payload = json.dumps({"version": CACHE_VERSION, "kind": kind, **parts}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def multiset(values: Iterable[Number]) -> List[str]:
+    """
+    Canonical form of a multiset of amounts, for canonical_key.
+
+    :param values: amounts, in any order
+    :return: the amounts as strings, sorted by value
+    """
+    return [str(value) for value in sorted(values)]
+
+
+def encode_combinations(combinations: List[List[Number]]) -> List[List[Union[int, str]]]:
+    """
+    Convert combinations to JSON values, Decimals as strings so that no digit is lost.
+
+    :param combinations: lists of amounts
+    :return: lists of ints and strings
+    """
+    return [[str(value) if isinstance(value, Decimal) else value for value in combination] for combination in combinations]
+
+
+def decode_combinations(combinations: List[List[Union[int, str]]]) -> List[List[Number]]:
+    """
+    Convert combinations back from their JSON values.
+
+    :param combinations: lists of ints and strings, from encode_combinations
+    :return: lists of ints and Decimals
+    """
+    return [[Decimal(value) if isinstance(value, str) else value for value in combination] for combination in combinations]
+
+
+class ResultCache:
+    """
+    Key-value store of search results in SQLite, with least-recently-used eviction by size.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_FILE, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        """
+        Open the cache file, creating it if needed.
+
+        :param path: SQLite file of the cache
+        :param max_bytes: largest total size of the stored values
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._connection = sqlite3.connect(path)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, kind TEXT NOT NULL, value BLOB NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+        self._connection.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Look an entry up, marking it as recently used.
+
+        :param key: key from canonical_key
+        :return: the stored value, None if there is none
+        """
+        row = self._connection.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._connection.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+        self._connection.commit()
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, key: str, kind: str, value: Any) -> None:
+        """
+        Store an entry, then evict the least recently used entries while the cache is over its size.
+
+        :param key: key from canonical_key
+        :param kind: kind of entry, for the statistics
+        :param value: JSON-serializable value
+        """
+        blob = zlib.compress(json.dumps(value, separators=(",", ":")).encode())
+        if len(blob) > self.max_bytes:
+            logger.warning('+++%s entry of %s bytes is larger than the cache, not cached+++', kind, len(blob))
+            return
+        self._connection.execute(
+            "INSERT OR REPLACE INTO entries (key, kind, value, size, last_used) VALUES (?, ?, ?, ?, ?)",
+            (key, kind, blob, len(blob), time.time()),
+        )
+        self.evict()
+        self._connection.commit()
+
+    def evict(self) -> None:
+        """
+        Delete the least recently used entries until the stored values fit in max_bytes.
+        """
+        total = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in self._connection.execute("SELECT key, size FROM entries ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        logger.info('---%s cache entries evicted, %s bytes left---', evicted, total)
+
+    def clear(self) -> None:
+        """
+        Delete every entry.
+        """
+        self._connection.execute("DELETE FROM entries")
+        self._connection.commit()
+
+    def close(self) -> None:
+        self._connection.close()
+        logger.info('---cache %s: %s hits, %s misses---', self.path, self.hits, self.misses)
+
+    def __enter__(self) -> "ResultCache":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def cached_combinations(
+    cache: ResultCache,
+    search: Callable[[List[Number]], Iterable[List[Number]]],
+    input_list: List[Number],
+    target_list: List[Number],
+    tolerance: Number = 0,
+    options: Optional[Dict[str, Any]] = None,
+    is_complete: Callable[[], bool] = lambda: True,
+) -> List[List[Number]]:
+    """
+    Get the candidate combinations of every target, from the cache for the targets already searched,
+    and from one search over the other targets.
+
+    :param cache: result cache
+    :param search: search given a list of distinct targets, e.g. a partial call of iter_sum_combinations
+    :param input_list: list of candidates
+    :param target_list: list of targets
+    :param tolerance: tolerance level for comparing sums to the targets
+    :param options: search options changing the combinations found, e.g. the engine
+    :param is_complete: tells whether the search ran to the end, only then are its combinations cached
+    :return: combinations of the 0 targets first, then of the other targets in order, each once per target it fits
+    """
+    inputs = multiset(input_list)
+    targets: List[Number] = sorted(set(target_list), key=lambda target: (target != 0, target_list.index(target)))
+    keys: Dict[Number, str] = {target: canonical_key("combinations", inputs=inputs, target=str(target), tolerance=str(tolerance), options=options or {})
+                               for target in targets}
+
+    found: Dict[Number, List[List[Number]]] = {}
+    for target in targets:
+        cached = cache.get(keys[target])
+        if cached is not None:
+            found[target] = decode_combinations(cached)
+    missing: List[Number] = [target for target in targets if target not in found]
+    logger.info('---%s targets cached, %s to search---', len(found), len(missing))
+
+    if missing and tolerance == 0:
+        # one search over all the missing targets, each combination sums to exactly one of them
+        searched: Dict[Number, List[List[Number]]] = {target: [] for target in missing}
+        for combination in search(missing):
+            searched[sum(combination)].append(combination)
+        found.update(searched)
+    elif missing:
+        # a combination within tolerance of several targets is not found for each of them,
+        # as the search stops extending a combination as soon as it is within tolerance, so each target is searched alone
+        for target in missing:
+            found[target] = list(search([target]))
+    if missing:
+        if is_complete():
+            for target in missing:
+                cache.put(keys[target], "combinations", encode_combinations(found[target]))
+    return [combination for target in targets for combination in found[target]]
+
+
+def sets_key(input_list: List[Number], target_list: List[Number], tolerance: Number = 0, options: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Key of the viable combination sets of a whole run.
+
+    :param input_list: list of candidates
+    :param target_list: list of targets
+    :param tolerance: tolerance level for comparing sums to the targets
+    :param options: search options changing the sets found or their order, e.g. the engines
+    :return: key for ResultCache
+    """
+    return canonical_key("sets", inputs=multiset(input_list), targets=multiset(target_list), tolerance=str(tolerance), options=options or {})
@@ -0,0 +1,156 @@
+"""
+Command-line options shared by main.py and main_decimal.py.
+"""
+
+import argparse
+from decimal import Decimal, InvalidOperation
+from typing import List, Optional, Union
+
+from combination.stats import SearchStats, log_progress
+from utility.budget import SearchBudget
+from utility.cache import DEFAULT_MAX_BYTES, ResultCache
+from utility.profiling import PROFILERS
+
+
+def decimal_type(value: str) -> Decimal:
+    """
+    Parse a non-negative Decimal argument, e.g. the tolerance.
+
+    :param value: text of the argument
+    :return: the Decimal value
+    """
+    try:
+        parsed = Decimal(value)
+    except InvalidOperation:
+        raise argparse.ArgumentTypeError(f"invalid decimal value: '{value}'")
+    if not parsed.is_finite() or parsed < 0:
+        raise argparse.ArgumentTypeError(f"expected a non-negative decimal value, got '{value}'")
+    return parsed
+
+
+def positive_int(value: str) -> int:
+    """
+    Parse a positive integer argument, e.g. the number of workers.
+
+    :param value: text of the argument
+    :return: the integer value
+    """
+    try:
+        parsed = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid integer value: '{value}'")
+    if parsed < 1:
+        raise argparse.ArgumentTypeError(f"expected a positive integer, got '{value}'")
+    return parsed
+
+
+def column_type(value: str) -> Union[int, str]:
+    """
+    Parse a column of the input file, given by position from 0 or by name.
+
+    :param value: text of the argument
+    :return: the index of the column if the argument is a number, its name otherwise
+    """
+    return int(value) if value.isdigit() else value
+
+
+def build_parser(
+    description: str,
+    engines: List[str],
+    modes: Optional[List[str]] = None,
+    tolerance: Optional[str] = None,
+    workers: bool = False,
+) -> argparse.ArgumentParser:
+    """
+    Build the argument parser of an entry point.
+
+    :param description: description shown by --help
+    :param engines: engines of the combination search, the first one being the default
+    :param modes: engines of the combination set search, the first one being the default, None if not selectable
+    :param tolerance: default tolerance, None if the entry point compares sums exactly
+    :param workers: whether the entry point can run the searches on a process pool
+    :return: argument parser
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("-i", "--input", default="input.csv", help="CSV file of the transactions (default: %(default)s)")
+    parser.add_argument("-t", "--target", default="target.csv", help="CSV file of the targets (default: %(default)s)")
+    parser.add_argument("--amount-column", type=column_type, default=0, metavar="COLUMN",
+                        help="position from 0 or header name of the amount column of the input file (default: %(default)s)")
+    parser.add_argument("--id-column", type=column_type, default=None, metavar="COLUMN",
+                        help="position from 0 or header name of the transaction ID column of the input file "
+                             "(default: the row numbers)")
+    parser.add_argument("--header", action="store_true",
+                        help="skip the first row of the input file, implied when a column is given by name")
+    parser.add_argument("-o", "--output", default="results.csv",
+                        help="results file, .csv or .jsonl, with an optional .gz suffix (default: %(default)s)")
+    if tolerance is not None:
+        parser.add_argument("--tolerance", type=decimal_type, default=Decimal(tolerance),
+                            help="largest difference between a combination and its target (default: %(default)s)")
+    parser.add_argument("--engine", choices=engines, default=engines[0],
+                        help="engine of the combination search (default: %(default)s)")
+    if modes is not None:
+        parser.add_argument("--mode", choices=modes, default=modes[0],
+                            help="engine of the combination set search (default: %(default)s)")
+        parser.add_argument("--decompose", action="store_true",
+                            help="take the combinations every viable set must contain first and search the independent "
+                                 "groups of values separately (default: search the whole set at once)")
+    if workers:
+        parser.add_argument("--workers", type=positive_int, default=None, metavar="N",
+                            help="search the targets of the recursive engine, and the subtrees of the backtrack mode, "
+                                 "on N processes (default: in this process)")
+    parser.add_argument("--max-solutions", type=positive_int, default=None, metavar="N",
+                        help="stop after N viable combination sets (default: no limit)")
+    parser.add_argument("--time-limit", type=float, default=None, metavar="SECONDS",
+                        help="wall-clock budget of the search (default: no limit)")
+    parser.add_argument("--max-nodes", type=positive_int, default=None, metavar="N",
+                        help="budget of search nodes, shared by all the stages (default: no limit)")
+    parser.add_argument("--stats", action="store_true",
+                        help="count the nodes, pruned branches and combinations per target, and time each stage")
+    parser.add_argument("--progress", type=positive_int, default=None, metavar="N",
+                        help="log the search statistics every N nodes, implies --stats")
+    parser.add_argument("--profile", choices=PROFILERS, default=None,
+                        help="run under cProfile or tracemalloc and print the top entries")
+    parser.add_argument("--profile-output", default=None, metavar="PATH",
+                        help="file for the profile: raw pstats data for cprofile, the text report for tracemalloc")
+    parser.add_argument("--cache", default=None, metavar="PATH",
+                        help="SQLite file caching the combinations of each target and the viable combination sets, "
+                             "reused by later runs on the same input (default: no cache)")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024), metavar="MB",
+                        help="size of the cache beyond which the least recently used entries are evicted (default: %(default)s)")
+    return parser
+
+
+def build_budget(args: argparse.Namespace) -> SearchBudget:
+    """
+    Create the search budget given on the command line.
+
+    :param args: parsed arguments
+    :return: search budget, unlimited if no budget is given
+    """
+    return SearchBudget(max_nodes=args.max_nodes, max_seconds=args.time_limit)
+
+
+def build_stats(args: argparse.Namespace) -> Optional[SearchStats]:
+    """
+    Create the search statistics asked for on the command line.
+
+    :param args: parsed arguments
+    :return: search statistics, None if they are not asked for, so that the searches do not collect them
+    """
+    if not args.stats and args.progress is None:
+        return None
+    if args.progress is None:
+        return SearchStats()
+    return SearchStats(progress=log_progress, progress_every=args.progress)
+
+
+def build_cache(args: argparse.Namespace) -> Optional[ResultCache]:
+    """
+    Open the result cache given on the command line.
+
+    :param args: parsed arguments
+    :return: result cache, None if no cache file is given
+    """
+    if args.cache is None:
+        return None
+    return ResultCache(args.cache, max_bytes=args.cache_size * 1024 * 1024)
@@ -24,7 +24,7 @@ def read_csv(csv_name: str) -> List[Union[int, Decimal]]:
                 else:  # Otherwise, try to convert to int
                     values.append(int(value))
             except ValueError:
-                logger.error(f"+++invalid data '{value}' in {csv_name}+++")
+                logger.error("+++invalid data '%s' in %s+++", value, csv_name)
                 continue
     return values
 
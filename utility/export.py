@@ -0,0 +1,139 @@
+"""
+Streaming export of every viable result set into a single output file.
+
+Each item of each combination becomes one row of result id, target, combination index, item and transaction ID,
+written as CSV or JSON Lines through one buffered file, optionally gzip-compressed, instead of one small file per
+result set. The file is flushed every `flush_every` rows, so a long run leaves the results found so far on disk.
+"""
+
+import csv
+import gzip
+import json
+import logging
+from decimal import Decimal
+from typing import IO, List, Optional, Sequence, Union
+from utility.validation_decimal import assign_targets
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ["result_id", "target", "combination_index", "item", "id"]
+FORMATS = ("csv", "jsonl")
+
+Number = Union[int, Decimal]
+
+
+def detect_format(file_name: str) -> str:
+    """
+    Infer the output format from the file name, ignoring a trailing .gz.
+
+    :param file_name: name of file
+    :return: 'jsonl' for .jsonl or .json files, 'csv' otherwise
+    """
+    name = file_name[:-3] if file_name.endswith(".gz") else file_name
+    return "jsonl" if name.endswith((".jsonl", ".json")) else "csv"
+
+
+def match_targets(result: List[List[Number]], targets: Sequence[Number], tolerance: Number = 0) -> List[Optional[Number]]:
+    """
+    Find the target reached by each combination of a result set, each target being used once.
+
+    The combinations are paired with the targets by a bipartite matching over the pairs within tolerance,
+    as validate_result does, so a combination never takes the target that is the only one left for another.
+
+    :param result: combination set, as lists of amounts
+    :param targets: list of targets
+    :param tolerance: tolerance level for comparing sums to the targets
+    :return: target of each combination, None if no target is left within tolerance of its sum
+    """
+    assigned: List[Optional[int]] = assign_targets([sum(combination) for combination in result], list(targets), tolerance)
+    return [None if index is None else targets[index] for index in assigned]
+
+
+class ResultWriter:
+    """
+    Buffered writer appending result sets to one CSV or JSON Lines file, usable as a context manager.
+    """
+
+    def __init__(self, file_name: str, file_format: Optional[str] = None, compress: Optional[bool] = None, flush_every: int = 10000) -> None:
+        """
+        Open the output file and write the CSV header.
+
+        :param file_name: name of file
+        :param file_format: 'csv' or 'jsonl', None to infer it from the file name
+        :param compress: whether to gzip the output, None to compress when the file name ends with .gz
+        :param flush_every: number of rows written between two flushes
+        """
+        self.file_name = file_name
+        self.file_format = file_format or detect_format(file_name)
+        if self.file_format not in FORMATS:
+            raise ValueError(f"unknown result format '{self.file_format}', expected one of {FORMATS}")
+        self.compress = file_name.endswith(".gz") if compress is None else compress
+        self.flush_every = flush_every
+        self.rows = 0
+        self.results = 0
+        self._pending = 0
+
+        logger.info(f'---exporting results to {file_name} as {self.file_format}{" (gzip)" if self.compress else ""}---')
+        if self.compress:
+            self._file: IO[str] = gzip.open(file_name, "wt", newline="")
+        else:
+            self._file = open(file_name, "w", newline="")
+        self._csv_writer = csv.writer(self._file) if self.file_format == "csv" else None
+        if self._csv_writer is not None:
+            self._csv_writer.writerow(FIELDS)
+
+    def write(
+        self,
+        result_id: int,
+        result: List[List[Number]],
+        targets: Sequence[Optional[Number]],
+        ids: Optional[List[List[str]]] = None,
+    ) -> None:
+        """
+        Append one result set, one row per item.
+
+        :param result_id: number of the result set
+        :param result: combination set, as lists of amounts
+        :param targets: target of each combination, as from match_targets
+        :param ids: transaction ID of each item, as from Ledger.assign_ids, None to leave the ID empty
+        """
+        for combination_index, combination in enumerate(result):
+            target = targets[combination_index]
+            for position, item in enumerate(combination):
+                transaction_id = ids[combination_index][position] if ids is not None else None
+                self._write_row([result_id, target, combination_index, item, transaction_id])
+        self.results += 1
+
+    def _write_row(self, row: list) -> None:
+        if self._csv_writer is not None:
+            self._csv_writer.writerow(["" if value is None else str(value) for value in row])
+        else:
+            # Decimals are written as strings so that no digit is lost
+            record = {field: str(value) if isinstance(value, Decimal) else value for field, value in zip(FIELDS, row)}
+            self._file.write(json.dumps(record) + "\n")
+        self.rows += 1
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Flush the rows written so far to disk.
+        """
+        self._file.flush()
+        self._pending = 0
+
+    def close(self) -> None:
+        """
+        Flush and close the output file.
+        """
+        if self._file.closed:
+            return
+        self._file.close()
+        logger.info(f'---{self.results} result sets exported to {self.file_name} in {self.rows} rows---')
+
+    def __enter__(self) -> "ResultWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
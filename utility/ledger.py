@@ -0,0 +1,208 @@
+"""
+Streaming reader for ledger exports, keeping the transaction IDs next to the amounts.
+
+The rows are read in chunks, and the amounts are held as integers in units of 10^-scale in an array('q'),
+8 bytes per row while the file is read and for the lifetime of the ledger, instead of a boxed int or Decimal.
+When a chunk brings more decimal places, the amounts read so far are rescaled in place, and if an amount no
+longer fits in 64 bits the array is widened to a list of Python integers. The searches still work on the list of
+numbers returned by values(). The IDs are kept in a side table, so that combinations of amounts can be reported
+as the transactions they come from.
+"""
+
+import csv
+import logging
+from array import array
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+Column = Union[int, str]
+
+
+class Ledger:
+    """
+    Amounts of a ledger as scaled integers, with the ID of each row.
+    """
+
+    def __init__(self) -> None:
+        self.amounts: Union[array, List[int]] = array('q')
+        self.scale: int = 0
+        self.ids: List[str] = []
+        # rows of each scaled amount in file order, built by the first assign_ids
+        self._rows: Optional[Dict[int, List[int]]] = None
+
+    def __len__(self) -> int:
+        return len(self.amounts)
+
+    def rescale(self, scale: int) -> None:
+        """
+        Rescale the amounts in place to a larger number of decimal places.
+
+        :param scale: new number of decimal places, not less than the current one
+        """
+        factor = 10 ** (scale - self.scale)
+        if factor > 1:
+            for index in range(len(self.amounts)):
+                try:
+                    self.amounts[index] *= factor
+                except OverflowError:
+                    # the amount is left as it was, and rescaled again once the amounts are Python integers
+                    self.widen()
+                    self.amounts[index] *= factor
+        self.scale = scale
+
+    def widen(self) -> None:
+        """
+        Move the amounts from the array('q') to a list of Python integers, for amounts which do not fit in 64 bits.
+        """
+        if isinstance(self.amounts, array):
+            logger.warning('+++scaled amounts do not fit in 64 bits, keeping them as Python integers+++')
+            self.amounts = list(self.amounts)
+
+    def extend(self, amounts: List[Decimal], ids: List[str]) -> None:
+        """
+        Append a chunk of amounts and their IDs.
+
+        :param amounts: amounts of the chunk
+        :param ids: ID of each amount
+        """
+        scale = self.scale
+        for amount in amounts:
+            scale = max(scale, -amount.normalize().as_tuple().exponent)
+        if scale > self.scale:
+            logger.info('---rescaling %s amounts to %s decimal places---', len(self.amounts), scale)
+            self.rescale(scale)
+        scaled = [int(amount.scaleb(self.scale)) for amount in amounts]
+        size = len(self.amounts)
+        try:
+            self.amounts.extend(scaled)
+        except OverflowError:
+            # the array keeps the items appended before the overflow
+            del self.amounts[size:]
+            self.widen()
+            self.amounts.extend(scaled)
+        self.ids.extend(ids)
+        self._rows = None
+
+    def iter_values(self) -> Iterator[Union[int, Decimal]]:
+        """
+        Convert the amounts back to numbers one by one, straight from the compact storage: an integer for each
+        whole amount and a Decimal for each amount with a fraction, without the trailing zeros added by the scaling,
+        as read_csv does for the amounts written with and without a decimal point.
+
+        :return: iterator of amounts, in file order
+        """
+        if self.scale == 0:
+            yield from self.amounts
+            return
+        factor = 10 ** self.scale
+        for amount in self.amounts:
+            if amount % factor == 0:
+                yield amount // factor
+            else:
+                yield Decimal(amount).scaleb(-self.scale).normalize()
+
+    def values(self) -> List[Union[int, Decimal]]:
+        """
+        Convert the amounts back to numbers, see iter_values.
+
+        :return: list of amounts, in file order
+        """
+        return list(self.iter_values())
+
+    def assign_ids(self, result: List[List[Union[int, Decimal]]]) -> List[List[str]]:
+        """
+        Report a combination set as transaction IDs, giving each amount the ID of a row with that amount not used yet.
+
+        :param result: combination set, as lists of amounts
+        :return: the same combination set, as lists of IDs
+        """
+        if self._rows is None:
+            self._rows = {}
+            for index, amount in enumerate(self.amounts):
+                self._rows.setdefault(amount, []).append(index)
+        # the rows of each amount are taken in file order, counting those used by the result set so far
+        used: Dict[int, int] = {}
+        ids: List[List[str]] = []
+        for combination in result:
+            combination_ids: List[str] = []
+            for amount in combination:
+                key = int(Decimal(amount).scaleb(self.scale))
+                combination_ids.append(self.ids[self._rows[key][used.get(key, 0)]])
+                used[key] = used.get(key, 0) + 1
+            ids.append(combination_ids)
+        return ids
+
+
+def find_column(header: List[str], column: Column) -> int:
+    """
+    Find the index of a column given by position or by name.
+
+    :param header: names of the columns
+    :param column: index or name of the column
+    :return: index of the column
+    :raises ValueError: if no column has that name
+    """
+    if isinstance(column, int):
+        return column
+    names = [name.strip() for name in header]
+    if column not in names:
+        raise ValueError(f"column '{column}' not found in the header {names}")
+    return names.index(column)
+
+
+def read_ledger(
+    csv_name: str,
+    amount_column: Column = 0,
+    id_column: Optional[Column] = None,
+    header: bool = False,
+    chunk_size: int = 65536,
+) -> Ledger:
+    """
+    Read the amounts and IDs of a CSV export, chunk by chunk.
+
+    :param csv_name: name of file
+    :param amount_column: index or name of the amount column
+    :param id_column: index or name of the ID column, None to use the row numbers as IDs
+    :param header: whether the first row holds the column names, implied when a column is given by name
+    :param chunk_size: number of rows parsed at once
+    :return: ledger of the valid rows, invalid amounts are logged and skipped
+    """
+    logger.info(f'---reading {csv_name}---')
+    ledger = Ledger()
+    with open(csv_name, newline='') as csv_file:
+        csv_reader = csv.reader(csv_file)
+        amount_index, id_index = amount_column, id_column
+        if header or isinstance(amount_column, str) or isinstance(id_column, str):
+            names = next(csv_reader, [])
+            amount_index = find_column(names, amount_column)
+            id_index = None if id_column is None else find_column(names, id_column)
+
+        row_number = 0
+        while True:
+            chunk = list(islice(csv_reader, chunk_size))
+            if not chunk:
+                break
+            amounts: List[Decimal] = []
+            ids: List[str] = []
+            for row in chunk:
+                row_number += 1
+                if not row:
+                    continue
+                try:
+                    value = row[amount_index].strip()  # Get the value and strip any whitespace
+                    amount = Decimal(value)
+                    transaction_id = row[id_index].strip() if id_index is not None else str(row_number)
+                except (IndexError, InvalidOperation):
+                    logger.error("+++invalid row %s in %s: %s+++", row_number, csv_name, row)
+                    continue
+                if not amount.is_finite():
+                    logger.error("+++invalid data '%s' in %s+++", value, csv_name)
+                    continue
+                amounts.append(amount)
+                ids.append(transaction_id)
+            ledger.extend(amounts, ids)
+    logger.info('---%s rows read from %s, %s decimal places---', len(ledger), csv_name, ledger.scale)
+    return ledger
@@ -0,0 +1,65 @@
+"""
+Switches wrapping a run in cProfile or tracemalloc and dumping their reports.
+"""
+
+import cProfile
+import io
+import logging
+import pstats
+import sys
+import tracemalloc
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+PROFILERS = ("cprofile", "tracemalloc")
+
+
+@contextmanager
+def profiled(profiler: Optional[str], output: Optional[str] = None, top: int = 25) -> Iterator[None]:
+    """
+    Run a block of code under a profiler and report the top entries when it ends.
+
+    :param profiler: "cprofile" for the time spent in each function, "tracemalloc" for the memory allocated
+        by each line, None to run the block as is
+    :param output: file for the report: the raw pstats data for cProfile, readable with pstats or snakeviz,
+        and the text report for tracemalloc; None to print the report only
+    :param top: number of entries printed
+    """
+    if profiler is None:
+        yield
+        return
+    if profiler not in PROFILERS:
+        raise ValueError(f"unknown profiler '{profiler}', expected one of {PROFILERS}")
+
+    if profiler == "cprofile":
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            if output is not None:
+                profile.dump_stats(output)
+                logger.info('---cProfile data saved to %s---', output)
+            report = io.StringIO()
+            pstats.Stats(profile, stream=report).sort_stats("cumulative").print_stats(top)
+            print(report.getvalue(), file=sys.stderr)
+        return
+
+    tracemalloc.start(10)
+    try:
+        yield
+    finally:
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        lines = [f"peak traced memory: {peak / 1024:.1f} KiB", f"top {top} allocation sites still held:"]
+        lines.extend(str(statistic) for statistic in snapshot.statistics("lineno")[:top])
+        report_text = "\n".join(lines)
+        if output is not None:
+            with open(output, "w") as report_file:
+                report_file.write(report_text + "\n")
+            logger.info('---tracemalloc report saved to %s---', output)
+        print(report_text, file=sys.stderr)
@@ -0,0 +1,56 @@
+"""
+Seeded generator of synthetic ledgers, for benchmarks.
+
+The targets are built by splitting a shuffled copy of the transactions into groups, so every generated ledger has
+at least one viable combination set and the sums of the inputs and the targets are equal.
+"""
+
+import random
+from decimal import Decimal
+from typing import List, Tuple, Union
+
+Amount = Union[int, Decimal]
+
+
+def generate_ledger(
+    size: int,
+    target_count: int,
+    duplicate_ratio: float = 0.0,
+    negative_ratio: float = 0.0,
+    scale: int = 0,
+    max_amount: int = 2000,
+    seed: int = 0,
+) -> Tuple[List[Amount], List[Amount]]:
+    """
+    Generate the transactions and the targets of a ledger, the same ones for the same arguments.
+
+    :param size: number of transactions
+    :param target_count: number of targets, at most size
+    :param duplicate_ratio: share of the transactions repeating the amount of an earlier one
+    :param negative_ratio: share of the transactions with a negative amount, e.g. refunds
+    :param scale: number of decimal places of the amounts, 0 for integers
+    :param max_amount: largest absolute amount, in whole units
+    :param seed: seed of the random generator
+    :return: list of transactions and list of targets, integers if scale is 0 and Decimals otherwise
+    """
+    if not 1 <= target_count <= size:
+        raise ValueError(f"target_count must be between 1 and {size}, got {target_count}")
+    rng = random.Random(seed)
+    units: List[int] = []
+    for _ in range(size):
+        if units and rng.random() < duplicate_ratio:
+            units.append(rng.choice(units))
+            continue
+        amount = rng.randint(1, max_amount * 10 ** scale)
+        units.append(-amount if rng.random() < negative_ratio else amount)
+
+    # each target is the sum of a group of the shuffled transactions
+    order = list(range(size))
+    rng.shuffle(order)
+    cuts = sorted(rng.sample(range(1, size), target_count - 1))
+    groups = [order[start:end] for start, end in zip([0] + cuts, cuts + [size])]
+    target_units = [sum(units[index] for index in group) for group in groups]
+
+    if scale == 0:
+        return units, target_units
+    return [Decimal(amount).scaleb(-scale) for amount in units], [Decimal(amount).scaleb(-scale) for amount in target_units]
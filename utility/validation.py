@@ -1,5 +1,5 @@
 import logging
-from typing import List, Dict
+from typing import List, Dict, Optional
 from collections import Counter
 
 logger = logging.getLogger(__name__)
@@ -56,11 +56,12 @@ def validate_unique_input(input:list)-> bool:
     logger.info('---all elements in input are unique---')
     return True # return True
 
-def validate_result(result: List[List[int]], input_list: List[int],output_list:List[int] )-> bool:
+def validate_result(result: List[List[int]], input_list: List[int],output_list:List[int], candidates: Optional[List[int]] = None)-> bool:
     """
     validate result by checking if it: 
 
     :param result: list of combinations of x that sum to y
+    :param candidates: sorted candidates the combinations index into, None if the combinations are lists of values
     :return: True if result is valid by ensuring that: 
         1) the length of result is equal to the length of target
         2) the count of each element in result is equal to the count of the same element in x
@@ -76,14 +77,17 @@ def validate_result(result: List[List[int]], input_list: List[int],output_list:L
     if len(result) != len(output_list):
         logger.error('+++length of result does not equal to length of target!+++')
         return False
-    logger.info(f"===length of result is equal to length of target!===")
+    logger.info("===length of result is equal to length of target!===")
     
     # logger.info('---checking if the result has the same count of numbers as per x---')
     x_element_count: Dict[int, int] = Counter(input_list)
     result_element_count: Dict[int, int] = Counter()
     
     for combination in result:
-        combination_count: Dict[int, int] = Counter(combination)
+        if candidates is not None:
+            combination_count: Dict[int, int] = Counter(candidates[i] for i in combination)
+        else:
+            combination_count = Counter(combination)
         # logger.info('---checking if result contains empty combination---')
         if len(combination) == 0:
             logger.error('+++result contains empty combination!+++')
@@ -109,13 +113,14 @@ def validate_result(result: List[List[int]], input_list: List[int],output_list:L
     return True
 
 def validate_viable_result_sets(viable_results: List[List[List[int]]])->bool:
+    return validate_viable_result_count(len(viable_results))
+
+def validate_viable_result_count(viable_result_count: int)->bool:
     logger.info('---validating viable result sets---')
-    viable_result_count:int = len(viable_results)
-    logger.info(f'---{viable_result_count} viable result sets found---')
+    logger.info('---%s viable result sets found---', viable_result_count)
     if viable_result_count == 0:
         logger.error('+++viable result sets is empty!+++')
         logger.info('===No viable combination found===')
         return False
     logger.info('===viable result sets is not empty===')
     return True
-    
\ No newline at end of file
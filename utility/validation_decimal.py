@@ -1,10 +1,44 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
 from collections import Counter
 from decimal import Decimal
 import logging
 
 logger = logging.getLogger(__name__)
 
+def assign_targets(sums: List[Decimal], targets: List[Decimal], tolerance: Decimal = Decimal("0")) -> List[Optional[int]]:
+    """
+    Pair each sum with a distinct target within tolerance, as a bipartite matching grown by augmenting paths, 
+    so that a sum never takes the only target left to another sum when a different target also fits it.
+
+    :param sums: sum of each combination, Decimals or integers
+    :param targets: list of target values, each of which can be paired once
+    :param tolerance: Decimal tolerance level for approximation
+
+    :return: index of the target paired with each sum, None for a sum left without a target when no complete pairing exists
+    """
+    fits: List[List[int]] = [[j for j, target in enumerate(targets) if abs(total - target) <= tolerance] for total in sums]
+    # the sum holding each target, if any
+    owner: List[Optional[int]] = [None] * len(targets)
+
+    def augment(i: int, seen: List[bool]) -> bool:
+        for j in fits[i]:
+            if seen[j]:
+                continue
+            seen[j] = True
+            if owner[j] is None or augment(owner[j], seen):
+                owner[j] = i
+                return True
+        return False
+
+    for i in range(len(sums)):
+        augment(i, [False] * len(targets))
+    assigned: List[Optional[int]] = [None] * len(sums)
+    for j, i in enumerate(owner):
+        if i is not None:
+            assigned[i] = j
+    return assigned
+
+
 def validate_result(result: List[List[Decimal]], input_list: List[Decimal], output_list: List[Decimal], tolerance: Decimal = Decimal("0")) -> bool:
     """
     Validate result by checking if it: 
@@ -18,7 +52,7 @@ def validate_result(result: List[List[Decimal]], input_list: List[Decimal], outp
         1) The length of result is equal to the length of target
         2) The count of each element in result is equal to the count of the same element in input_list
         3) There is no empty combination in result
-        4) Each combination’s sum approximates the target within a tolerance level
+        4) Each combination’s sum approximates a distinct target within a tolerance level, in any order
     False otherwise
     """
     logger.info('---validating result---')
@@ -29,22 +63,21 @@ def validate_result(result: List[List[Decimal]], input_list: List[Decimal], outp
     if len(result) != len(output_list):
         logger.error('+++length of result does not equal to length of target!+++')
         return False
-    logger.info(f"===length of result is equal to length of target!===")
+    logger.info("===length of result is equal to length of target!===")
     
     # Count occurrences of elements in input_list and result
     x_element_count: Dict[Decimal, int] = Counter(input_list)
     result_element_count: Dict[Decimal, int] = Counter()
     
+    # The combinations come in any order, so each sum is paired with a distinct target within tolerance
+    sums: List[Decimal] = [sum(combination) for combination in result]
+    for i, target in enumerate(assign_targets(sums, output_list, tolerance)):
+        if target is None:
+            logger.error("+++sum of combination %s (%s) is not within tolerance of any target left+++", i, sums[i])
+            return False
+
     # Check each combination
     for i, combination in enumerate(result):
-        combination_sum = sum(combination)
-        target = output_list[i]
-        
-        # Check if the combination sum is within the tolerance range of the target
-        if abs(combination_sum - target) > tolerance:
-            logger.error(f"+++sum of combination {i} ({combination_sum}) is not within tolerance of target {target}+++")
-            return False
-        
         combination_count: Dict[Decimal, int] = Counter(combination)
         
         # Check for empty combinations